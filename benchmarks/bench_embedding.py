@@ -0,0 +1,101 @@
+"""
+Bulk embedding benchmark for EmbeddingWorkers.
+Encodes a fixed set of document chunks with 1, 2, 4, ... workers in thread
+and process mode and reports throughput and the speedup over one worker,
+to show how ingestion scales with the cores of the device.
+
+Usage:
+    python benchmarks/bench_embedding.py [--model-dir DIR] [--chunks 256]
+        [--workers 1 2 4] [--modes thread process] [--output results.json]
+
+Without --model-dir, a synthetic encoder and vocabulary from
+benchmarks/tiny_model.py are generated in a temporary directory.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.services.document_service import DocumentService
+from libs.services.embedding_engine import EmbeddingEngine
+from libs.services.embedding_workers import MODES, EmbeddingWorkers, worker_session_config
+
+
+def make_chunks(count, workdir):
+    """Document chunks cut from the repo's markdown, as ingestion produces them."""
+    from benchmarks.tiny_model import default_corpus
+    service = DocumentService(os.path.join(workdir, "rag"))
+    chunks = service.chunk_text(default_corpus(), chunk_size=160, overlap=20)
+    while len(chunks) < count:
+        chunks = chunks + chunks
+    return chunks[:count]
+
+
+def load_engine(model_dir, num_workers):
+    """Engine whose session gets one worker's share of the cores."""
+    engine = EmbeddingEngine(model_dir, session_config=worker_session_config(None, num_workers))
+    if not engine.load():
+        sys.exit(f"Could not load model from {model_dir}")
+    return engine
+
+
+def run(model_dir, chunks, mode, num_workers, repeats):
+    """Best-of-N throughput of one mode and worker count."""
+    engine = load_engine(model_dir, num_workers)
+    best = float("inf")
+    with EmbeddingWorkers(engine, num_workers=num_workers, mode=mode) as workers:
+        # Warm-up also keeps process start-up out of the timing
+        workers.encode_batch(chunks[:engine.batch_size * num_workers])
+        for _ in range(repeats):
+            start = time.perf_counter()
+            workers.encode_batch(chunks)
+            best = min(best, time.perf_counter() - start)
+    engine.unload()
+    return {"mode": mode, "workers": num_workers, "seconds": best,
+            "chunks_per_second": len(chunks) / best}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model-dir", help="Benchmark an installed model instead of the tiny one")
+    parser.add_argument("--chunks", type=int, default=256)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        model_dir = args.model_dir
+        if model_dir is None:
+            from benchmarks.tiny_model import build_tiny_encoder
+            model_dir = os.path.join(workdir, "model")
+            build_tiny_encoder(model_dir, num_layers=4, num_heads=4, head_dim=32)
+        chunks = make_chunks(args.chunks, workdir)
+
+        print(f"{len(chunks)} chunks on {os.cpu_count()} cores")
+        for mode in args.modes:
+            single = None
+            for num_workers in args.workers:
+                entry = run(model_dir, chunks, mode, num_workers, args.repeats)
+                single = single or entry["chunks_per_second"]
+                entry["speedup"] = entry["chunks_per_second"] / single
+                results.append(entry)
+                print(f"{mode:8s} {num_workers:3d} workers  "
+                      f"{entry['chunks_per_second']:8.1f} chunks/s  {entry['speedup']:5.2f}x")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"model": args.model_dir or "tiny", "machine": platform.machine(),
+                       "cpu_count": os.cpu_count(), "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
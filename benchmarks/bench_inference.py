@@ -0,0 +1,211 @@
+"""
+End-to-end inference benchmark for ONNXInferenceEngine.
+Runs generation over a grid of prompt lengths, output lengths and sampling
+settings and reports time to first token, decode throughput, per-token
+latency percentiles and peak RSS. Results can be written as JSON and
+compared against a saved baseline to catch regressions.
+
+Usage:
+    python benchmarks/bench_inference.py [--quick] [--model-dir DIR]
+        [--output results.json] [--baseline baseline.json] [--save-baseline]
+
+Without --model-dir, a synthetic decoder and tokenizer from
+benchmarks/tiny_model.py are generated in a temporary directory, so the
+suite runs anywhere onnxruntime is installed.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.services.onnx_inference_engine import ONNXInferenceEngine
+
+SAMPLING = {
+    "greedy": {"temperature": 0.0, "top_k": 1, "top_p": 1.0},
+    "sampled": {"temperature": 0.7, "top_k": 40, "top_p": 0.9},
+}
+
+# Metrics compared against the baseline and whether larger is better
+COMPARED = {"ttft_ms": False, "p95_ms": False, "tokens_per_second": True}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (0 when unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def make_prompt(engine, num_tokens):
+    """Text that tokenizes to roughly `num_tokens` tokens."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(root, "README.md"), 'r', encoding='utf-8') as f:
+        text = f.read()
+    ids = engine.tokenize(text)
+    while len(ids) < num_tokens:
+        ids = ids + ids
+    return engine.tokenizer.decode(ids[:num_tokens], skip_special_tokens=True)
+
+
+def run_once(engine, prompt, max_tokens, sampling):
+    """
+    Generate once from an empty KV cache, timestamping every sampled token.
+
+    Returns:
+        (seconds to first token, per-token decode gaps in seconds)
+    """
+    stamps = []
+    sample = engine.sampler.sample
+
+    def timed_sample(*args, **kwargs):
+        token = sample(*args, **kwargs)
+        stamps.append(time.perf_counter())
+        return token
+
+    engine._truncate_cache(0)
+    engine.sampler.sample = timed_sample
+    try:
+        start = time.perf_counter()
+        engine.generate(prompt, max_tokens=max_tokens, seed=0, **sampling)
+    finally:
+        del engine.sampler.sample
+    return stamps[0] - start, np.diff(stamps)
+
+
+def run_scenario(engine, prompt_tokens, max_tokens, sampling_name, repeats):
+    """Aggregate metrics for one grid point over several runs."""
+    prompt = make_prompt(engine, prompt_tokens)
+    ttfts, gaps = [], []
+    for _ in range(repeats):
+        ttft, steps = run_once(engine, prompt, max_tokens, SAMPLING[sampling_name])
+        ttfts.append(ttft)
+        gaps.extend(steps)
+
+    gaps = np.array(gaps) if gaps else np.zeros(1)
+    return {
+        "name": f"prompt{prompt_tokens}-gen{max_tokens}-{sampling_name}",
+        "prompt_tokens": len(engine.tokenize(prompt)),
+        "max_tokens": max_tokens,
+        "sampling": sampling_name,
+        "ttft_ms": float(np.median(ttfts) * 1000),
+        "tokens_per_second": float(1.0 / gaps.mean()) if gaps.mean() > 0 else 0.0,
+        "p50_ms": float(np.percentile(gaps, 50) * 1000),
+        "p95_ms": float(np.percentile(gaps, 95) * 1000),
+        "p99_ms": float(np.percentile(gaps, 99) * 1000),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare scenarios with the same name against a baseline.
+
+    Returns:
+        List of human readable regression descriptions
+    """
+    previous = {entry["name"]: entry for entry in baseline.get("scenarios", [])}
+    regressions = []
+    for entry in results["scenarios"]:
+        old = previous.get(entry["name"])
+        if old is None:
+            continue
+        for metric, higher_is_better in COMPARED.items():
+            if not old.get(metric):
+                continue
+            change = (entry[metric] - old[metric]) / old[metric]
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{entry['name']}: {metric} {old[metric]:.2f} -> "
+                                   f"{entry[metric]:.2f} ({change:+.0%})")
+    return regressions
+
+
+def load_engine(model_dir, max_context):
+    """Load an engine with prefix caching off so every run prefills fully."""
+    engine = ONNXInferenceEngine(model_dir, max_context=max_context, prefix_cache_bytes=0)
+    if not engine.load():
+        sys.exit(f"Could not load model from {model_dir}")
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model-dir", help="Benchmark an installed model instead of the tiny one")
+    parser.add_argument("--quick", action="store_true", help="Smaller grid with one repeat")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", default=os.path.join(os.path.dirname(__file__),
+                                                           "inference_baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Overwrite the baseline with these results")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed relative slowdown before failing")
+    args = parser.parse_args()
+
+    prompt_lengths = [32, 256] if args.quick else [32, 256, 1024]
+    output_lengths = [32] if args.quick else [32, 128]
+    repeats = 1 if args.quick else args.repeats
+
+    with tempfile.TemporaryDirectory() as workdir:
+        model_dir = args.model_dir
+        if model_dir is None:
+            from benchmarks.tiny_model import build_tiny_model_dir
+            model_dir = build_tiny_model_dir(os.path.join(workdir, "model"), num_layers=4,
+                                             num_heads=4, head_dim=32, max_positions=2048)
+        engine = load_engine(model_dir, max_context=2048)
+        # Random weights would stop at an arbitrary EOS; always decode max_tokens
+        engine.eos_token_ids = set()
+        engine.warm_up()
+
+        scenarios = []
+        for prompt_tokens in prompt_lengths:
+            for max_tokens in output_lengths:
+                for sampling_name in SAMPLING:
+                    entry = run_scenario(engine, prompt_tokens, max_tokens,
+                                         sampling_name, repeats)
+                    scenarios.append(entry)
+                    print(f"{entry['name']:28s} ttft {entry['ttft_ms']:8.1f} ms  "
+                          f"{entry['tokens_per_second']:7.1f} tok/s  "
+                          f"p50 {entry['p50_ms']:6.2f}  p95 {entry['p95_ms']:6.2f}  "
+                          f"p99 {entry['p99_ms']:6.2f} ms  rss {entry['peak_rss_mb']:.0f} MB")
+        engine.unload()
+
+    results = {
+        "model": args.model_dir or "tiny",
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "scenarios": scenarios,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
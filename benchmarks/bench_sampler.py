@@ -0,0 +1,74 @@
+"""
+Micro-benchmark for next-token sampling.
+Compares the Sampler against the previous full-vocabulary implementation
+on realistic vocabulary sizes.
+
+Usage:
+    python benchmarks/bench_sampler.py
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.services.sampler import Sampler
+
+
+def legacy_sample_token(logits, temperature, top_k, top_p):
+    """Previous ONNXInferenceEngine.sample_token, kept for comparison."""
+    logits = logits / max(temperature, 1e-5)
+    if top_k > 0:
+        indices_to_remove = logits < np.partition(logits, -top_k)[-top_k]
+        logits[indices_to_remove] = -float('inf')
+    exp_x = np.exp(logits - np.max(logits))
+    probs = exp_x / exp_x.sum()
+    if top_p < 1.0:
+        sorted_indices = np.argsort(probs)[::-1]
+        sorted_probs = probs[sorted_indices]
+        cumsum = np.cumsum(sorted_probs)
+        remove_indices = cumsum > top_p
+        if np.any(remove_indices):
+            remove_indices[0] = False
+            probs[sorted_indices[remove_indices]] = 0
+    probs = probs / np.sum(probs)
+    return np.random.choice(len(probs), p=probs)
+
+
+def time_per_call(fn, steps):
+    """Average wall time of fn() in microseconds."""
+    fn()
+    start = time.perf_counter()
+    for _ in range(steps):
+        fn()
+    return (time.perf_counter() - start) / steps * 1e6
+
+
+def main(steps=200):
+    rng = np.random.default_rng(0)
+    sampler = Sampler(seed=0)
+    settings = [
+        ("top_k=40 top_p=0.9", 0.7, 40, 0.9),
+        ("top_k=0  top_p=0.9", 0.7, 0, 0.9),
+    ]
+
+    print(f"{'vocab':>8} {'setting':<20} {'legacy us':>10} {'sampler us':>11} {'speedup':>8}")
+    for vocab_size in (49152, 256000):
+        logits = (rng.standard_normal(vocab_size) * 3).astype(np.float32)
+        counts = np.bincount(rng.integers(0, vocab_size, 512), minlength=vocab_size)
+        for name, temperature, top_k, top_p in settings:
+            legacy = time_per_call(
+                lambda: legacy_sample_token(logits, temperature, top_k, top_p), steps)
+            new = time_per_call(
+                lambda: sampler.sample(logits, temperature, top_k, top_p), steps)
+            print(f"{vocab_size:>8} {name:<20} {legacy:>10.1f} {new:>11.1f} {legacy / new:>7.1f}x")
+
+        with_penalty = time_per_call(
+            lambda: sampler.sample(logits, 0.7, 40, 0.9, token_counts=counts,
+                                   repetition_penalty=1.1, frequency_penalty=0.2), steps)
+        print(f"{vocab_size:>8} {'+ penalties':<20} {'':>10} {with_penalty:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
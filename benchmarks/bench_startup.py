@@ -0,0 +1,54 @@
+"""
+Startup benchmark for ONNX session creation.
+Compares optimizing a model from scratch on every load against reusing the
+serialized pre-optimized model written to the cache directory.
+
+Usage:
+    python benchmarks/bench_startup.py [model.onnx]
+
+Without a model, a synthetic decoder from benchmarks/tiny_model.py is used.
+"""
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.services.onnx_session import create_session
+
+
+def time_loads(model_file, cache_dir, repeats):
+    """Best-of-N session creation time in seconds."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        create_session(model_file, cache_dir)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    with tempfile.TemporaryDirectory() as workdir:
+        if len(sys.argv) > 1:
+            model_file = sys.argv[1]
+        else:
+            from benchmarks.tiny_model import build_tiny_model
+            model_file = build_tiny_model(os.path.join(workdir, "model"), vocab_size=8000,
+                                          num_layers=12, num_heads=8, head_dim=64)
+        cache_dir = os.path.join(workdir, "cache")
+
+        scratch = time_loads(model_file, None, 3)
+        start = time.perf_counter()
+        _, info = create_session(model_file, cache_dir)
+        cold = time.perf_counter() - start
+        warm = time_loads(model_file, cache_dir, 3)
+
+        print(f"Model: {model_file} ({os.path.getsize(model_file) / 1e6:.1f} MB)")
+        print(f"  optimize on every load : {scratch * 1000:8.1f} ms")
+        print(f"  first load (writes)    : {cold * 1000:8.1f} ms")
+        print(f"  cached optimized model : {warm * 1000:8.1f} ms  ({scratch / warm:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,401 @@
+"""
+Generate a tiny randomly initialised decoder-only ONNX model with the
+Hugging Face/Optimum KV-cache IO layout, plus config.json and a small
+byte-level BPE tokenizer.json trained on the repo's documentation, and a
+BERT style encoder with a WordPiece vocab.txt for the embedding engine.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+from collections import Counter
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.services.bpe_tokenizer import GPT2_PATTERN, bytes_to_unicode
+
+SPECIAL_TOKENS = ["<|endoftext|>", "<|im_start|>", "<|im_end|>"]
+
+
+def default_corpus() -> str:
+    """Markdown documentation shipped with the repo."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    texts = []
+    for name in sorted(os.listdir(root)):
+        if name.endswith(".md"):
+            with open(os.path.join(root, name), 'r', encoding='utf-8', errors='ignore') as f:
+                texts.append(f.read())
+    return "\n".join(texts)
+
+
+def build_tiny_tokenizer(output_dir: str, num_merges: int = 256,
+                         corpus: str = None) -> int:
+    """
+    Train a small byte-level BPE tokenizer and save it as tokenizer.json.
+
+    Args:
+        output_dir: Directory to write tokenizer.json into
+        num_merges: Number of merges to learn
+        corpus: Training text (the repo's markdown files if None)
+
+    Returns:
+        Vocabulary size
+    """
+    byte_encoder = bytes_to_unicode()
+    words = Counter(
+        tuple(byte_encoder[b] for b in word.encode("utf-8"))
+        for word in re.findall(GPT2_PATTERN, corpus or default_corpus())
+    )
+
+    vocab = {token: i for i, token in enumerate(SPECIAL_TOKENS)}
+    for b in range(256):
+        vocab[byte_encoder[b]] = len(vocab)
+
+    merges = []
+    for _ in range(num_merges):
+        pairs = Counter()
+        for word, count in words.items():
+            for pair in zip(word, word[1:]):
+                pairs[pair] += count
+        if not pairs:
+            break
+        (a, b), _ = pairs.most_common(1)[0]
+        merges.append(f"{a} {b}")
+        vocab[a + b] = len(vocab)
+
+        merged = Counter()
+        for word, count in words.items():
+            out, i = [], 0
+            while i < len(word):
+                if i + 1 < len(word) and word[i] == a and word[i + 1] == b:
+                    out.append(a + b)
+                    i += 2
+                else:
+                    out.append(word[i])
+                    i += 1
+            merged[tuple(out)] += count
+        words = merged
+
+    tokenizer = {
+        "version": "1.0",
+        "added_tokens": [{"id": i, "content": token, "single_word": False, "lstrip": False,
+                          "rstrip": False, "normalized": False, "special": True}
+                         for i, token in enumerate(SPECIAL_TOKENS)],
+        "normalizer": None,
+        "pre_tokenizer": {"type": "ByteLevel", "add_prefix_space": False,
+                          "trim_offsets": True, "use_regex": True},
+        "post_processor": None,
+        "decoder": {"type": "ByteLevel", "add_prefix_space": True,
+                    "trim_offsets": True, "use_regex": True},
+        "model": {"type": "BPE", "vocab": vocab, "merges": merges},
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "tokenizer.json"), 'w', encoding='utf-8') as f:
+        json.dump(tokenizer, f, ensure_ascii=False)
+    return len(vocab)
+
+
+def build_tiny_model(output_dir: str, vocab_size: int = 64, num_layers: int = 2,
+                     num_heads: int = 2, head_dim: int = 8, max_positions: int = 512,
+                     seed: int = 0, file_name: str = "model_int8.onnx") -> str:
+    import onnx
+    from onnx import helper, TensorProto, numpy_helper
+
+    rng = np.random.default_rng(seed)
+    hidden = num_heads * head_dim
+    inits = []
+    nodes = []
+
+    def weight(name, shape, scale=0.5):
+        inits.append(numpy_helper.from_array(
+            (rng.standard_normal(shape) * scale).astype(np.float32), name))
+        return name
+
+    def const(name, value, dtype=np.int64):
+        inits.append(numpy_helper.from_array(np.array(value, dtype=dtype), name))
+        return name
+
+    def node(op, inputs, outputs, **attrs):
+        nodes.append(helper.make_node(op, inputs, outputs, **attrs))
+        return outputs[0]
+
+    weight("embed", (vocab_size, hidden), 1.0)
+    weight("pos_embed", (max_positions, hidden), 0.1)
+    weight("lm_head", (hidden, vocab_size), 1.0)
+    const("heads_shape", [0, 0, num_heads, head_dim])
+    const("hidden_shape", [0, 0, hidden])
+    const("one_f", 1.0, np.float32)
+    const("neg_big", -1e9, np.float32)
+    const("scale", 1.0 / np.sqrt(head_dim), np.float32)
+    const("axes_12", [1, 2])
+    const("idx_2", [2])
+
+    tok = node("Gather", ["embed", "input_ids"], ["tok_emb"])
+    pos = node("Gather", ["pos_embed", "position_ids"], ["pos_emb"])
+    x = node("Add", [tok, pos], ["x0"])
+
+    # Padding mask (b, 1, 1, t)
+    mask_f = node("Cast", ["attention_mask"], ["mask_f"], to=TensorProto.FLOAT)
+    inv = node("Sub", ["one_f", mask_f], ["mask_inv"])
+    pad = node("Mul", [inv, "neg_big"], ["pad_bias"])
+    pad = node("Unsqueeze", [pad, "axes_12"], ["pad_bias4"])
+
+    graph_inputs = [
+        helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["batch", "seq"]),
+        helper.make_tensor_value_info("attention_mask", TensorProto.INT64, ["batch", "total"]),
+        helper.make_tensor_value_info("position_ids", TensorProto.INT64, ["batch", "seq"]),
+    ]
+    graph_outputs = [
+        helper.make_tensor_value_info("logits", TensorProto.FLOAT, ["batch", "seq", vocab_size]),
+    ]
+
+    causal_done = False
+    for layer in range(num_layers):
+        p = f"l{layer}_"
+        past_k = f"past_key_values.{layer}.key"
+        past_v = f"past_key_values.{layer}.value"
+        graph_inputs += [
+            helper.make_tensor_value_info(past_k, TensorProto.FLOAT, ["batch", num_heads, "past", head_dim]),
+            helper.make_tensor_value_info(past_v, TensorProto.FLOAT, ["batch", num_heads, "past", head_dim]),
+        ]
+        graph_outputs += [
+            helper.make_tensor_value_info(f"present.{layer}.key", TensorProto.FLOAT, ["batch", num_heads, "total", head_dim]),
+            helper.make_tensor_value_info(f"present.{layer}.value", TensorProto.FLOAT, ["batch", num_heads, "total", head_dim]),
+        ]
+
+        def heads(name, w):
+            weight(w, (hidden, hidden), 0.3)
+            y = node("MatMul", [x, w], [p + name + "_mm"])
+            y = node("Reshape", [y, "heads_shape"], [p + name + "_r"])
+            return node("Transpose", [y], [p + name + "_t"], perm=[0, 2, 1, 3])
+
+        q = heads("q", p + "wq")
+        k = heads("k", p + "wk")
+        v = heads("v", p + "wv")
+        k_all = node("Concat", [past_k, k], [f"present.{layer}.key"], axis=2)
+        v_all = node("Concat", [past_v, v], [f"present.{layer}.value"], axis=2)
+
+        if not causal_done:
+            # Causal mask (s, t): allow j <= i + (t - s)
+            node("Shape", [q], ["q_shape"])
+            node("Shape", [k_all], ["k_shape"])
+            node("Gather", ["q_shape", "idx_2"], ["s_len"], axis=0)
+            node("Gather", ["k_shape", "idx_2"], ["t_len"], axis=0)
+            node("Concat", ["s_len", "t_len"], ["st_shape"], axis=0)
+            node("ConstantOfShape", ["st_shape"], ["st_ones"],
+                 value=helper.make_tensor("v", TensorProto.FLOAT, [1], [1.0]))
+            node("Sub", ["t_len", "s_len"], ["diag_1"])
+            node("Squeeze", ["diag_1"], ["diag"])
+            node("Trilu", ["st_ones", "diag"], ["tril"], upper=0)
+            node("Sub", ["one_f", "tril"], ["causal_inv"])
+            node("Mul", ["causal_inv", "neg_big"], ["causal_bias"])
+            causal_done = True
+
+        kt = node("Transpose", [k_all], [p + "kt"], perm=[0, 1, 3, 2])
+        scores = node("MatMul", [q, kt], [p + "scores"])
+        scores = node("Mul", [scores, "scale"], [p + "scores_s"])
+        scores = node("Add", [scores, "causal_bias"], [p + "scores_c"])
+        scores = node("Add", [scores, pad], [p + "scores_m"])
+        attn = node("Softmax", [scores], [p + "attn"], axis=-1)
+        out = node("MatMul", [attn, v_all], [p + "ctx"])
+        out = node("Transpose", [out], [p + "ctx_t"], perm=[0, 2, 1, 3])
+        out = node("Reshape", [out, "hidden_shape"], [p + "ctx_r"])
+        weight(p + "wo", (hidden, hidden), 0.3)
+        out = node("MatMul", [out, p + "wo"], [p + "o"])
+        x = node("Add", [x, out], [p + "res"])
+
+    node("MatMul", [x, "lm_head"], ["logits"])
+
+    graph = helper.make_graph(nodes, "tiny_decoder", graph_inputs, graph_outputs, inits)
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    onnx.checker.check_model(model)
+
+    os.makedirs(output_dir, exist_ok=True)
+    model_file = os.path.join(output_dir, file_name)
+    onnx.save(model, model_file)
+
+    config = {
+        "model_type": "llama",
+        "vocab_size": vocab_size,
+        "hidden_size": hidden,
+        "num_hidden_layers": num_layers,
+        "num_attention_heads": num_heads,
+        "num_key_value_heads": num_heads,
+        "max_position_embeddings": max_positions,
+        "eos_token_id": vocab_size - 1,
+    }
+    with open(os.path.join(output_dir, "config.json"), 'w') as f:
+        json.dump(config, f, indent=2)
+    return model_file
+
+
+def build_wordpiece_vocab(output_dir: str, num_words: int = 1000, corpus: str = None) -> int:
+    """
+    Write a BERT style vocab.txt with special tokens, single characters,
+    their ## continuations and the most frequent corpus words.
+
+    Args:
+        output_dir: Directory to write vocab.txt into
+        num_words: Number of whole words to add
+        corpus: Text to take words from (the repo's markdown files if None)
+
+    Returns:
+        Vocabulary size
+    """
+    words = Counter(re.findall(r"[a-z]+|[^\sa-z]", (corpus or default_corpus()).lower()))
+    chars = sorted({c for word in words for c in word} | set("abcdefghijklmnopqrstuvwxyz0123456789"))
+    tokens = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + chars + ["##" + c for c in chars]
+    seen = set(tokens)
+    for word, _ in words.most_common():
+        if len(tokens) >= len(chars) * 2 + 5 + num_words:
+            break
+        if word not in seen:
+            tokens.append(word)
+            seen.add(word)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "vocab.txt"), 'w', encoding='utf-8') as f:
+        f.write("\n".join(tokens) + "\n")
+    return len(tokens)
+
+
+def build_tiny_encoder(output_dir: str, num_layers: int = 2, num_heads: int = 4,
+                       head_dim: int = 16, max_positions: int = 512, num_words: int = 1000,
+                       seed: int = 0) -> str:
+    """
+    Write a small random BERT style encoder (model.onnx with input_ids,
+    attention_mask and token_type_ids -> last_hidden_state) plus vocab.txt
+    and config.json, laid out like an exported MiniLM directory.
+
+    Returns:
+        Path to model.onnx
+    """
+    import onnx
+    from onnx import helper, TensorProto, numpy_helper
+
+    vocab_size = build_wordpiece_vocab(output_dir, num_words)
+    rng = np.random.default_rng(seed)
+    hidden = num_heads * head_dim
+    inits = []
+    nodes = []
+
+    def weight(name, shape, scale=0.3):
+        inits.append(numpy_helper.from_array(
+            (rng.standard_normal(shape) * scale).astype(np.float32), name))
+        return name
+
+    def const(name, value, dtype=np.int64):
+        inits.append(numpy_helper.from_array(np.array(value, dtype=dtype), name))
+        return name
+
+    def node(op, inputs, outputs, **attrs):
+        nodes.append(helper.make_node(op, inputs, outputs, **attrs))
+        return outputs[0]
+
+    weight("embed", (vocab_size, hidden), 1.0)
+    weight("pos_embed", (max_positions, hidden), 0.1)
+    weight("type_embed", (2, hidden), 0.1)
+    const("heads_shape", [0, 0, num_heads, head_dim])
+    const("hidden_shape", [0, 0, hidden])
+    const("one_f", 1.0, np.float32)
+    const("neg_big", -1e9, np.float32)
+    const("scale", 1.0 / np.sqrt(head_dim), np.float32)
+    const("axes_12", [1, 2])
+    const("idx_1", [1])
+    const("zero", 0)
+    const("one", 1)
+
+    # Positions 0..seq-1
+    node("Shape", ["input_ids"], ["ids_shape"])
+    node("Gather", ["ids_shape", "idx_1"], ["seq_len1"], axis=0)
+    node("Squeeze", ["seq_len1"], ["seq_len"])
+    node("Range", ["zero", "seq_len", "one"], ["positions"])
+
+    x = node("Gather", ["embed", "input_ids"], ["tok_emb"])
+    x = node("Add", [x, node("Gather", ["pos_embed", "positions"], ["pos_emb"])], ["x_pos"])
+    x = node("Add", [x, node("Gather", ["type_embed", "token_type_ids"], ["type_emb"])], ["x0"])
+
+    # Padding mask (b, 1, 1, t)
+    mask_f = node("Cast", ["attention_mask"], ["mask_f"], to=TensorProto.FLOAT)
+    inv = node("Sub", ["one_f", mask_f], ["mask_inv"])
+    pad = node("Mul", [inv, "neg_big"], ["pad_bias"])
+    pad = node("Unsqueeze", [pad, "axes_12"], ["pad_bias4"])
+
+    for layer in range(num_layers):
+        p = f"l{layer}_"
+
+        def heads(name):
+            y = node("MatMul", [x, weight(p + "w" + name, (hidden, hidden))], [p + name + "_mm"])
+            y = node("Reshape", [y, "heads_shape"], [p + name + "_r"])
+            return node("Transpose", [y], [p + name + "_t"], perm=[0, 2, 1, 3])
+
+        q, k, v = heads("q"), heads("k"), heads("v")
+        kt = node("Transpose", [k], [p + "kt"], perm=[0, 1, 3, 2])
+        scores = node("MatMul", [q, kt], [p + "scores"])
+        scores = node("Mul", [scores, "scale"], [p + "scores_s"])
+        scores = node("Add", [scores, pad], [p + "scores_m"])
+        attn = node("Softmax", [scores], [p + "attn"], axis=-1)
+        out = node("MatMul", [attn, v], [p + "ctx"])
+        out = node("Transpose", [out], [p + "ctx_t"], perm=[0, 2, 1, 3])
+        out = node("Reshape", [out, "hidden_shape"], [p + "ctx_r"])
+        out = node("MatMul", [out, weight(p + "wo", (hidden, hidden))], [p + "o"])
+        x = node("Add", [x, out], [p + "attn_res"])
+
+        ffn = node("MatMul", [x, weight(p + "w1", (hidden, hidden * 4))], [p + "ffn1"])
+        ffn = node("Relu", [ffn], [p + "ffn_act"])
+        ffn = node("MatMul", [ffn, weight(p + "w2", (hidden * 4, hidden), 0.1)], [p + "ffn2"])
+        x = node("Add", [x, ffn], [p + "ffn_res"] if layer < num_layers - 1
+                 else ["last_hidden_state"])
+
+    graph_inputs = [
+        helper.make_tensor_value_info(name, TensorProto.INT64, ["batch", "seq"])
+        for name in ("input_ids", "attention_mask", "token_type_ids")
+    ]
+    graph_outputs = [
+        helper.make_tensor_value_info("last_hidden_state", TensorProto.FLOAT,
+                                      ["batch", "seq", hidden]),
+    ]
+    graph = helper.make_graph(nodes, "tiny_encoder", graph_inputs, graph_outputs, inits)
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    onnx.checker.check_model(model)
+
+    model_file = os.path.join(output_dir, "model.onnx")
+    onnx.save(model, model_file)
+    config = {
+        "model_type": "bert",
+        "vocab_size": vocab_size,
+        "hidden_size": hidden,
+        "num_hidden_layers": num_layers,
+        "num_attention_heads": num_heads,
+        "max_position_embeddings": max_positions,
+    }
+    with open(os.path.join(output_dir, "config.json"), 'w') as f:
+        json.dump(config, f, indent=2)
+    return model_file
+
+
+def build_tiny_model_dir(output_dir: str, num_merges: int = 256, **model_kwargs) -> str:
+    """
+    Write a complete model directory (weights, config and tokenizer).
+
+    Args:
+        output_dir: Directory to create
+        num_merges: BPE merges of the tokenizer
+        **model_kwargs: Arguments for build_tiny_model (vocab_size is derived)
+
+    Returns:
+        Path to the model directory
+    """
+    vocab_size = build_tiny_tokenizer(output_dir, num_merges)
+    build_tiny_model(output_dir, vocab_size=vocab_size, **model_kwargs)
+    return output_dir
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output_dir")
+    args = parser.parse_args()
+    print(build_tiny_model_dir(args.output_dir))
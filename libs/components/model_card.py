@@ -1,5 +1,5 @@
 from kivymd.uix.card import MDCard
-from kivy.properties import StringProperty, NumericProperty, BooleanProperty
+from kivy.properties import StringProperty, NumericProperty, BooleanProperty, ObjectProperty
 from kivy.lang import Builder
 
 Builder.load_string("""
@@ -64,12 +64,17 @@ class ModelCard(MDCard):
     """
     A card component to display AI model details and actions.
     """
+    model_id = StringProperty("")
     model_name = StringProperty("")
     description = StringProperty("")
     model_size = StringProperty("")
     ram_req = StringProperty("")
     is_downloaded = BooleanProperty(False)
+    # Called with the card when Download/Select is pressed
+    action_callback = ObjectProperty(None, allownone=True)
     
     def on_action(self):
-        # Placeholder for action handler
-        print(f"Action triggered for {self.model_name}")
+        if self.action_callback is not None:
+            self.action_callback(self)
+        else:
+            print(f"Action triggered for {self.model_name}")
@@ -1,7 +1,7 @@
 from kivymd.uix.screen import MDScreen
 from kivy.lang import Builder
 from libs.components.chat_bubble import ChatBubble
-from kivy.properties import ObjectProperty
+from kivy.properties import ObjectProperty, BooleanProperty
 
 Builder.load_string("""
 <ChatScreen>:
@@ -10,6 +10,7 @@ Builder.load_string("""
         md_bg_color: app.theme_cls.bg_normal
 
         MDTopAppBar:
+            id: toolbar
             title: "AntiGravity AI"
             elevation: 4
             pos_hint: {"top": 1}
@@ -52,10 +53,30 @@ Builder.load_string("""
                 pos_hint: {"center_y": .5}
 """)
 
+MODEL_STATUS_TITLES = {
+    "loading": "AntiGravity AI (loading model...)",
+    "warming": "AntiGravity AI (warming up...)",
+    "failed": "AntiGravity AI (model unavailable)",
+}
+
 class ChatScreen(MDScreen):
     """
     Main chat interface.
     """
+    model_ready = BooleanProperty(False)
+
+    def on_enter(self):
+        # Pick up a status reported before this screen existed
+        from kivy.app import App
+        status = getattr(App.get_running_app(), "model_status", None)
+        if status:
+            self.set_model_status(status)
+
+    def set_model_status(self, status):
+        """Show background model warm-up progress in the toolbar."""
+        self.model_ready = status == "ready"
+        self.ids.toolbar.title = MODEL_STATUS_TITLES.get(status, "AntiGravity AI")
+
     def send_message(self):
         text = self.ids.message_input.text
         if text.strip():
@@ -26,24 +26,53 @@ Builder.load_string("""
 class ModelSelectionScreen(MDScreen):
     """
     Screen for selecting and managing AI models.
+    Downloading fetches only the weight variant that fits this device's
+    memory budget (ModelManager.download_model).
     """
     def on_enter(self):
-        # Mock data for demonstration
         self.load_models()
 
+    def _services(self):
+        from libs.services.model_manager import ModelManager
+        from libs.services.settings_manager import SettingsManager
+        from libs.services.storage_manager import StorageManager
+        storage = StorageManager()
+        return storage, ModelManager(storage.models_dir), SettingsManager()
+
     def load_models(self):
         self.ids.model_list.clear_widgets()
-        models = [
-            {"name": "SmolLM2-135M", "desc": "Lightweight, fast.", "size": "95 MB", "ram": "2 GB", "dl": True},
-            {"name": "Gemma-2B", "desc": "Balanced performance.", "size": "1.2 GB", "ram": "4 GB", "dl": False},
-        ]
+        _, model_manager, _ = self._services()
         
-        for model in models:
+        for model in model_manager.list_available_models():
+            size = model["size_mb"]
             card = ModelCard(
+                model_id=model["id"],
                 model_name=model["name"],
-                description=model["desc"],
-                model_size=model["size"],
-                ram_req=model["ram"],
-                is_downloaded=model["dl"]
+                description=model["description"],
+                model_size=f"{size / 1024:.1f} GB" if size >= 1024 else f"{size} MB",
+                ram_req=f"{model['min_ram_gb']} GB",
+                is_downloaded=model_manager.is_model_downloaded(model["id"]),
+                action_callback=self.on_model_action
             )
             self.ids.model_list.add_widget(card)
+
+    def on_model_action(self, card):
+        storage, model_manager, settings = self._services()
+        if card.is_downloaded:
+            settings.set("selected_model", card.model_id)
+            return
+        
+        from libs.services.model_downloader import ModelDownloader
+        self._downloader = ModelDownloader(storage.downloads_dir)
+        budget = model_manager.get_memory_budget(card.model_id,
+                                                 settings.get("memory_budget_mb", 0))
+
+        def on_complete(success, message):
+            print(f"Download of {card.model_id}: {message}")
+            if success:
+                self.load_models()
+
+        variant = model_manager.download_model(card.model_id, self._downloader, budget,
+                                               completion_callback=on_complete)
+        if variant is not None:
+            card.model_size = f"Downloading {variant['id']} ({variant['size_mb']} MB)"
@@ -0,0 +1,365 @@
+import os
+import re
+import json
+import marshal
+from functools import lru_cache
+from itertools import chain
+from typing import List, Dict, Tuple, Optional
+
+# Stdlib-regex approximation of the GPT-2 byte-level pre-tokenizer pattern
+# (\p{L} -> [^\W\d_], \p{N} -> \d)
+# Letters come first since they are the most common match; contractions can
+# not start a letter run so the order does not change the result
+GPT2_PATTERN = (
+    r" ?[^\W\d_]+|'(?:s|t|re|ve|m|ll|d)"
+    r"| ?\d+| ?(?:[^\s\w]|_)+|\s+(?!\S)|\s+"
+)
+
+# Same pattern with digits isolated one by one (Digits(individual_digits=True))
+GPT2_DIGITS_PATTERN = (
+    r" ?[^\W\d_]+|'(?:s|t|re|ve|m|ll|d)"
+    r"|\d| ?(?:[^\s\w]|_)+|\s+(?=\d)|\s+(?!\S)|\s+"
+)
+
+# Metaspace (SentencePiece style) words keep their leading marker
+METASPACE_PATTERN = r"▁?[^▁]+|▁"
+
+# Without a pre-tokenizer, keep whitespace runs attached to the next word
+WHITESPACE_RUN_PATTERN = r"▁*[^▁]+|▁+"
+
+COMPILED_VERSION = 1
+
+
+def bytes_to_unicode() -> Dict[int, str]:
+    """
+    GPT-2 byte-level mapping from every byte to a printable unicode character.
+    """
+    printable = (list(range(ord("!"), ord("~") + 1)) +
+                 list(range(ord("¡"), ord("¬") + 1)) +
+                 list(range(ord("®"), ord("ÿ") + 1)))
+    chars = printable[:]
+    n = 0
+    for b in range(256):
+        if b not in printable:
+            printable.append(b)
+            chars.append(256 + n)
+            n += 1
+    return dict(zip(printable, map(chr, chars)))
+
+
+class BPETokenizer:
+    """
+    Byte-level BPE tokenizer compiled from a Hugging Face tokenizer.json.
+    Merges are held as an integer pair -> (rank, merged id) table and
+    per-word encodings are memoized in a bounded LRU cache.
+    """
+
+    def __init__(self, data: Dict, cache_size: int = 65536):
+        """
+        Initialize from compiled tokenizer data (see `compile`).
+
+        Args:
+            data: Compiled tokenizer tables
+            cache_size: Maximum number of words kept in the encoding cache
+        """
+        self.byte_level = data["byte_level"]
+        self.vocab = data["vocab"]
+        self.merges = data["merges"]
+        self.added_tokens = data["added_tokens"]
+        self.special_ids = set(data["special_ids"])
+        self.prefix_ids = list(data["prefix_ids"])
+        self.prepend = data["prepend"]
+        self.strip_left = data["strip_left"]
+        self.unk_id = data["unk_id"]
+
+        self._pattern = re.compile(data["pattern"])
+        self._added_pattern = None
+        if self.added_tokens:
+            alternation = "|".join(re.escape(t) for t in
+                                   sorted(self.added_tokens, key=len, reverse=True))
+            self._added_pattern = re.compile(f"({alternation})")
+
+        # Byte-level: latin-1 view of the UTF-8 bytes -> byte-level characters
+        self._byte_table = str.maketrans(
+            {chr(b): c for b, c in bytes_to_unicode().items()})
+        self._byte_fallback = [self.vocab.get(f"<0x{b:02X}>") for b in range(256)]
+
+        self._id_bytes = self._build_id_bytes()
+        self._encode_word = lru_cache(maxsize=cache_size)(self._bpe)
+
+    @property
+    def vocab_size(self) -> int:
+        """Number of token ids."""
+        return len(self._id_bytes)
+
+    @staticmethod
+    def compile(tokenizer_json: Dict) -> Dict:
+        """
+        Build the lookup tables from a parsed tokenizer.json.
+
+        Args:
+            tokenizer_json: Parsed tokenizer.json contents
+
+        Returns:
+            Dictionary of plain Python tables suitable for marshal
+        """
+        model = tokenizer_json["model"]
+        if model.get("type", "BPE") != "BPE":
+            raise ValueError(f"Unsupported tokenizer model: {model.get('type')}")
+
+        vocab = dict(model["vocab"])
+        added_tokens = {}
+        special_ids = []
+        for token in tokenizer_json.get("added_tokens") or []:
+            vocab.setdefault(token["content"], token["id"])
+            added_tokens[token["content"]] = token["id"]
+            if token.get("special"):
+                special_ids.append(token["id"])
+
+        merges = {}
+        for rank, merge in enumerate(model.get("merges") or []):
+            left, right = merge.split(" ", 1) if isinstance(merge, str) else merge
+            merged = vocab.get(left + right)
+            if left in vocab and right in vocab and merged is not None:
+                merges.setdefault((vocab[left], vocab[right]), (rank, merged))
+
+        components = []
+        for section in ("normalizer", "pre_tokenizer"):
+            components += BPETokenizer._flatten(tokenizer_json.get(section))
+        decoders = BPETokenizer._flatten(tokenizer_json.get("decoder"))
+        types = {c.get("type") for c in components + decoders}
+
+        byte_level = "ByteLevel" in types
+        if byte_level:
+            individual_digits = any(c.get("type") == "Digits" and c.get("individual_digits")
+                                    for c in components)
+            pattern = GPT2_DIGITS_PATTERN if individual_digits else GPT2_PATTERN
+            prepend = "never"
+            if any(c.get("type") == "ByteLevel" and c.get("add_prefix_space")
+                   for c in components):
+                prepend = "always"
+        else:
+            pattern = METASPACE_PATTERN if "Metaspace" in types else WHITESPACE_RUN_PATTERN
+            prepend = "never"
+            for c in components:
+                if c.get("type") == "Prepend":
+                    prepend = "always"
+                elif c.get("type") == "Metaspace" and c.get("add_prefix_space", True):
+                    prepend = c.get("prepend_scheme", "always")
+
+        # Special tokens the post-processor puts in front of every sequence
+        prefix_ids = []
+        post = tokenizer_json.get("post_processor") or {}
+        if post.get("type") == "TemplateProcessing":
+            for piece in post.get("single", []):
+                if "SpecialToken" not in piece:
+                    break
+                token = piece["SpecialToken"]["id"]
+                prefix_ids += post["special_tokens"][token]["ids"]
+
+        # Leading spaces the decoder strips (Metaspace prefix space)
+        strip_left = sum(c.get("start", 0) for c in decoders
+                         if c.get("type") == "Strip" and c.get("content", " ") == " ")
+
+        unk = model.get("unk_token")
+        return {
+            "version": COMPILED_VERSION,
+            "byte_level": byte_level,
+            "vocab": vocab,
+            "merges": merges,
+            "added_tokens": added_tokens,
+            "special_ids": special_ids,
+            "prefix_ids": prefix_ids,
+            "prepend": prepend,
+            "pattern": pattern,
+            "strip_left": strip_left,
+            "unk_id": vocab.get(unk) if unk else None,
+        }
+
+    @staticmethod
+    def _flatten(component: Optional[Dict]) -> List[Dict]:
+        """Flatten Sequence components of a tokenizer.json section."""
+        if not component:
+            return []
+        if component.get("type") == "Sequence":
+            children = component.get("pretokenizers") or component.get("normalizers") \
+                or component.get("decoders") or []
+            return list(chain.from_iterable(BPETokenizer._flatten(c) for c in children))
+        return [component]
+
+    @classmethod
+    def from_file(cls, tokenizer_file: str, cache_size: int = 65536) -> "BPETokenizer":
+        """
+        Load a tokenizer, reusing the compiled form next to the file when fresh.
+
+        Args:
+            tokenizer_file: Path to tokenizer.json
+            cache_size: Maximum number of words kept in the encoding cache
+
+        Returns:
+            BPETokenizer instance
+        """
+        compiled_file = os.path.splitext(tokenizer_file)[0] + ".compiled"
+        stat = os.stat(tokenizer_file)
+        source = (stat.st_size, stat.st_mtime_ns)
+
+        if os.path.exists(compiled_file):
+            try:
+                with open(compiled_file, 'rb') as f:
+                    data = marshal.load(f)
+                if data.get("version") == COMPILED_VERSION and data.get("source") == source:
+                    return cls(data, cache_size=cache_size)
+            except (EOFError, ValueError, TypeError, OSError):
+                pass
+
+        with open(tokenizer_file, 'r', encoding='utf-8') as f:
+            data = cls.compile(json.load(f))
+        data["source"] = source
+
+        try:
+            with open(compiled_file, 'wb') as f:
+                marshal.dump(data, f)
+        except OSError as e:
+            print(f"Failed to save compiled tokenizer: {e}")
+
+        return cls(data, cache_size=cache_size)
+
+    def _build_id_bytes(self) -> List[bytes]:
+        """Precompute the raw bytes each token id decodes to."""
+        size = max(self.vocab.values()) + 1 if self.vocab else 0
+        id_bytes = [b""] * size
+        byte_decoder = {c: b for b, c in bytes_to_unicode().items()}
+        byte_token = re.compile(r"<0x([0-9A-Fa-f]{2})>")
+
+        for token, token_id in self.vocab.items():
+            if token in self.added_tokens:
+                id_bytes[token_id] = token.encode('utf-8')
+            elif self.byte_level:
+                if all(c in byte_decoder for c in token):
+                    id_bytes[token_id] = bytes(byte_decoder[c] for c in token)
+                else:
+                    id_bytes[token_id] = token.encode('utf-8')
+            else:
+                match = byte_token.fullmatch(token)
+                if match:
+                    id_bytes[token_id] = bytes([int(match.group(1), 16)])
+                else:
+                    id_bytes[token_id] = token.replace("▁", " ").encode('utf-8')
+        return id_bytes
+
+    def _bpe(self, word: str) -> Tuple[int, ...]:
+        """
+        Encode a single pre-tokenized word with the merge-rank table.
+
+        Args:
+            word: Pre-tokenized word
+
+        Returns:
+            Tuple of token ids
+        """
+        if self.byte_level:
+            word = word.encode('utf-8').decode('latin-1').translate(self._byte_table)
+
+        whole = self.vocab.get(word)
+        if whole is not None:
+            return (whole,)
+
+        ids = []
+        vocab = self.vocab
+        for char in word:
+            token_id = vocab.get(char)
+            if token_id is not None:
+                ids.append(token_id)
+            elif not self.byte_level and self._byte_fallback[0] is not None:
+                ids.extend(self._byte_fallback[b] for b in char.encode('utf-8'))
+            elif self.unk_id is not None:
+                ids.append(self.unk_id)
+
+        merges = self.merges
+        while len(ids) > 1:
+            best = None
+            for pair in zip(ids, ids[1:]):
+                merge = merges.get(pair)
+                if merge is not None and (best is None or merge[0] < best[0]):
+                    best = merge
+                    best_pair = pair
+            if best is None:
+                break
+
+            left, right = best_pair
+            merged = []
+            i = 0
+            n = len(ids)
+            while i < n:
+                if i < n - 1 and ids[i] == left and ids[i + 1] == right:
+                    merged.append(best[1])
+                    i += 2
+                else:
+                    merged.append(ids[i])
+                    i += 1
+            ids = merged
+
+        return tuple(ids)
+
+    def _encode_text(self, text: str) -> List[int]:
+        """Encode text that contains no added tokens."""
+        if not self.byte_level:
+            text = text.replace(" ", "▁")
+        return list(chain.from_iterable(
+            map(self._encode_word, self._pattern.findall(text))))
+
+    def encode(self, text: str, add_special_tokens: bool = True) -> List[int]:
+        """
+        Convert text to token ids.
+
+        Args:
+            text: Input text
+            add_special_tokens: Prepend the post-processor's prefix tokens (e.g. BOS)
+
+        Returns:
+            List of token ids
+        """
+        ids = list(self.prefix_ids) if add_special_tokens else []
+
+        if self._added_pattern is None:
+            parts = [text]
+        else:
+            parts = self._added_pattern.split(text)
+
+        # Odd positions of the split are added tokens
+        for i, part in enumerate(parts):
+            if i % 2:
+                ids.append(self.added_tokens[part])
+            elif part:
+                if (self.prepend == "always" or (self.prepend == "first" and i == 0)) \
+                        and not part.startswith(" "):
+                    part = " " + part
+                ids.extend(self._encode_text(part))
+        return ids
+
+    def token_bytes(self, token_id: int) -> bytes:
+        """Get the raw bytes a single token decodes to."""
+        if 0 <= token_id < len(self._id_bytes):
+            return self._id_bytes[token_id]
+        return b""
+
+    def decode(self, token_ids: List[int], skip_special_tokens: bool = True) -> str:
+        """
+        Convert token ids back to text.
+
+        Args:
+            token_ids: Token ids
+            skip_special_tokens: Drop special tokens from the output
+
+        Returns:
+            Decoded text
+        """
+        if skip_special_tokens and self.special_ids:
+            token_ids = [t for t in token_ids if t not in self.special_ids]
+        data = b"".join(map(self.token_bytes, token_ids))
+        text = data.decode('utf-8', errors='replace')
+        for _ in range(self.strip_left):
+            if not text.startswith(" "):
+                break
+            text = text[1:]
+        return text
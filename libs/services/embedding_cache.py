@@ -0,0 +1,338 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import unicodedata
+import numpy as np
+from typing import List, Optional
+
+# One index record: SHA-1 of the normalized text, its row in the vector file
+# and the time of its last use (microseconds); record i always describes row i
+INDEX_DTYPE = np.dtype([("digest", "V20"), ("row", "<u4"), ("used", "<u8")])
+USED_OFFSET = INDEX_DTYPE.fields["used"][1]
+
+# Bumped whenever the file layout changes; older files are discarded
+FORMAT_VERSION = 2
+
+# Characters the WordPiece tokenizer turns into a space: " \t\n\r" and
+# Unicode Zs. Other characters \s matches (\x0b, \x0c, \x1c-\x1f, \x85)
+# are control characters the tokenizer drops, so they must not collapse
+_WHITESPACE = re.compile("[ \t\n\r\u00a0\u1680\u2000-\u200a\u202f\u205f\u3000]+")
+
+
+class _ModelStore:
+    """
+    Vectors of one embedding model: an append-only float16 file read through
+    a memory map, and an index of (digest, row, last use) records that is
+    loaded into dicts on open. Uses are written back into the index records
+    in place, so the eviction order survives restarts.
+    """
+
+    def __init__(self, cache_dir: str, model_id: str):
+        prefix = hashlib.sha1(model_id.encode()).hexdigest()[:16]
+        self.model_id = model_id
+        self.meta_file = os.path.join(cache_dir, prefix + ".json")
+        self.vector_file = os.path.join(cache_dir, prefix + ".f16")
+        self.index_file = os.path.join(cache_dir, prefix + ".idx")
+        self.dim = None
+        self.count = 0
+        self.rows = {}
+        self.used = {}
+        self._map = None
+
+        try:
+            with open(self.meta_file, 'r') as f:
+                meta = json.load(f)
+            if meta.get("model_id") != model_id or meta.get("version") != FORMAT_VERSION:
+                raise ValueError("model id or format mismatch")
+            self.dim = int(meta["dim"])
+            self._open()
+        except (OSError, ValueError, KeyError):
+            self.reset()
+
+    @property
+    def row_bytes(self) -> int:
+        return self.dim * 2
+
+    @property
+    def entry_bytes(self) -> int:
+        """Disk use of one entry."""
+        return self.row_bytes + INDEX_DTYPE.itemsize
+
+    @property
+    def total_bytes(self) -> int:
+        """Disk use of the live rows."""
+        return len(self.rows) * self.entry_bytes if self.dim else 0
+
+    def _open(self) -> None:
+        """Load the index, dropping records a crash left without a vector."""
+        size = os.path.getsize(self.vector_file) if os.path.exists(self.vector_file) else 0
+        self.count = size // self.row_bytes
+
+        records = np.empty(0, dtype=INDEX_DTYPE)
+        if os.path.exists(self.index_file):
+            data = np.fromfile(self.index_file, dtype=np.uint8)
+            records = data[:len(data) // INDEX_DTYPE.itemsize * INDEX_DTYPE.itemsize]
+            records = records.view(INDEX_DTYPE)[:self.count]
+        digests = records["digest"].tobytes()
+        for i, (row, used) in enumerate(zip(records["row"].tolist(),
+                                            records["used"].tolist())):
+            digest = digests[i * 20:(i + 1) * 20]
+            self.rows[digest] = row
+            self.used[digest] = used
+
+        # Keep record i describing row i: drop vectors and records without a partner
+        if len(records) < self.count or size % self.row_bytes:
+            with open(self.vector_file, 'r+b') as f:
+                f.truncate(len(records) * self.row_bytes)
+        if os.path.exists(self.index_file) and \
+                os.path.getsize(self.index_file) != len(records) * INDEX_DTYPE.itemsize:
+            with open(self.index_file, 'r+b') as f:
+                f.truncate(len(records) * INDEX_DTYPE.itemsize)
+        self.count = len(records)
+
+    def reset(self, dim: Optional[int] = None) -> None:
+        """Delete the stored vectors and start over with the given dimension."""
+        self._map = None
+        for path in (self.vector_file, self.index_file, self.meta_file):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.dim = dim
+        self.count = 0
+        self.rows = {}
+        self.used = {}
+        if dim is not None:
+            with open(self.meta_file, 'w') as f:
+                json.dump({"model_id": self.model_id, "dim": dim,
+                           "version": FORMAT_VERSION}, f)
+
+    def read(self, rows: List[int]) -> np.ndarray:
+        """Vectors of the given rows as float32."""
+        if self._map is None or self._map.shape[0] < self.count:
+            self._map = np.memmap(self.vector_file, dtype=np.float16, mode='r',
+                                  shape=(self.count, self.dim))
+        return self._map[rows].astype(np.float32)
+
+    def touch(self, digests: List[bytes], used: int) -> None:
+        """Record a use of the given entries in memory and in the index file."""
+        rows = sorted(self.rows[digest] for digest in digests)
+        stamp = np.array(used, dtype="<u8").tobytes()
+        with open(self.index_file, 'r+b') as f:
+            for row in rows:
+                f.seek(row * INDEX_DTYPE.itemsize + USED_OFFSET)
+                f.write(stamp)
+        for digest in digests:
+            self.used[digest] = used
+
+    def append(self, digests: List[bytes], vectors: np.ndarray, used: int) -> None:
+        """Append new vectors and their index records."""
+        records = np.empty(len(digests), dtype=INDEX_DTYPE)
+        records["digest"] = [np.void(digest) for digest in digests]
+        records["row"] = np.arange(self.count, self.count + len(digests))
+        records["used"] = used
+
+        # Vectors first: an index record never points past the vector file
+        with open(self.vector_file, 'ab') as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float16).tobytes())
+        with open(self.index_file, 'ab') as f:
+            f.write(records.tobytes())
+        for digest, row in zip(digests, records["row"].tolist()):
+            self.rows[digest] = row
+            self.used[digest] = used
+        self.count += len(digests)
+
+    def compact(self, keep: List[bytes]) -> None:
+        """Rewrite both files with only the given entries, in their stored order."""
+        keep = sorted(keep, key=self.rows.__getitem__)
+        vectors = self.read([self.rows[digest] for digest in keep]) if keep else \
+            np.empty((0, self.dim), dtype=np.float32)
+        records = np.empty(len(keep), dtype=INDEX_DTYPE)
+        records["digest"] = [np.void(digest) for digest in keep]
+        records["row"] = np.arange(len(keep))
+        records["used"] = [self.used[digest] for digest in keep]
+
+        # Release the map so the vector file can be replaced on every platform
+        self._map = None
+        for path, data in ((self.vector_file, vectors.astype(np.float16).tobytes()),
+                           (self.index_file, records.tobytes())):
+            partial = path + ".partial"
+            with open(partial, 'wb') as f:
+                f.write(data)
+            os.replace(partial, path)
+        self.rows = {digest: row for row, digest in enumerate(keep)}
+        self.used = {digest: self.used[digest] for digest in keep}
+        self.count = len(keep)
+
+
+class EmbeddingCache:
+    """
+    Persistent content-addressed cache of text embeddings.
+    Entries are keyed by the embedding model id and the SHA-1 of the
+    normalized text, so re-uploaded documents, re-chunked text and repeated
+    questions skip the encoder. Each model's vectors live in an append-only
+    float16 file read through a memory map, next to a compact index of
+    20-byte digests, row numbers and last-use times. The budget covers every
+    model's files in the cache directory; when it is exceeded the least
+    recently used entries, of any model, are dropped by rewriting the files.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory holding the vector and index files
+            max_bytes: Disk budget for all models
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._stores = {}
+        self._clock = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """NFC form with runs of the tokenizer's whitespace collapsed."""
+        return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+    @classmethod
+    def digest(cls, text: str) -> bytes:
+        """SHA-1 of the normalized text."""
+        return hashlib.sha1(cls.normalize(text).encode("utf-8")).digest()
+
+    def _tick(self) -> int:
+        """Use time in microseconds, strictly increasing within this process."""
+        self._clock = max(self._clock + 1, time.time_ns() // 1000)
+        return self._clock
+
+    def _store(self, model_id: str) -> _ModelStore:
+        store = self._stores.get(model_id)
+        if store is None:
+            store = _ModelStore(self.cache_dir, model_id)
+            self._stores[model_id] = store
+        return store
+
+    def _open_all(self) -> None:
+        """Open the store of every model with files in the cache directory."""
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.cache_dir, name), 'r') as f:
+                    model_id = json.load(f)["model_id"]
+            except (OSError, ValueError, KeyError):
+                continue
+            self._store(model_id)
+
+    @property
+    def total_bytes(self) -> int:
+        """Disk use of the vector and index files of every model in the directory."""
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith((".f16", ".idx")):
+                total += entry.stat().st_size
+        return total
+
+    def get(self, model_id: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up the embeddings of several texts.
+
+        Args:
+            model_id: Embedding model id (include anything that changes the vectors)
+            texts: Input texts
+
+        Returns:
+            Float32 vector per text, or None where the text is not cached
+        """
+        digests = [self.digest(text) for text in texts]
+        results = [None] * len(texts)
+        with self._lock:
+            store = self._store(model_id)
+            found = [i for i, digest in enumerate(digests) if digest in store.rows]
+            if found:
+                vectors = store.read([store.rows[digests[i]] for i in found])
+                for i, vector in zip(found, vectors):
+                    results[i] = vector
+                try:
+                    store.touch(list({digests[i] for i in found}), self._tick())
+                except OSError as e:
+                    print(f"Failed to record embedding cache use: {e}")
+            self.hits += len(found)
+            self.misses += len(texts) - len(found)
+        return results
+
+    def put(self, model_id: str, texts: List[str], vectors: np.ndarray) -> None:
+        """
+        Store the embeddings of several texts.
+
+        Args:
+            model_id: Embedding model id
+            texts: Input texts
+            vectors: Embeddings (len(texts) x dim)
+        """
+        vectors = np.asarray(vectors)
+        with self._lock:
+            store = self._store(model_id)
+            if store.dim != vectors.shape[1]:
+                store.reset(vectors.shape[1])
+
+            new, rows, seen = [], [], set()
+            for i, text in enumerate(texts):
+                digest = self.digest(text)
+                if digest not in store.rows and digest not in seen:
+                    new.append(digest)
+                    rows.append(i)
+                    seen.add(digest)
+            if not new:
+                return
+            try:
+                store.append(new, vectors[rows], self._tick())
+            except OSError as e:
+                print(f"Failed to cache embeddings: {e}")
+                return
+
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Keep the most recently used entries within three quarters of the budget."""
+        self._open_all()
+        entries = sorted(((used, model_id, digest) for model_id, store in self._stores.items()
+                          for digest, used in store.used.items()), reverse=True)
+        budget = self.max_bytes * 3 // 4
+        keep = {model_id: [] for model_id in self._stores}
+        for _, model_id, digest in entries:
+            size = self._stores[model_id].entry_bytes
+            if size > budget:
+                break
+            budget -= size
+            keep[model_id].append(digest)
+
+        for model_id, store in self._stores.items():
+            if len(keep[model_id]) == len(store.rows):
+                continue
+            try:
+                store.compact(keep[model_id])
+            except OSError as e:
+                print(f"Failed to compact embedding cache: {e}")
+
+    def clear(self) -> None:
+        """Delete every entry of every model."""
+        with self._lock:
+            for store in self._stores.values():
+                store.reset()
+            self._stores = {}
+            for name in os.listdir(self.cache_dir):
+                if name.endswith((".f16", ".idx", ".json")):
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                    except OSError:
+                        pass
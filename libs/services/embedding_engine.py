@@ -1,109 +1,266 @@
 import os
 import json
 import numpy as np
-from typing import Optional
+from typing import Callable, List, Optional, Tuple
+from libs.services.embedding_cache import EmbeddingCache
+from libs.services.onnx_session import SessionConfig, create_session
+from libs.services.profiler import Profiler
+from libs.services.wordpiece_tokenizer import WordPieceTokenizer
 
 class EmbeddingEngine:
     """
     ONNX-based embedding engine for text vectorization.
     Uses MiniLM-L6-v2 model for generating embeddings.
+    Texts are sorted by token length and encoded in buckets, each padded
+    only to its own longest member, with one session.run per bucket
+    followed by mean pooling and L2 normalization. Texts found in an
+    enabled EmbeddingCache skip the encoder altogether.
     """
     
-    def __init__(self, model_path: str = "embeddings/minilm-l6-v2"):
+    def __init__(self, model_path: str = "embeddings/minilm-l6-v2",
+                 cache_dir: Optional[str] = None,
+                 session_config: Optional[SessionConfig] = None,
+                 batch_size: int = 32, max_length: int = 256):
         """
         Initialize the embedding engine.
         
         Args:
             model_path: Path to embedding model directory
+            cache_dir: Directory for pre-optimized models (None optimizes on every load)
+            session_config: Thread topology shared with the LLM session
+            batch_size: Maximum texts per session.run
+            max_length: Tokens per text including [CLS] and [SEP]; longer texts are truncated
         """
         self.model_path = model_path
+        self.cache_dir = cache_dir
+        self.session_config = session_config
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.load_info = None
+        self.profiler = None
+        self.cache = None
+        self.model_id = None
         self.session = None
+        self.tokenizer = None
         self.embedding_dim = 384  # MiniLM-L6-v2 dimension
         self.is_loaded = False
+        
+        # Encoder IO discovered from the session
+        self._input_names = set()
+        self._output_name = None
+        self._pooled = False
     
     def load(self) -> bool:
-        """Load the ONNX embedding model."""
+        """Load the ONNX embedding model and its tokenizer."""
         try:
-            import onnxruntime as ort
-            
             model_file = os.path.join(self.model_path, "model.onnx")
             if not os.path.exists(model_file):
                 print(f"Embedding model not found: {model_file}")
                 return False
             
-            # Create ONNX session
-            session_options = ort.SessionOptions()
-            session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            # Create ONNX session, reusing the optimized graph from a previous launch
+            self.session, self.load_info = create_session(model_file, self.cache_dir,
+                                                          self.session_config)
+            print(f"Embedding session ready in {self.load_info['seconds']:.2f}s "
+                  f"(optimized cache {'hit' if self.load_info['cache_hit'] else 'miss'})")
             
-            self.session = ort.InferenceSession(
-                model_file,
-                sess_options=session_options,
-                providers=['CPUExecutionProvider']
-            )
+            self.tokenizer = WordPieceTokenizer.from_model_dir(self.model_path)
+            self._setup_io()
+            self.model_id = self._cache_model_id(model_file)
             
             self.is_loaded = True
             return True
-            
+        
         except Exception as e:
             print(f"Failed to load embedding model: {e}")
             return False
     
+    def _setup_io(self) -> None:
+        """
+        Find the encoder inputs and the output to pool.
+        Sentence-transformers exports with a `sentence_embedding` output are
+        already pooled; otherwise the token states are mean pooled here.
+        """
+        self._input_names = {inp.name for inp in self.session.get_inputs()}
+        outputs = self.session.get_outputs()
+        names = [out.name for out in outputs]
+        
+        self._pooled = "sentence_embedding" in names
+        self._output_name = "sentence_embedding" if self._pooled else \
+            ("last_hidden_state" if "last_hidden_state" in names else names[0])
+        
+        dim = outputs[names.index(self._output_name)].shape[-1]
+        if not isinstance(dim, int):
+            config_file = os.path.join(self.model_path, "config.json")
+            if os.path.exists(config_file):
+                with open(config_file, 'r') as f:
+                    dim = json.load(f).get("hidden_size")
+        if isinstance(dim, int):
+            self.embedding_dim = dim
+    
+    def _cache_model_id(self, model_file: str) -> str:
+        """
+        Embedding cache id covering everything that changes the vectors:
+        the model name, the size and mtime of its weights and the truncation length.
+        """
+        stat = os.stat(model_file)
+        return json.dumps([os.path.basename(os.path.normpath(self.model_path)),
+                           stat.st_size, stat.st_mtime_ns, self.max_length])
+    
+    def enable_cache(self, cache: Optional[EmbeddingCache]) -> None:
+        """
+        Look texts up in a persistent embedding cache before running the encoder.
+        
+        Args:
+            cache: EmbeddingCache, e.g. under StorageManager.embedding_cache_dir
+                (None disables caching)
+        """
+        self.cache = cache
+    
     def encode(self, text: str) -> Optional[np.ndarray]:
         """
         Encode text to embedding vector.
         
         Args:
             text: Input text
-            
+        
         Returns:
             Embedding vector (384-dim for MiniLM)
         """
+        embeddings = self.encode_batch([text])
+        return embeddings[0] if embeddings is not None else None
+    
+    def encode_batch(self, texts: List[str],
+                     encoder: Optional[Callable[[List[str]], np.ndarray]] = None
+                     ) -> Optional[np.ndarray]:
+        """
+        Encode multiple texts to embeddings.
+        
+        Args:
+            texts: List of input texts
+            encoder: Runs the model on the texts missing from the cache
+                (run_encoder by default; EmbeddingWorkers passes its sharded one)
+        
+        Returns:
+            Array of L2-normalized embeddings (N x 384) in input order
+        """
+        if not texts:
+            return None
         if not self.is_loaded:
             print("Model not loaded")
             return None
         
+        encoder = encoder or self.run_encoder
         try:
-            # TODO: Implement actual tokenization and encoding
-            # For now, return a mock embedding
-            # In production, this would:
-            # 1. Tokenize the text
-            # 2. Run through ONNX session
-            # 3. Return the embedding vector
-            
-            # Mock embedding (random normalized vector)
-            embedding = np.random.randn(self.embedding_dim).astype(np.float32)
-            embedding = embedding / np.linalg.norm(embedding)
-            
-            return embedding
+            if self.cache is None:
+                return encoder(texts)
             
+            cached = self.cache.get(self.model_id, texts)
+            missing = [i for i, vector in enumerate(cached) if vector is None]
+            embeddings = np.empty((len(texts), self.embedding_dim), dtype=np.float32)
+            for i, vector in enumerate(cached):
+                if vector is not None:
+                    embeddings[i] = vector
+            if missing:
+                computed = encoder([texts[i] for i in missing])
+                embeddings[missing] = computed
+                self.cache.put(self.model_id, [texts[i] for i in missing], computed)
+            return embeddings
+        
         except Exception as e:
             print(f"Encoding failed: {e}")
             return None
     
-    def encode_batch(self, texts: list) -> Optional[np.ndarray]:
+    def run_encoder(self, texts: List[str]) -> np.ndarray:
         """
-        Encode multiple texts to embeddings.
+        Run the encoder on texts in length-sorted buckets, bypassing the cache.
         
         Args:
             texts: List of input texts
-            
+        
         Returns:
-            Array of embeddings (N x 384)
+            Array of L2-normalized embeddings (N x embedding_dim) in input order
         """
-        if not texts:
-            return None
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.mark()
+        words = [self.tokenizer.word_ids(text) for text in texts]
+        lengths = self.tokenizer.sequence_lengths(words, self.max_length)
+        if profiler is not None:
+            profiler.lap("tokenize")
         
-        embeddings = []
-        for text in texts:
-            emb = self.encode(text)
-            if emb is not None:
-                embeddings.append(emb)
+        # Neighbours in length order share a bucket, so padding stays small
+        order = np.argsort(lengths, kind="stable").tolist()
+        embeddings = np.empty((len(texts), self.embedding_dim), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            bucket = order[start:start + self.batch_size]
+            embeddings[bucket] = self._encode_bucket([words[i] for i in bucket])
+            if profiler is not None:
+                profiler.end_step()
+        return embeddings
+    
+    def _encode_bucket(self, words: List[List[Tuple[int, ...]]]) -> np.ndarray:
+        """
+        Run the encoder on one bucket of tokenized texts.
         
-        if embeddings:
-            return np.array(embeddings)
-        return None
+        Args:
+            words: Per text, the token ids of each word (from word_ids()),
+                packed here and padded to the longest text
+        
+        Returns:
+            Normalized embeddings (len(words), embedding_dim)
+        """
+        profiler = self.profiler
+        input_ids, attention_mask = self.tokenizer.pack(words, self.max_length)
+        
+        feeds = {"input_ids": input_ids}
+        if "attention_mask" in self._input_names:
+            feeds["attention_mask"] = attention_mask
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        if profiler is not None:
+            profiler.lap("pad")
+        
+        output = self.session.run([self._output_name], feeds)[0]
+        if profiler is not None:
+            profiler.lap("inference")
+        
+        if self._pooled:
+            pooled = output.astype(np.float32)
+        else:
+            # Mean over real tokens only
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (output * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        pooled /= np.maximum(norms, 1e-12)
+        if profiler is not None:
+            profiler.lap("pooling")
+        return pooled
+    
+    def enable_profiler(self, profiler: Optional[Profiler]) -> None:
+        """
+        Time tokenization, padding, inference and pooling and report every
+        encoded bucket.
+        
+        Args:
+            profiler: Profiler to record into (None turns timing off)
+        """
+        self.profiler = profiler
+    
+    def end_profiling(self) -> Optional[str]:
+        """
+        Stop the ONNX Runtime profiler enabled through
+        SessionConfig.profile_dir and write its trace.
+        
+        Returns:
+            Path of the Chrome trace JSON file, or None if profiling is off
+        """
+        if self.session is None or not self.session.get_session_options().enable_profiling:
+            return None
+        return self.session.end_profiling()
     
     def unload(self) -> None:
         """Unload the model to free memory."""
         self.session = None
+        self.tokenizer = None
         self.is_loaded = False
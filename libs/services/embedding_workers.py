@@ -0,0 +1,182 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+from libs.services.embedding_engine import EmbeddingEngine
+from libs.services.engine_pool import EnginePool, estimate_engine_bytes
+from libs.services.onnx_session import SessionConfig
+
+MODES = ("thread", "process")
+
+# Engine owned by a worker process (set by _init_worker)
+_worker_engine = None
+
+
+def process_mode_supported() -> bool:
+    """
+    Whether worker processes may be spawned here. Inside the Android and
+    iOS app a spawned child would start a second interpreter without the
+    app's bootstrap, so only desktop builds use process mode.
+    """
+    if "ANDROID_ARGUMENT" in os.environ or "ANDROID_PRIVATE" in os.environ:
+        return False
+    return os.environ.get("KIVY_BUILD") not in ("android", "ios")
+
+
+def worker_session_config(base: Optional[SessionConfig], num_workers: int,
+                          cpu_count: Optional[int] = None) -> SessionConfig:
+    """
+    Session configuration that splits the cores evenly between workers.
+    It only takes effect in a process without ONNX Runtime's global pool,
+    such as a process-mode worker; once the app has created the global
+    pool every session shares it and the split is ignored.
+
+    Args:
+        base: Configuration to start from (defaults to SessionConfig())
+        num_workers: Concurrent encoder runs
+        cpu_count: Cores to divide (os.cpu_count() by default)
+
+    Returns:
+        Copy of `base` with per-session threads and intra_op_threads set
+    """
+    values = (base or SessionConfig()).to_dict()
+    values["intra_op_threads"] = max(1, (cpu_count or os.cpu_count() or 1) // num_workers)
+    values["use_global_thread_pool"] = False
+    return SessionConfig.from_dict(values)
+
+
+def _init_worker(model_path: str, cache_dir: Optional[str], config: Dict,
+                 batch_size: int, max_length: int) -> None:
+    """Load one embedding session per worker process."""
+    global _worker_engine
+    _worker_engine = EmbeddingEngine(model_path, cache_dir=cache_dir,
+                                     session_config=SessionConfig.from_dict(config),
+                                     batch_size=batch_size, max_length=max_length)
+    if not _worker_engine.load():
+        raise RuntimeError(f"Embedding worker failed to load {model_path}")
+
+
+def _encode_shard(texts: List[str]) -> np.ndarray:
+    return _worker_engine.run_encoder(texts)
+
+
+class EmbeddingWorkers:
+    """
+    Shards bulk ingestion across several embedding workers.
+    In "thread" mode (the default) the workers share the engine's session
+    as it was loaded; run() releases the GIL, but inside the app that
+    session uses the global thread pool, whose size cannot change per
+    worker, so thread mode only helps when the pool leaves cores idle.
+    In "process" mode each spawned worker loads its own session with its
+    share of the cores from worker_session_config(). That is only allowed
+    where process_mode_supported(), and every worker holds another copy of
+    the model, so the workers must fit in the engine pool's free budget;
+    otherwise thread mode is used. Chunks are sorted by length before
+    sharding so each shard pads little, and results come back in input
+    order. Cache lookups and writes stay in the calling process.
+    """
+
+    def __init__(self, engine: EmbeddingEngine, num_workers: int = 2, mode: str = "thread",
+                 shard_size: Optional[int] = None, pool: Optional[EnginePool] = None):
+        """
+        Initialize the workers.
+
+        Args:
+            engine: Loaded engine; shared in thread mode, the template for
+                each worker's session in process mode
+            num_workers: Concurrent encoder runs
+            mode: "thread" or "process"
+            shard_size: Texts per task (defaults to the engine's batch size)
+            pool: Engine pool whose budget process workers are counted against
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown worker mode: {mode}")
+        self.engine = engine
+        self.num_workers = max(1, num_workers)
+        self.mode = mode
+        self.shard_size = shard_size or engine.batch_size
+        self.pool = pool
+        self._executor = None
+        self._pool = None
+
+        if mode == "process" and not process_mode_supported():
+            print("Embedding worker processes are not supported here, using threads")
+            self.mode = "thread"
+
+    def _affordable_processes(self) -> int:
+        """Worker processes whose model copies fit in the pool's free budget."""
+        if self.pool is None:
+            return self.num_workers
+        size = estimate_engine_bytes(self.engine)
+        if not size:
+            return self.num_workers
+        free = self.pool.budget_bytes - self.pool.resident_bytes
+        return min(self.num_workers, max(0, free) // size)
+
+    def start(self) -> None:
+        """Start the workers (process workers load their sessions here)."""
+        if self.mode == "process" and self._pool is None:
+            workers = self._affordable_processes()
+            if workers < 2:
+                print(f"Memory budget fits {workers} embedding worker processes, using threads")
+                self.mode = "thread"
+            else:
+                self.num_workers = workers
+
+        if self.mode == "thread":
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.num_workers,
+                                                    thread_name_prefix="embedding")
+        elif self._pool is None:
+            import multiprocessing
+            engine = self.engine
+            config = worker_session_config(engine.session_config, self.num_workers)
+            self._pool = multiprocessing.get_context("spawn").Pool(
+                self.num_workers, initializer=_init_worker,
+                initargs=(engine.model_path, engine.cache_dir, config.to_dict(),
+                          engine.batch_size, engine.max_length))
+
+    def encode_batch(self, texts: List[str]) -> Optional[np.ndarray]:
+        """
+        Encode many texts on the workers, serving cached ones directly.
+
+        Args:
+            texts: List of input texts
+
+        Returns:
+            Array of L2-normalized embeddings (N x embedding_dim) in input order
+        """
+        return self.engine.encode_batch(texts, encoder=self._encode_sharded)
+
+    def _encode_sharded(self, texts: List[str]) -> np.ndarray:
+        """Encode texts in length-sorted shards and restore their order."""
+        self.start()
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        shards = [[texts[i] for i in order[start:start + self.shard_size]]
+                  for start in range(0, len(order), self.shard_size)]
+
+        if self.mode == "thread":
+            results = self._executor.map(self.engine.run_encoder, shards)
+        else:
+            results = self._pool.imap(_encode_shard, shards)
+
+        embeddings = np.empty((len(texts), self.engine.embedding_dim), dtype=np.float32)
+        embeddings[order] = np.concatenate(list(results))
+        return embeddings
+
+    def close(self) -> None:
+        """Stop the workers."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self) -> "EmbeddingWorkers":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,433 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# Share of the budget basis the pool may fill with model engines
+BUDGET_FRACTION = 0.5
+
+# Resident memory per byte of loaded weights (session arena, activations);
+# KV and prefix buffers are counted separately
+WEIGHT_OVERHEAD = 1.2
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process (0 where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def device_ram_bytes() -> int:
+    """Total device RAM (0 where /proc/meminfo is unavailable)."""
+    try:
+        with open("/proc/meminfo", 'r') as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def memory_budget_bytes(min_ram_gb: float, device_bytes: Optional[int] = None) -> int:
+    """
+    Default engine budget for a model's `min_ram_gb` requirement.
+    The model list sizes each model for a device with `min_ram_gb` of RAM;
+    the pool may use half of that, or half of the device's RAM if smaller.
+
+    Args:
+        min_ram_gb: Minimum device RAM the selected model is rated for
+        device_bytes: Total device RAM (read from /proc/meminfo if None)
+
+    Returns:
+        Budget in bytes
+    """
+    basis = int(min_ram_gb * 1024 ** 3)
+    device_bytes = device_ram_bytes() if device_bytes is None else device_bytes
+    if device_bytes:
+        basis = min(basis, device_bytes)
+    return int(basis * BUDGET_FRACTION)
+
+
+def weight_file(engine) -> Optional[str]:
+    """Weight file an engine loads (or has loaded), if it can be found."""
+    path = getattr(engine, "_loaded_model_file", None) or getattr(engine, "model_file", None)
+    if path:
+        return path
+    path = getattr(engine, "model_path", None)
+    if not path or os.path.isfile(path):
+        return path
+    if os.path.isdir(path):
+        from libs.services.model_manager import find_model_file
+        found = find_model_file(path)
+        if found:
+            return found
+        path = os.path.join(path, "model.onnx")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def estimate_engine_bytes(engine) -> int:
+    """
+    Predict the resident size of an engine.
+    Only the weight file the engine loads is counted, not the other variants
+    installed next to it, plus the KV and prefix buffers it has allocated.
+
+    Args:
+        engine: Engine with a `model_file` or `model_path`
+
+    Returns:
+        Estimated bytes once loaded
+    """
+    total = 0
+    path = weight_file(engine)
+    if path and os.path.isfile(path):
+        total += int(os.path.getsize(path) * WEIGHT_OVERHEAD)
+
+    kv_cache = getattr(engine, "kv_cache", None)
+    if kv_cache is not None:
+        total += kv_cache.nbytes
+    binding = getattr(engine, "decode_binding", None)
+    if binding is not None:
+        total += binding.nbytes
+    prefix_cache = getattr(engine, "prefix_cache", None)
+    if prefix_cache is not None:
+        total += prefix_cache.total_bytes
+    return total
+
+
+class _PoolEntry:
+    """An engine managed by the pool."""
+
+    def __init__(self, key: str, factory: Callable, group: Optional[str],
+                 size_bytes: Optional[int], source: Optional[str]):
+        self.key = key
+        self.factory = factory
+        self.group = group
+        self.source = source
+        self.engine = None
+        self.size_bytes = size_bytes or 0
+        self.fixed_size = size_bytes is not None
+        self.users = 0
+        # Borrow count per thread, to refuse waits that would deadlock
+        self.threads = {}
+        # Unload as soon as the last borrower releases the engine
+        self.stale = False
+        self.loads = 0
+        self.failures = 0
+        # Set while a thread is loading the engine outside the pool lock
+        self.loading: Optional[threading.Event] = None
+
+
+class EnginePool:
+    """
+    Loads model engines (ONNXInferenceEngine, EmbeddingEngine, VoiceRecognizer)
+    on demand within a RAM budget.
+    Least-recently-used engines are unloaded to make room and are reloaded
+    transparently the next time they are requested. Engines in the same
+    exclusive group (e.g. "llm") are never resident together: a load waits
+    until a borrowed group member is released and evicted. An engine is
+    never unloaded while borrowed through `use()`; unloading or
+    re-registering it only marks it, and it is unloaded on release.
+    """
+
+    def __init__(self, budget_bytes: int):
+        """
+        Initialize the pool.
+
+        Args:
+            budget_bytes: Memory the loaded engines may use together
+        """
+        self.budget_bytes = budget_bytes
+        self._entries: Dict[str, _PoolEntry] = {}
+        # Loaded keys, least recently used first
+        self._lru = OrderedDict()
+        # Replaced registrations whose engine is still borrowed
+        self._retired: List[_PoolEntry] = []
+        self._lock = threading.RLock()
+        # Notified whenever a borrowed engine is released
+        self._released = threading.Condition(self._lock)
+
+    @property
+    def resident_bytes(self) -> int:
+        """Estimated memory held by loaded engines."""
+        with self._lock:
+            return sum(entry.size_bytes for entry in self._resident())
+
+    def _resident(self) -> List[_PoolEntry]:
+        """Entries whose engine is loaded, including retired ones."""
+        return [self._entries[key] for key in self._lru] + self._retired
+
+    @property
+    def loaded_keys(self) -> List[str]:
+        """Keys of loaded engines, least recently used first."""
+        with self._lock:
+            return list(self._lru)
+
+    def register(self, key: str, factory: Callable, group: Optional[str] = None,
+                 size_bytes: Optional[int] = None, source: Optional[str] = None) -> None:
+        """
+        Make an engine available without loading it.
+
+        Args:
+            key: Name used to request the engine
+            factory: Creates a fresh, unloaded engine
+            group: Exclusive group; loading evicts other engines of the group
+            size_bytes: Known resident size (estimated and measured if None)
+            source: What the factory loads, e.g. the weight file path
+        """
+        with self._lock:
+            old = self._entries.get(key)
+            if old is not None and key in self._lru and old.users:
+                # Still borrowed: unloaded when released (see use())
+                del self._lru[key]
+                old.stale = True
+                self._retired.append(old)
+            elif old is not None:
+                self.unload(key)
+            self._entries[key] = _PoolEntry(key, factory, group, size_bytes, source)
+
+    def is_registered(self, key: str, source: Optional[str] = None) -> bool:
+        """
+        Check whether an engine has been registered.
+
+        Args:
+            key: Engine name
+            source: If given, the registration must also load this source
+
+        Returns:
+            True if registered (from `source`, when given)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (source is None or entry.source == source)
+
+    def is_loaded(self, key: str) -> bool:
+        """Check whether an engine is currently resident."""
+        with self._lock:
+            return key in self._lru
+
+    def get(self, key: str):
+        """
+        Get a loaded engine, loading it and evicting others if needed.
+        The load runs outside the pool lock, so other engines stay usable
+        meanwhile; concurrent requests for the same engine wait for the one
+        load. Prefer `use()` while running the engine so it cannot be
+        evicted by another thread mid-call.
+
+        Args:
+            key: Registered engine name
+
+        Returns:
+            Loaded engine, or None if it failed to load
+        """
+        while True:
+            with self._lock:
+                entry = self._entries[key]
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    # Requested again, so no longer due for unloading
+                    entry.stale = False
+                    return entry.engine
+                loading = entry.loading
+                if loading is None:
+                    entry.loading = threading.Event()
+                    break
+                failures = entry.failures
+
+            loading.wait()
+            with self._lock:
+                if self._entries.get(key) is entry and entry.failures > failures:
+                    return None
+        return self._load(key, entry)
+
+    def _load(self, key: str, entry: _PoolEntry):
+        """Load `entry` without holding the lock; restore evictions on failure."""
+        engine = None
+        evicted = []
+        try:
+            engine = entry.factory()
+            with self._lock:
+                if not self._wait_for_group(key, entry):
+                    raise RuntimeError(f"another {entry.group} engine is in use by this thread")
+                if not entry.fixed_size:
+                    entry.size_bytes = estimate_engine_bytes(engine)
+                evicted = self._make_room(key, entry)
+
+            rss_before = current_rss_bytes()
+            loaded = engine.load()
+            if loaded and not entry.fixed_size:
+                measured = current_rss_bytes() - rss_before
+                entry.size_bytes = max(estimate_engine_bytes(engine), measured)
+        except Exception as e:
+            print(f"Engine pool error loading {key}: {e}")
+            loaded = False
+
+        with self._lock:
+            entry.loading.set()
+            entry.loading = None
+            if loaded and self._entries.get(key) is entry:
+                entry.engine = engine
+                entry.loads += 1
+                self._lru[key] = True
+                return engine
+            entry.failures += 1
+
+        if loaded:
+            # Re-registered while loading; the new entry loads on request
+            engine.unload()
+            return None
+
+        print(f"Engine pool failed to load {key}")
+        for other in evicted:
+            if self.is_registered(other):
+                self.get(other)
+        return None
+
+    @contextmanager
+    def use(self, key: str):
+        """
+        Borrow an engine; it is protected from eviction until the block exits.
+
+        Args:
+            key: Registered engine name
+
+        Yields:
+            Loaded engine, or None if it failed to load
+        """
+        while True:
+            engine = self.get(key)
+            if engine is None:
+                break
+            with self._lock:
+                entry = self._entries.get(key)
+                # Evicted again before it could be borrowed; load it again
+                if key in self._lru and entry.engine is engine:
+                    entry.users += 1
+                    thread = threading.get_ident()
+                    entry.threads[thread] = entry.threads.get(thread, 0) + 1
+                    break
+        try:
+            yield engine
+        finally:
+            if engine is not None:
+                with self._lock:
+                    self._release(entry)
+
+    def _release(self, entry: _PoolEntry) -> None:
+        """Return a borrowed engine, unloading it if it was marked meanwhile."""
+        entry.users -= 1
+        thread = threading.get_ident()
+        entry.threads[thread] -= 1
+        if not entry.threads[thread]:
+            del entry.threads[thread]
+
+        if not entry.users and entry.stale:
+            if entry in self._retired:
+                self._retired.remove(entry)
+                entry.engine.unload()
+                entry.engine = None
+            elif self._entries.get(entry.key) is entry:
+                self.unload(entry.key)
+        self._trim()
+        self._released.notify_all()
+
+    def _wait_for_group(self, key: str, entry: _PoolEntry) -> bool:
+        """
+        Wait until no other member of `entry`'s group is borrowed; borrowed
+        members are marked so they are unloaded when released.
+
+        Returns:
+            False if the calling thread itself borrows a member (waiting
+            would never end)
+        """
+        if entry.group is None:
+            return True
+        thread = threading.get_ident()
+        while True:
+            busy = [other for other in self._resident()
+                    if other is not entry and other.group == entry.group and other.users]
+            if not busy:
+                return True
+            if any(thread in other.threads for other in busy):
+                return False
+            for other in busy:
+                other.stale = True
+            self._released.wait()
+
+    def _loading_bytes(self, key: str) -> int:
+        """Estimated memory of engines other than `key` being loaded."""
+        return sum(entry.size_bytes for other, entry in self._entries.items()
+                   if entry.loading is not None and other != key)
+
+    def _make_room(self, key: str, entry: _PoolEntry) -> List[str]:
+        """
+        Evict group members, then LRU engines, until `entry` fits.
+
+        Returns:
+            Keys of the evicted engines
+        """
+        evicted = []
+        if entry.group is not None:
+            for other in list(self._lru):
+                if self._entries[other].group == entry.group and not self._entries[other].users:
+                    self.unload(other)
+                    evicted.append(other)
+
+        required = entry.size_bytes + self._loading_bytes(key)
+        for other in list(self._lru):
+            if self.resident_bytes + required <= self.budget_bytes:
+                return evicted
+            if not self._entries[other].users:
+                self.unload(other)
+                evicted.append(other)
+
+        if self.resident_bytes + required > self.budget_bytes:
+            print(f"Engine pool over budget loading {key}: "
+                  f"{(self.resident_bytes + required) / 1e6:.0f} MB "
+                  f"> {self.budget_bytes / 1e6:.0f} MB")
+        return evicted
+
+    def _trim(self) -> None:
+        """Evict idle LRU engines while the pool is over budget."""
+        for other in list(self._lru):
+            if self.resident_bytes <= self.budget_bytes:
+                return
+            if not self._entries[other].users:
+                self.unload(other)
+
+    def unload(self, key: str) -> bool:
+        """
+        Unload an engine; it reloads on the next request.
+        A borrowed engine is only marked and is unloaded when released.
+
+        Returns:
+            True if the engine was unloaded now
+        """
+        with self._lock:
+            if key not in self._lru:
+                return False
+            entry = self._entries[key]
+            if entry.users:
+                entry.stale = True
+                return False
+            del self._lru[key]
+            entry.stale = False
+            entry.engine.unload()
+            entry.engine = None
+            return True
+
+    def unload_all(self) -> None:
+        """
+        Unload every engine, e.g. when the app goes to the background;
+        borrowed engines are unloaded when released.
+        """
+        with self._lock:
+            for key in list(self._lru):
+                self.unload(key)
@@ -0,0 +1,145 @@
+import os
+import json
+import hashlib
+import numpy as np
+from typing import Dict, List, Optional
+
+class GenerationCache:
+    """
+    Size-bounded on-disk LRU cache of generated text for deterministic
+    requests (greedy decoding or a fixed seed).
+    Entries are keyed by the model, a fingerprint of its files, the hash of
+    the tokenized prompt and the sampling parameters, so replacing any
+    model file invalidates its entries automatically. Each entry keeps the
+    streamed chunks so a hit can be replayed through a streaming callback.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 32 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory holding one JSON file per entry
+            max_bytes: Disk budget for all entries
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Entry sizes, least recently used first (file mtime is the LRU clock)
+        entries = []
+        for name in os.listdir(cache_dir):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(cache_dir, name))
+                entries.append((stat.st_mtime_ns, name[:-len(".json")], stat.st_size))
+        entries.sort()
+        self._sizes = {key: size for _, key, size in entries}
+        self.total_bytes = sum(self._sizes.values())
+
+    @staticmethod
+    def is_deterministic(temperature: float, top_k: int, seed: Optional[int]) -> bool:
+        """Whether a request always produces the same output."""
+        return temperature <= 1e-5 or top_k == 1 or seed is not None
+
+    @staticmethod
+    def model_fingerprint(files: List[str]) -> List:
+        """Size and modification time of each model file (missing files are None)."""
+        fingerprint = []
+        for path in files:
+            try:
+                stat = os.stat(path)
+                fingerprint.append([os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+            except OSError:
+                fingerprint.append([os.path.basename(path), None, None])
+        return fingerprint
+
+    def make_key(self, model_id: str, model_files: List[str], token_ids: List[int],
+                 params: Dict) -> str:
+        """
+        Build the cache key of a request.
+
+        Args:
+            model_id: Model name
+            model_files: Files whose change must invalidate the entry
+            token_ids: Tokenized prompt
+            params: Sampling parameters that affect the output
+
+        Returns:
+            Hex key
+        """
+        prompt_hash = hashlib.sha256(np.asarray(token_ids, dtype=np.int64).tobytes()).hexdigest()
+        key = json.dumps({
+            "model": model_id,
+            "files": self.model_fingerprint(model_files),
+            "prompt": prompt_hash,
+            "params": params,
+        }, sort_keys=True)
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """
+        Look up the streamed chunks of a request.
+
+        Args:
+            key: Key from make_key
+
+        Returns:
+            List of text chunks, or None on a miss
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                chunks = json.load(f)["chunks"]
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+
+        # Move to the most recently used end
+        self._sizes[key] = self._sizes.pop(key, os.path.getsize(path))
+        self.hits += 1
+        return chunks
+
+    def put(self, key: str, chunks: List[str]) -> None:
+        """
+        Store the streamed chunks of a finished request.
+
+        Args:
+            key: Key from make_key
+            chunks: Text chunks in streaming order
+        """
+        data = json.dumps({"chunks": chunks})
+        size = len(data.encode())
+        if size > self.max_bytes:
+            return
+        try:
+            partial = self._path(key) + ".partial"
+            with open(partial, 'w') as f:
+                f.write(data)
+            os.replace(partial, self._path(key))
+        except OSError as e:
+            print(f"Failed to cache generation: {e}")
+            return
+
+        self.total_bytes += size - self._sizes.pop(key, 0)
+        self._sizes[key] = size
+        while self.total_bytes > self.max_bytes and self._sizes:
+            oldest = next(iter(self._sizes))
+            self._remove(oldest)
+
+    def _remove(self, key: str) -> None:
+        self.total_bytes -= self._sizes.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        """Delete every entry."""
+        for key in list(self._sizes):
+            self._remove(key)
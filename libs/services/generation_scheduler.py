@@ -0,0 +1,336 @@
+import heapq
+import itertools
+import threading
+import numpy as np
+from typing import List, Optional, Callable
+from libs.services.kv_cache import KVCache
+from libs.services.sampler import Sampler
+from libs.services.streaming_detokenizer import StreamingDetokenizer
+
+class GenerationRequest:
+    """
+    Handle for a generation submitted to the GenerationScheduler.
+    """
+
+    def __init__(self, prompt: str, max_tokens: int = 512, temperature: float = 0.7,
+                 top_k: int = 40, top_p: float = 0.9,
+                 streaming_callback: Optional[Callable[[str], None]] = None,
+                 stop: Optional[List[str]] = None, seed: Optional[int] = None,
+                 priority: int = 0):
+        self.prompt = prompt
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.top_k = top_k
+        self.top_p = top_p
+        self.streaming_callback = streaming_callback
+        self.stop = stop
+        self.priority = priority
+        self.sampler = Sampler(seed)
+
+        self.text = ""
+        self.error = None
+        self.tokens_generated = 0
+        self.cancelled = False
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        """True once the request has finished, failed or been cancelled."""
+        return self._done.is_set()
+
+    def cancel(self) -> None:
+        """Ask the scheduler to retire this request at the next step."""
+        self.cancelled = True
+
+    def result(self, timeout: Optional[float] = None) -> str:
+        """
+        Wait for the generated text.
+
+        Args:
+            timeout: Seconds to wait (None waits forever)
+
+        Returns:
+            Generated text, or an error message
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError("Generation did not finish in time")
+        if self.error:
+            return f"Error during generation: {self.error}"
+        return self.text
+
+
+class _Slot:
+    """Per-sequence decoding state for one batch slot."""
+
+    def __init__(self, request: GenerationRequest, streamer: StreamingDetokenizer):
+        self.request = request
+        self.streamer = streamer
+        self.position = 0
+        self.next_token = None
+
+
+class GenerationScheduler:
+    """
+    Continuous-batching scheduler in front of an ONNXInferenceEngine.
+    Active sequences share one batched KV cache and advance together with a
+    single `session.run` per step; new requests are admitted and finished
+    ones retired between steps, so throughput grows with the batch size.
+    """
+
+    def __init__(self, engine, max_batch_size: int = 4, max_context: Optional[int] = None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            engine: Loaded ONNXInferenceEngine
+            max_batch_size: Maximum number of sequences decoded together
+            max_context: Positions per batch slot (defaults to the engine's cache size)
+        """
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+
+        template = engine.kv_cache
+        self.cache = KVCache(template.num_layers, template.num_kv_heads, template.head_dim,
+                             max_context or template.max_length,
+                             batch_size=max_batch_size, dtype=template.dtype)
+        self.scratch = KVCache(template.num_layers, template.num_kv_heads, template.head_dim,
+                               self.cache.max_length, dtype=template.dtype)
+
+        # Which cached positions belong to each slot's sequence
+        self.valid = np.zeros((max_batch_size, self.cache.max_length), dtype=np.int64)
+        self.slots = []
+
+        self._waiting = []
+        self._counter = itertools.count()
+        self._lock = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    @property
+    def active_count(self) -> int:
+        """Number of sequences currently being decoded."""
+        return len(self.slots)
+
+    @property
+    def waiting_count(self) -> int:
+        """Number of requests waiting for a free slot."""
+        with self._lock:
+            return len(self._waiting)
+
+    def submit(self, prompt: str, max_tokens: int = 512, temperature: float = 0.7,
+               top_k: int = 40, top_p: float = 0.9,
+               streaming_callback: Optional[Callable[[str], None]] = None,
+               stop: Optional[List[str]] = None, seed: Optional[int] = None,
+               priority: int = 0) -> GenerationRequest:
+        """
+        Queue a generation request.
+
+        Args:
+            prompt: Input text prompt
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            top_k: Top-K sampling parameter
+            top_p: Top-P (nucleus) sampling parameter
+            streaming_callback: Optional callback for streaming text (called on
+                the scheduler thread)
+            stop: Optional strings that end generation
+            seed: Optional seed for reproducible sampling
+            priority: Lower values are admitted first (e.g. chat before summaries)
+
+        Returns:
+            GenerationRequest handle
+        """
+        request = GenerationRequest(prompt, max_tokens, temperature, top_k, top_p,
+                                    streaming_callback, stop, seed, priority)
+        with self._lock:
+            heapq.heappush(self._waiting, (priority, next(self._counter), request))
+            self._lock.notify()
+        return request
+
+    def start(self) -> None:
+        """Start the background scheduling thread."""
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def shutdown(self) -> None:
+        """Stop the background thread after the current step."""
+        with self._lock:
+            self._running = False
+            self._lock.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _worker(self) -> None:
+        """Background loop: step while there is work, otherwise sleep."""
+        while True:
+            with self._lock:
+                while self._running and not self._waiting and not self.slots:
+                    self._lock.wait()
+                if not self._running:
+                    return
+            self.step()
+
+    def run_until_idle(self) -> None:
+        """Step on the calling thread until every request has finished."""
+        while self.step():
+            pass
+
+    def step(self) -> bool:
+        """
+        Run one scheduling iteration: admit, decode one token for every
+        active sequence, retire finished ones.
+
+        Returns:
+            True while there is still work queued or running
+        """
+        self._admit()
+        if self.slots:
+            try:
+                self._decode_step()
+            except Exception as e:
+                for slot in list(self.slots):
+                    self._retire(slot, error=e)
+        with self._lock:
+            return bool(self.slots or self._waiting)
+
+    def _admit(self) -> None:
+        """Prefill waiting requests into free slots."""
+        while len(self.slots) < self.max_batch_size:
+            with self._lock:
+                if not self._waiting:
+                    return
+                _, _, request = heapq.heappop(self._waiting)
+            if request.cancelled:
+                request._done.set()
+                continue
+            try:
+                self._prefill(request)
+            except Exception as e:
+                request.error = e
+                request._done.set()
+
+    def _prefill(self, request: GenerationRequest) -> None:
+        """Prefill one request on the scratch cache and place it in a slot."""
+        engine = self.engine
+        input_ids = engine.tokenize(request.prompt)[-(self.cache.max_length - 2):]
+        n = len(input_ids)
+
+        self.scratch.reset()
+        logits, presents = engine._run_decoder(
+            np.array([input_ids], dtype=np.int64),
+            np.arange(n, dtype=np.int64)[None, :],
+            np.ones((1, n), dtype=np.int64),
+            self.scratch.past()
+        )
+        self.scratch.append(presents)
+
+        if self.cache.length + 1 > self.cache.max_length:
+            self._compact()
+        # Right-align the prompt so it ends at the shared write position
+        if n > self.cache.length:
+            self.cache.length = n
+        start = self.cache.length - n
+
+        index = len(self.slots)
+        keys, values = self.scratch.snapshot()
+        self.cache.write_slot(index, keys, values, start)
+        self.valid[index] = 0
+        self.valid[index, start:start + n] = 1
+
+        slot = _Slot(request, StreamingDetokenizer(engine.tokenizer, stop_strings=request.stop))
+        slot.position = n
+        self.slots.append(slot)
+        self._accept(slot, logits[0, -1])
+
+    def _decode_step(self) -> None:
+        """Advance every active sequence by one token with one batched run."""
+        if self.cache.remaining == 0:
+            self._compact()
+            if not self.slots:
+                return
+
+        batch = len(self.slots)
+        t = self.cache.length
+        input_ids = np.array([[slot.next_token] for slot in self.slots], dtype=np.int64)
+        position_ids = np.array([[slot.position] for slot in self.slots], dtype=np.int64)
+        attention_mask = np.ones((batch, t + 1), dtype=np.int64)
+        attention_mask[:, :t] = self.valid[:batch, :t]
+
+        logits, presents = self.engine._run_decoder(
+            input_ids, position_ids, attention_mask, self.cache.past(batch))
+        self.cache.append(presents)
+        self.valid[:batch, t] = 1
+
+        for i, slot in enumerate(list(self.slots)):
+            slot.position += 1
+            self._accept(slot, logits[i, -1])
+
+    def _accept(self, slot: _Slot, logits: np.ndarray) -> None:
+        """Sample the slot's next token and retire it when finished."""
+        request = slot.request
+        if request.cancelled:
+            self._retire(slot)
+            return
+
+        token = request.sampler.sample(logits, request.temperature, request.top_k, request.top_p)
+        if token in self.engine.eos_token_ids:
+            self._retire(slot)
+            return
+
+        request.tokens_generated += 1
+        text = slot.streamer.push(token)
+        if text and request.streaming_callback:
+            request.streaming_callback(text)
+
+        slot.next_token = token
+        if slot.streamer.stopped or request.tokens_generated >= request.max_tokens \
+                or slot.position >= self.cache.max_length - 1:
+            self._retire(slot)
+
+    def _retire(self, slot: _Slot, error: Optional[Exception] = None) -> None:
+        """Finish a request and keep active slots packed at the front."""
+        index = self.slots.index(slot)
+        last = len(self.slots) - 1
+        if index != last:
+            self.cache.copy_slot(last, index)
+            self.valid[index] = self.valid[last]
+            self.slots[index] = self.slots[last]
+        self.slots.pop()
+        self.valid[last] = 0
+        if not self.slots:
+            self.cache.reset()
+
+        request = slot.request
+        if error is not None:
+            request.error = error
+        else:
+            tail = slot.streamer.flush()
+            if tail and request.streaming_callback:
+                request.streaming_callback(tail)
+        request.text = slot.streamer.text
+        request._done.set()
+
+    def _compact(self) -> None:
+        """
+        Squeeze out positions no slot uses so the shared write position moves
+        back; each slot keeps its positions in order, right-aligned.
+        """
+        t = self.cache.length
+        counts = self.valid[:len(self.slots), :t].sum(axis=1)
+        new_length = int(counts.max()) if len(counts) else 0
+
+        for i in range(len(self.slots)):
+            kept = np.flatnonzero(self.valid[i, :t])
+            start = new_length - len(kept)
+            keys = self.cache.keys[:, i]
+            values = self.cache.values[:, i]
+            keys[:, :, start:new_length] = keys[:, :, kept]
+            values[:, :, start:new_length] = values[:, :, kept]
+            self.valid[i] = 0
+            self.valid[i, start:new_length] = 1
+
+        self.cache.length = new_length
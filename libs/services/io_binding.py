@@ -0,0 +1,88 @@
+import numpy as np
+from typing import List, Tuple
+
+class DecodeBinding:
+    """
+    Preallocated ONNX Runtime IO binding for single-token decode steps.
+    Token, position, mask and logits buffers are allocated once and bound by
+    pointer. The past key/values are bound straight from a packed KVCache
+    and the presents are written by ONNX Runtime into the other half of its
+    ping-pong pair, so a decode step neither allocates tensors nor copies
+    the cache, and the KV memory exists only once.
+    """
+
+    def __init__(self, session, input_names, past_names: List[Tuple[str, str]],
+                 present_names: List[Tuple[str, str]], max_length: int,
+                 vocab_size: int, logits_dtype=np.float32):
+        """
+        Allocate the bound buffers.
+
+        Args:
+            session: onnxruntime.InferenceSession of the decoder
+            input_names: Names of the decoder inputs
+            past_names: (key, value) input names per layer
+            present_names: (key, value) output names per layer
+            max_length: Maximum number of cached positions
+            vocab_size: Size of the logits dimension
+            logits_dtype: Dtype of the logits output
+        """
+        self.session = session
+        self.binding = session.io_binding()
+        self.past_names = past_names
+        self.present_names = present_names
+        self.max_length = max_length
+
+        self.input_ids = np.zeros((1, 1), dtype=np.int64)
+        self.position_ids = np.zeros((1, 1), dtype=np.int64)
+        self.attention_mask = np.ones((1, max_length), dtype=np.int64)
+        self.logits = np.zeros((1, 1, vocab_size), dtype=logits_dtype)
+
+        self.binding.bind_input("input_ids", "cpu", 0, np.int64, [1, 1],
+                                self.input_ids.ctypes.data)
+        if "position_ids" in input_names:
+            self.binding.bind_input("position_ids", "cpu", 0, np.int64, [1, 1],
+                                    self.position_ids.ctypes.data)
+        self._has_mask = "attention_mask" in input_names
+        self.binding.bind_output("logits", "cpu", 0, self.logits.dtype,
+                                 list(self.logits.shape), self.logits.ctypes.data)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the bound token, mask and logits buffers in bytes."""
+        return self.input_ids.nbytes + self.position_ids.nbytes + \
+            self.attention_mask.nbytes + self.logits.nbytes
+
+    def step(self, token_id: int, kv_cache) -> np.ndarray:
+        """
+        Run the decoder on one token on top of the KV cache.
+
+        Args:
+            token_id: Token to feed
+            kv_cache: Packed KVCache; extended by one position
+
+        Returns:
+            Logits for the token (vocab_size,), a view that is overwritten
+            by the next step
+        """
+        n = kv_cache.length
+        kv_cache.reserve(n + 1)
+
+        self.input_ids[0, 0] = token_id
+        self.position_ids[0, 0] = n
+        if self._has_mask:
+            self.binding.bind_input("attention_mask", "cpu", 0, np.int64, [1, n + 1],
+                                    self.attention_mask.ctypes.data)
+
+        past, nxt = kv_cache.side, 1 - kv_cache.side
+        for layer in range(len(self.past_names)):
+            for kind in range(2):
+                source = kv_cache.view(layer, kind, n, past)
+                target = kv_cache.view(layer, kind, n + 1, nxt)
+                self.binding.bind_input(self.past_names[layer][kind], "cpu", 0,
+                                        kv_cache.dtype, list(source.shape), source.ctypes.data)
+                self.binding.bind_output(self.present_names[layer][kind], "cpu", 0,
+                                         kv_cache.dtype, list(target.shape), target.ctypes.data)
+
+        self.session.run_with_iobinding(self.binding)
+        kv_cache.advance(n + 1)
+        return self.logits[0, -1]
@@ -0,0 +1,275 @@
+import numpy as np
+from typing import Callable, List, Dict, Tuple, Optional
+
+class KVCache:
+    """
+    Preallocated key/value cache for autoregressive decoding.
+    Keys and values for every layer live in two contiguous buffers that are
+    sized once from the model config and filled in place as tokens are decoded.
+
+    A packed cache (single sequence only) instead keeps every layer's keys
+    and values as contiguous (1, heads, length, head_dim) tensors in one half
+    of a ping-pong pair, so they can be bound to ONNX Runtime directly and
+    the model can write the next step's presents into the other half. It
+    grows on demand up to `max_length`.
+    """
+
+    # Positions a packed cache holds before its first growth
+    INITIAL_CAPACITY = 256
+
+    def __init__(self, num_layers: int, num_kv_heads: int, head_dim: int,
+                 max_length: int, batch_size: int = 1, dtype=np.float32,
+                 packed: bool = False):
+        """
+        Initialize the cache buffers.
+
+        Args:
+            num_layers: Number of transformer layers
+            num_kv_heads: Number of key/value heads per layer
+            head_dim: Dimension of each attention head
+            max_length: Maximum number of cached positions
+            batch_size: Number of sequences held in the cache
+            dtype: NumPy dtype of the cached tensors
+            packed: Use the ping-pong layout bound by DecodeBinding
+        """
+        if packed and batch_size != 1:
+            raise ValueError("A packed KV cache holds a single sequence")
+        self.num_layers = num_layers
+        self.num_kv_heads = num_kv_heads
+        self.head_dim = head_dim
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.dtype = np.dtype(dtype)
+        self.packed = packed
+        self.length = 0
+
+        if packed:
+            self.keys = self.values = None
+            self.capacity = 0
+            self.buffers = None
+            # Half of the pair holding the cached positions
+            self.side = 0
+            self.reserve(1)
+        else:
+            shape = (num_layers, batch_size, num_kv_heads, max_length, head_dim)
+            self.keys = np.zeros(shape, dtype=self.dtype)
+            self.values = np.zeros(shape, dtype=self.dtype)
+
+    @classmethod
+    def from_config(cls, config: Dict, max_context: int = 2048,
+                    batch_size: int = 1, dtype=np.float32, packed: bool = False) -> "KVCache":
+        """
+        Create a cache sized from a Hugging Face style config.json.
+
+        Args:
+            config: Parsed model config
+            max_context: Upper bound on cached positions
+            batch_size: Number of sequences held in the cache
+            dtype: NumPy dtype of the cached tensors
+            packed: Use the ping-pong layout bound by DecodeBinding
+
+        Returns:
+            New KVCache instance
+        """
+        num_layers = config["num_hidden_layers"]
+        num_heads = config["num_attention_heads"]
+        num_kv_heads = config.get("num_key_value_heads") or num_heads
+        head_dim = config.get("head_dim") or config["hidden_size"] // num_heads
+        max_length = min(config.get("max_position_embeddings", max_context), max_context)
+        return cls(num_layers, num_kv_heads, head_dim, max_length,
+                   batch_size=batch_size, dtype=dtype, packed=packed)
+
+    @property
+    def remaining(self) -> int:
+        """Number of positions still free in the cache."""
+        return self.max_length - self.length
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the cache buffers in bytes."""
+        if self.packed:
+            return self.buffers.nbytes
+        return self.keys.nbytes + self.values.nbytes
+
+    def view(self, layer: int, kind: int, length: int,
+             side: Optional[int] = None) -> np.ndarray:
+        """
+        Contiguous tensor of a packed cache.
+
+        Args:
+            layer: Layer index
+            kind: 0 for keys, 1 for values
+            length: Positions the tensor covers (sets the layout)
+            side: Half of the ping-pong pair (defaults to the current one)
+
+        Returns:
+            (1, heads, length, head_dim) view into the buffers
+        """
+        side = self.side if side is None else side
+        size = self.num_kv_heads * length * self.head_dim
+        return self.buffers[side, layer, kind, :size].reshape(
+            1, self.num_kv_heads, length, self.head_dim)
+
+    def reserve(self, positions: int) -> None:
+        """Grow a packed cache so both halves hold at least `positions`."""
+        if positions <= self.capacity:
+            return
+        if positions > self.max_length:
+            raise ValueError(f"KV cache overflow: {positions} > {self.max_length}")
+        capacity = max(self.capacity, min(self.INITIAL_CAPACITY, self.max_length))
+        while capacity < positions:
+            capacity *= 2
+        capacity = min(capacity, self.max_length)
+
+        old, old_side = self.buffers, self.side
+        size = self.num_kv_heads * capacity * self.head_dim
+        # (ping/pong, layer, key/value, flat heads * positions * head_dim)
+        self.buffers = np.zeros((2, self.num_layers, 2, size), dtype=self.dtype)
+        self.capacity = capacity
+        self.side = 0
+        if old is not None:
+            used = self.num_kv_heads * self.length * self.head_dim
+            self.buffers[0, :, :, :used] = old[old_side, :, :, :used]
+
+    def advance(self, length: int) -> None:
+        """
+        Switch a packed cache to the other half after the model wrote
+        `length` positions into it.
+        """
+        self.side = 1 - self.side
+        self.length = length
+
+    def _repack(self, length: int, source: Callable[[int, int], np.ndarray]) -> None:
+        """Fill the other half with `length` positions and switch to it."""
+        self.reserve(length)
+        other = 1 - self.side
+        for layer in range(self.num_layers):
+            for kind in range(2):
+                self.view(layer, kind, length, other)[...] = source(layer, kind)
+        self.advance(length)
+
+    def past(self, batch: Optional[int] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Get the filled part of the cache for every layer.
+
+        Args:
+            batch: Only include the first `batch` sequences (defaults to all)
+
+        Returns:
+            List of (key, value) views shaped (batch, heads, length, head_dim)
+        """
+        n = self.length
+        if self.packed:
+            return [(self.view(layer, 0, n), self.view(layer, 1, n))
+                    for layer in range(self.num_layers)]
+        b = self.batch_size if batch is None else batch
+        return [(self.keys[layer, :b, :, :n], self.values[layer, :b, :, :n])
+                for layer in range(self.num_layers)]
+
+    def append(self, presents: List[Tuple[np.ndarray, np.ndarray]]) -> int:
+        """
+        Copy the new positions of the model's present tensors into the cache.
+
+        Args:
+            presents: List of (key, value) per layer, shaped
+                (batch, heads, total_length, head_dim) as returned by the model;
+                the batch may cover only the first sequences of the cache
+
+        Returns:
+            Number of positions appended
+        """
+        start = self.length
+        end = presents[0][0].shape[2]
+        if end > self.max_length:
+            raise ValueError(f"KV cache overflow: {end} > {self.max_length}")
+
+        if self.packed:
+            # The layout depends on the length, so the presents are copied whole
+            self._repack(end, lambda layer, kind: presents[layer][kind][:, :, :end])
+            return end - start
+
+        b = presents[0][0].shape[0]
+        for layer, (key, value) in enumerate(presents):
+            self.keys[layer, :b, :, start:end] = key[:, :, start:end]
+            self.values[layer, :b, :, start:end] = value[:, :, start:end]
+
+        self.length = end
+        return end - start
+
+    def snapshot_nbytes(self, length: Optional[int] = None) -> int:
+        """Size in bytes of `snapshot(length)`, without copying anything."""
+        n = self.length if length is None else min(length, self.length)
+        return 2 * self.num_layers * self.batch_size * self.num_kv_heads * n * \
+            self.head_dim * self.dtype.itemsize
+
+    def snapshot(self, length: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Copy the first `length` cached positions out of the buffers.
+
+        Args:
+            length: Number of positions to copy (defaults to all cached)
+
+        Returns:
+            (keys, values) shaped (layers, batch, heads, length, head_dim)
+        """
+        n = self.length if length is None else min(length, self.length)
+        if self.packed:
+            return tuple(np.stack([self.view(layer, kind, self.length)[:, :, :n]
+                                   for layer in range(self.num_layers)])
+                         for kind in range(2))
+        return self.keys[:, :, :, :n].copy(), self.values[:, :, :, :n].copy()
+
+    def restore(self, keys: np.ndarray, values: np.ndarray, length: int) -> None:
+        """
+        Load the first `length` positions of a snapshot into the buffers.
+
+        Args:
+            keys: Snapshot keys from `snapshot`
+            values: Snapshot values from `snapshot`
+            length: Number of positions to load
+        """
+        if self.packed:
+            snapshot = (keys, values)
+            self._repack(length, lambda layer, kind: snapshot[kind][layer, :, :, :length])
+            return
+        self.keys[:, :, :, :length] = keys[:, :, :, :length]
+        self.values[:, :, :, :length] = values[:, :, :, :length]
+        self.length = length
+
+    def write_slot(self, slot: int, keys: np.ndarray, values: np.ndarray,
+                   start: int) -> None:
+        """
+        Copy a single-sequence snapshot into one batch slot.
+
+        Args:
+            slot: Destination batch index
+            keys: Keys shaped (layers, 1, heads, n, head_dim)
+            values: Values shaped like `keys`
+            start: First destination position
+        """
+        if self.packed:
+            raise ValueError("A packed KV cache has no batch slots")
+        n = keys.shape[3]
+        self.keys[:, slot, :, start:start + n] = keys[:, 0]
+        self.values[:, slot, :, start:start + n] = values[:, 0]
+
+    def copy_slot(self, source: int, dest: int) -> None:
+        """Copy every cached position of one batch slot into another."""
+        if self.packed:
+            raise ValueError("A packed KV cache has no batch slots")
+        n = self.length
+        self.keys[:, dest, :, :n] = self.keys[:, source, :, :n]
+        self.values[:, dest, :, :n] = self.values[:, source, :, :n]
+
+    def truncate(self, length: int) -> None:
+        """Drop cached positions beyond `length`."""
+        length = max(0, min(length, self.length))
+        if self.packed and length < self.length:
+            n = self.length
+            self._repack(length, lambda layer, kind: self.view(layer, kind, n)[:, :, :length])
+            return
+        self.length = length
+
+    def reset(self) -> None:
+        """Empty the cache without releasing its buffers."""
+        self.length = 0
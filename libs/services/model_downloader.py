@@ -1,8 +1,9 @@
 import os
+import json
 import requests
 import hashlib
 import threading
-from typing import Callable, Optional
+from typing import Callable, Dict, Optional, Tuple
 from kivy.clock import Clock
 
 class ModelDownloader:
@@ -18,7 +19,8 @@ class ModelDownloader:
     
     def download(self, url: str, save_path: str, 
                  progress_callback: Optional[Callable[[float], None]] = None,
-                 completion_callback: Optional[Callable[[bool, str], None]] = None) -> None:
+                 completion_callback: Optional[Callable[[bool, str], None]] = None,
+                 finalize: Optional[Callable[[], Tuple[bool, str]]] = None) -> None:
         """
         Download a file from URL with progress tracking.
         
@@ -27,6 +29,8 @@ class ModelDownloader:
             save_path: Where to save the file
             progress_callback: Called with progress percentage (0-100)
             completion_callback: Called with (success, message) when done
+            finalize: Optional post-processing run on the download thread,
+                returning (success, message) for the completion callback
         """
         def download_worker():
             try:
@@ -55,9 +59,10 @@ class ModelDownloader:
                                     lambda dt, p=progress: progress_callback(p), 0
                                 )
                 
+                success, message = finalize() if finalize else (True, "Download complete")
                 if completion_callback:
                     Clock.schedule_once(
-                        lambda dt: completion_callback(True, "Download complete"), 0
+                        lambda dt: completion_callback(success, message), 0
                     )
                     
             except Exception as e:
@@ -71,6 +76,52 @@ class ModelDownloader:
         thread.start()
         self.current_download = thread
     
+    def download_model(self, model_info: Dict, variant: Dict, models_dir: str,
+                       progress_callback: Optional[Callable[[float], None]] = None,
+                       completion_callback: Optional[Callable[[bool, str], None]] = None) -> None:
+        """
+        Download and install a single weight variant of a model.
+        Only the chosen variant's archive (weights, tokenizer and config) is
+        fetched; it is verified, extracted and recorded in manifest.json.
+        
+        Args:
+            model_info: Entry from ModelManager.list_available_models
+            variant: Entry of model_info["variants"], e.g. from
+                ModelManager.select_variant
+            models_dir: Directory holding installed models
+            progress_callback: Called with progress percentage (0-100)
+            completion_callback: Called with (success, message) when done
+        """
+        archive_path = os.path.join(self.download_dir,
+                                    f"{model_info['id']}-{variant['id']}.tar.gz")
+        model_path = os.path.join(models_dir, model_info['id'])
+        
+        def install() -> Tuple[bool, str]:
+            try:
+                if variant.get("sha256") and not self.verify_checksum(archive_path, variant["sha256"]):
+                    return False, "Checksum mismatch"
+                if not self.extract_archive(archive_path, model_path):
+                    return False, "Extraction failed"
+                if not os.path.exists(os.path.join(model_path, variant["file"])):
+                    return False, f"Archive does not contain {variant['file']}"
+                
+                manifest = {
+                    "name": model_info.get("name", model_info['id']),
+                    "variant": variant["id"],
+                    "model_file": variant["file"],
+                    "size_mb": variant["size_mb"],
+                    "tokens_per_sec": variant["tokens_per_sec"],
+                }
+                with open(os.path.join(model_path, "manifest.json"), 'w') as f:
+                    json.dump(manifest, f, indent=2)
+                return True, "Download complete"
+            finally:
+                if os.path.exists(archive_path):
+                    os.remove(archive_path)
+        
+        self.download(variant["download_url"], archive_path,
+                      progress_callback, completion_callback, finalize=install)
+    
     def cancel_download(self) -> None:
         """Cancel the current download."""
         self.cancel_flag = True
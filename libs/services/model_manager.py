@@ -1,6 +1,48 @@
 import os
 import json
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
+from libs.services.engine_pool import memory_budget_bytes
+
+# Weight file of each quantization variant, in the order tried when a model
+# directory has no manifest
+VARIANT_FILES = {
+    "int4": "model_int4.onnx",
+    "int8": "model_int8.onnx",
+    "fp16": "model_fp16.onnx",
+}
+
+# Resident memory per byte of weights (activations, KV cache, allocator arena)
+RAM_OVERHEAD = 1.5
+
+
+def find_model_file(model_path: str) -> Optional[str]:
+    """
+    Locate the weight file of an installed model.
+    The variant recorded in manifest.json wins; otherwise the first variant
+    file present is used.
+    
+    Args:
+        model_path: Model directory
+        
+    Returns:
+        Path to the .onnx file, or None if no variant is installed
+    """
+    manifest_path = os.path.join(model_path, "manifest.json")
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, 'r') as f:
+                model_file = json.load(f).get("model_file")
+            if model_file and os.path.exists(os.path.join(model_path, model_file)):
+                return os.path.join(model_path, model_file)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Failed to read manifest in {model_path}: {e}")
+    
+    for file_name in VARIANT_FILES.values():
+        candidate = os.path.join(model_path, file_name)
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
 
 class ModelManager:
     """
@@ -15,6 +57,11 @@ class ModelManager:
         """
         Get list of models available for download.
         Returns mock data for now - will be replaced with actual model registry.
+        Each model lists its weight variants with download size and an
+        estimated decode speed (`tokens_per_sec`). The speeds are rough
+        mid-range phone figures used only to rank variants, not measurements;
+        replace them with numbers from benchmarks/bench_inference.py run on
+        the target device.
         """
         return [
             {
@@ -26,7 +73,15 @@ class ModelManager:
                 "accuracy": "moderate",
                 "speed": "fast",
                 "download_url": "https://example.com/smollm2-135m.tar.gz",
-                "sha256": "a1b2c3d4e5f6..."
+                "sha256": "a1b2c3d4e5f6...",
+                "variants": [
+                    {"id": "int4", "file": "model_int4.onnx", "size_mb": 85, "tokens_per_sec": 44,
+                     "download_url": "https://example.com/smollm2-135m-int4.tar.gz", "sha256": ""},
+                    {"id": "int8", "file": "model_int8.onnx", "size_mb": 140, "tokens_per_sec": 52,
+                     "download_url": "https://example.com/smollm2-135m-int8.tar.gz", "sha256": ""},
+                    {"id": "fp16", "file": "model_fp16.onnx", "size_mb": 270, "tokens_per_sec": 20,
+                     "download_url": "https://example.com/smollm2-135m-fp16.tar.gz", "sha256": ""},
+                ]
             },
             {
                 "id": "smollm2-360m",
@@ -37,7 +92,15 @@ class ModelManager:
                 "accuracy": "good",
                 "speed": "medium",
                 "download_url": "https://example.com/smollm2-360m.tar.gz",
-                "sha256": "b2c3d4e5f6a7..."
+                "sha256": "b2c3d4e5f6a7...",
+                "variants": [
+                    {"id": "int4", "file": "model_int4.onnx", "size_mb": 230, "tokens_per_sec": 22,
+                     "download_url": "https://example.com/smollm2-360m-int4.tar.gz", "sha256": ""},
+                    {"id": "int8", "file": "model_int8.onnx", "size_mb": 380, "tokens_per_sec": 17,
+                     "download_url": "https://example.com/smollm2-360m-int8.tar.gz", "sha256": ""},
+                    {"id": "fp16", "file": "model_fp16.onnx", "size_mb": 725, "tokens_per_sec": 8,
+                     "download_url": "https://example.com/smollm2-360m-fp16.tar.gz", "sha256": ""},
+                ]
             },
             {
                 "id": "gemma-1b-instruct",
@@ -48,7 +111,15 @@ class ModelManager:
                 "accuracy": "high",
                 "speed": "slow",
                 "download_url": "https://example.com/gemma-1b.tar.gz",
-                "sha256": "c3d4e5f6a7b8..."
+                "sha256": "c3d4e5f6a7b8...",
+                "variants": [
+                    {"id": "int4", "file": "model_int4.onnx", "size_mb": 650, "tokens_per_sec": 9,
+                     "download_url": "https://example.com/gemma-1b-int4.tar.gz", "sha256": ""},
+                    {"id": "int8", "file": "model_int8.onnx", "size_mb": 1050, "tokens_per_sec": 7,
+                     "download_url": "https://example.com/gemma-1b-int8.tar.gz", "sha256": ""},
+                    {"id": "fp16", "file": "model_fp16.onnx", "size_mb": 2000, "tokens_per_sec": 3,
+                     "download_url": "https://example.com/gemma-1b-fp16.tar.gz", "sha256": ""},
+                ]
             }
         ]
     
@@ -94,13 +165,115 @@ class ModelManager:
         if not os.path.exists(model_path):
             return False
         
-        # Check for required files
-        required_files = ["model_int8.onnx", "tokenizer.json", "config.json"]
+        # Check for required files and any weight variant
+        required_files = ["tokenizer.json", "config.json"]
         for file in required_files:
             if not os.path.exists(os.path.join(model_path, file)):
                 return False
         
-        return True
+        return find_model_file(model_path) is not None
+    
+    @staticmethod
+    def variant_ram_bytes(variant: Dict) -> int:
+        """Estimated resident memory of a weight variant in bytes."""
+        return int(variant["size_mb"] * 1024 * 1024 * RAM_OVERHEAD)
+    
+    def select_variant(self, model_id: str, budget_bytes: int) -> Optional[Dict]:
+        """
+        Pick the fastest weight variant that fits a RAM budget.
+        
+        Args:
+            model_id: Model to choose a variant for
+            budget_bytes: Memory available to the model
+            
+        Returns:
+            Variant dict, the smallest one if none fits, or None for unknown models
+        """
+        model = next((m for m in self.list_available_models() if m["id"] == model_id), None)
+        if not model or not model.get("variants"):
+            return None
+        
+        variants = model["variants"]
+        fitting = [v for v in variants if self.variant_ram_bytes(v) <= budget_bytes]
+        if fitting:
+            return max(fitting, key=lambda v: v["tokens_per_sec"])
+        return min(variants, key=lambda v: v["size_mb"])
+    
+    def download_model(self, model_id: str, downloader, budget_bytes: Optional[int] = None,
+                       progress_callback: Optional[Callable[[float], None]] = None,
+                       completion_callback: Optional[Callable[[bool, str], None]] = None
+                       ) -> Optional[Dict]:
+        """
+        Download the variant of a model that suits this device.
+        
+        Args:
+            model_id: Model to download
+            downloader: ModelDownloader that fetches and installs the variant
+            budget_bytes: Memory available to the model (the pool budget for
+                the model's min_ram_gb if None)
+            progress_callback: Called with progress percentage (0-100)
+            completion_callback: Called with (success, message) when done
+            
+        Returns:
+            The variant being downloaded, or None for unknown models
+        """
+        if budget_bytes is None:
+            budget_bytes = self.get_memory_budget(model_id)
+        variant = self.select_variant(model_id, budget_bytes)
+        if variant is None:
+            print(f"No downloadable variant for model: {model_id}")
+            return None
+        
+        model_info = next(m for m in self.list_available_models() if m["id"] == model_id)
+        downloader.download_model(model_info, variant, self.models_dir,
+                                  progress_callback, completion_callback)
+        return variant
+    
+    def get_model_file(self, model_id: str, budget_bytes: Optional[int] = None) -> Optional[str]:
+        """
+        Get the weight file to load for an installed model.
+        
+        Args:
+            model_id: Installed model
+            budget_bytes: Memory available; when several variants are installed
+                the fastest one that fits is chosen
+            
+        Returns:
+            Path to the .onnx file, or None if the model is not downloaded
+        """
+        model_path = self.get_model_path(model_id)
+        if model_path is None:
+            return None
+        
+        model = next((m for m in self.list_available_models() if m["id"] == model_id), None)
+        if budget_bytes is not None and model and model.get("variants"):
+            installed = [v for v in model["variants"]
+                         if os.path.exists(os.path.join(model_path, v["file"]))]
+            fitting = [v for v in installed if self.variant_ram_bytes(v) <= budget_bytes]
+            if fitting:
+                best = max(fitting, key=lambda v: v["tokens_per_sec"])
+                return os.path.join(model_path, best["file"])
+            if installed:
+                best = min(installed, key=lambda v: v["size_mb"])
+                return os.path.join(model_path, best["file"])
+        
+        return find_model_file(model_path)
+    
+    def get_memory_budget(self, model_id: str, override_mb: int = 0) -> int:
+        """
+        RAM budget for the engine pool while a model is selected.
+        
+        Args:
+            model_id: Selected model
+            override_mb: User-configured budget (0 derives it from min_ram_gb)
+            
+        Returns:
+            Budget in bytes
+        """
+        if override_mb:
+            return override_mb * 1024 * 1024
+        info = self.get_model_info(model_id) or {}
+        return memory_budget_bytes(info.get("min_ram_gb", 2))
     
     def get_model_path(self, model_id: str) -> Optional[str]:
         """Get the path to a model's directory."""
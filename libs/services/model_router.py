@@ -0,0 +1,275 @@
+import os
+import re
+import json
+import time
+import threading
+from typing import Callable, Dict, List, Optional
+from libs.services.onnx_inference_engine import ONNXInferenceEngine
+from libs.services.onnx_session import SessionConfig
+from libs.services.model_warmup import llm_pool_key, register_llm
+
+# Settings key holding the router thresholds
+SETTINGS_KEY = "model_routing"
+
+# Registry "speed" values, from the fastest to the most capable model
+TIERS = ["fast", "medium", "slow"]
+
+# Wording that usually asks for reasoning rather than chit-chat
+COMPLEX_PATTERN = re.compile(
+    r"\b(explain|why|how (do|does|can|could|would|should)|compare|analy[sz]e|summari[sz]e|"
+    r"prove|derive|step[- ]by[- ]step|pros and cons|evaluate|translate|debug|"
+    r"write (a|an|the|me) \w+)\b", re.IGNORECASE)
+CODE_PATTERN = re.compile(r"```|\bdef |\bclass |\bimport |#include|=>|[{};]\s*$", re.MULTILINE)
+
+
+class ModelRouter:
+    """
+    Chooses an installed model per request from cheap prompt features, so
+    short chit-chat runs on the fast model and long, RAG-backed or
+    reasoning-heavy questions go to the larger ones.
+    Every routed generation is appended to a JSON-lines log with its
+    features and latency, for tuning the thresholds in settings.
+    """
+
+    DEFAULTS = {
+        "enabled": True,
+        # Word counts that add one point each when exceeded
+        "short_words": 12,
+        "long_words": 80,
+        # Points for attached RAG context, reasoning wording and code
+        "context_points": 2,
+        "complex_points": 1,
+        "code_points": 1,
+        # Highest score still served by the fast and the medium tier
+        "fast_max_score": 0,
+        "medium_max_score": 2,
+        # Use an already loaded, more capable model instead of loading another:
+        # chat models share one exclusive group, so switching tiers unloads
+        # the loaded model and every switch back pays a full load again
+        "prefer_loaded": True,
+    }
+
+    def __init__(self, settings, model_manager, pool, cache_dir: Optional[str] = None,
+                 log_path: Optional[str] = None,
+                 engine_factory: Optional[Callable[[str, str], object]] = None):
+        """
+        Initialize the router.
+
+        Args:
+            settings: SettingsManager with `selected_model` and the `model_routing` overrides
+            model_manager: ModelManager listing the installed models
+            pool: EnginePool that owns the loaded engines
+            cache_dir: Directory for pre-optimized models
+            log_path: JSON-lines file for routing decisions (None disables logging)
+            engine_factory: Creates an engine from a model directory and weight
+                file (ONNXInferenceEngine by default)
+        """
+        self.settings = settings
+        self.model_manager = model_manager
+        self.pool = pool
+        self.cache_dir = cache_dir
+        self.log_path = log_path
+        self.engine_factory = engine_factory or self._create_engine
+        self.config = {**self.DEFAULTS, **(settings.get(SETTINGS_KEY) or {})}
+        self._log_lock = threading.Lock()
+
+    def _create_engine(self, model_path: str, model_file: str) -> ONNXInferenceEngine:
+        """Default engine factory using the tuned session configuration."""
+        return ONNXInferenceEngine(model_path, cache_dir=self.cache_dir,
+                                   session_config=SessionConfig.from_settings(self.settings),
+                                   model_file=model_file)
+
+    @staticmethod
+    def features(query: str, has_context: bool = False) -> Dict:
+        """
+        Extract routing features from the user's message.
+
+        Args:
+            query: The user's message (without system prompt or RAG context)
+            has_context: Whether retrieved document chunks are attached
+
+        Returns:
+            Dict of feature values
+        """
+        return {
+            "words": len(query.split()),
+            "questions": query.count("?"),
+            "complex_terms": len(COMPLEX_PATTERN.findall(query)),
+            "has_code": bool(CODE_PATTERN.search(query)),
+            "has_context": has_context,
+        }
+
+    def score(self, features: Dict) -> int:
+        """Complexity score of a request; higher asks for a more capable model."""
+        config = self.config
+        score = 0
+        if features["words"] > config["short_words"]:
+            score += 1
+        if features["words"] > config["long_words"]:
+            score += 1
+        if features["questions"] > 1:
+            score += 1
+        if features["has_context"]:
+            score += config["context_points"]
+        score += min(features["complex_terms"], 2) * config["complex_points"]
+        if features["has_code"]:
+            score += config["code_points"]
+        return score
+
+    def installed_tiers(self) -> Dict[str, str]:
+        """
+        Map each tier to an installed model.
+
+        Returns:
+            Dict of tier -> model id for the tiers that have a model installed
+        """
+        tiers = {}
+        for model in self.model_manager.list_available_models():
+            tier = model.get("speed")
+            if tier in TIERS and tier not in tiers and \
+                    self.model_manager.is_model_downloaded(model["id"]):
+                tiers[tier] = model["id"]
+        return tiers
+
+    def route(self, query: str, has_context: bool = False) -> Dict:
+        """
+        Choose a model for one request.
+
+        Args:
+            query: The user's message
+            has_context: Whether retrieved document chunks are attached
+
+        Returns:
+            Decision dict with "model_id", "tier", "score", "features" and "reason"
+        """
+        features = self.features(query, has_context)
+        score = self.score(features)
+        decision = {"model_id": self.settings.get("selected_model"), "tier": None,
+                    "score": score, "features": features, "reason": "selected"}
+
+        tiers = self.installed_tiers()
+        if not self.config["enabled"] or not tiers:
+            return decision
+
+        if score <= self.config["fast_max_score"]:
+            wanted = 0
+        elif score <= self.config["medium_max_score"]:
+            wanted = 1
+        else:
+            wanted = 2
+
+        # Nearest installed tier, preferring more capable over less
+        order = list(range(wanted, len(TIERS))) + list(range(wanted - 1, -1, -1))
+        index = next(i for i in order if TIERS[i] in tiers)
+        decision.update(model_id=tiers[TIERS[index]], tier=TIERS[index],
+                        reason="score" if index == wanted else "nearest installed")
+
+        chosen_key = llm_pool_key(decision["model_id"])
+        if self.config["prefer_loaded"] and not self.pool.is_loaded(chosen_key):
+            for i in range(index + 1, len(TIERS)):
+                model_id = tiers.get(TIERS[i])
+                if model_id and self.pool.is_loaded(llm_pool_key(model_id)):
+                    decision.update(model_id=model_id, tier=TIERS[i], reason="already loaded")
+                    break
+        return decision
+
+    def _register(self, model_id: str) -> str:
+        """Register a model with the pool (shared with the warm-up engine)."""
+        model_path = self.model_manager.get_model_path(model_id)
+        model_file = self.model_manager.get_model_file(model_id, self.pool.budget_bytes)
+        return register_llm(self.pool, model_id, model_path, model_file, self.engine_factory)
+
+    def generate(self, prompt: str, query: Optional[str] = None,
+                 has_context: bool = False, **kwargs) -> str:
+        """
+        Route a request, generate with the chosen model and log the latency.
+
+        Args:
+            prompt: Full prompt passed to the engine
+            query: The user's message used for routing (defaults to the prompt)
+            has_context: Whether the prompt includes retrieved document chunks
+            **kwargs: Sampling options accepted by ONNXInferenceEngine.generate()
+
+        Returns:
+            Generated text, or an error message
+        """
+        decision = self.route(prompt if query is None else query, has_context)
+        model_id = decision["model_id"]
+        if model_id is None or self.model_manager.get_model_path(model_id) is None:
+            return "Error: Model not loaded"
+
+        key = self._register(model_id)
+        was_loaded = self.pool.is_loaded(key)
+        start = time.perf_counter()
+        with self.pool.use(key) as engine:
+            if engine is None:
+                return "Error: Model not loaded"
+            loaded = time.perf_counter()
+            text = engine.generate(prompt, **kwargs)
+            finished = time.perf_counter()
+            # Generated tokens only: no BOS or other template tokens
+            tokens = len(engine.tokenize(text, add_special_tokens=False)) \
+                if isinstance(text, str) and text else 0
+
+        self.record(decision, finished - loaded, tokens,
+                    0.0 if was_loaded else loaded - start)
+        return text
+
+    def record(self, decision: Dict, seconds: float, tokens: int = 0,
+               load_seconds: float = 0.0) -> None:
+        """
+        Append a routed request to the log.
+
+        Args:
+            decision: Result of route()
+            seconds: Generation wall time
+            tokens: Generated tokens
+            load_seconds: Time spent loading the model first
+        """
+        if self.log_path is None:
+            return
+        entry = {"time": time.time(), **decision, "seconds": seconds,
+                 "tokens": tokens, "load_seconds": load_seconds}
+        try:
+            with self._log_lock:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                with open(self.log_path, 'a') as f:
+                    f.write(json.dumps(entry) + "\n")
+        except IOError as e:
+            print(f"Failed to write routing log: {e}")
+
+    def read_log(self) -> List[Dict]:
+        """Load every logged routing decision."""
+        if self.log_path is None or not os.path.exists(self.log_path):
+            return []
+        entries = []
+        with open(self.log_path, 'r') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return entries
+
+    def latency_summary(self) -> Dict[str, Dict]:
+        """
+        Aggregate the log per model for threshold tuning.
+
+        Returns:
+            Dict of model id -> {"requests", "mean_seconds", "tokens_per_second",
+            "mean_score"}
+        """
+        totals = {}
+        for entry in self.read_log():
+            stats = totals.setdefault(entry["model_id"],
+                                      {"requests": 0, "seconds": 0.0, "tokens": 0, "score": 0})
+            stats["requests"] += 1
+            stats["seconds"] += entry["seconds"]
+            stats["tokens"] += entry["tokens"]
+            stats["score"] += entry["score"]
+
+        return {model_id: {"requests": s["requests"],
+                           "mean_seconds": s["seconds"] / s["requests"],
+                           "tokens_per_second": s["tokens"] / s["seconds"] if s["seconds"] else 0.0,
+                           "mean_score": s["score"] / s["requests"]}
+                for model_id, s in totals.items()}
@@ -0,0 +1,171 @@
+import threading
+import time
+from typing import Callable, Optional
+from libs.services.onnx_inference_engine import ONNXInferenceEngine
+from libs.services.onnx_session import SessionConfig, auto_tune
+from libs.services.onnx_session import SETTINGS_KEY as SESSION_SETTINGS_KEY
+
+# Exclusive pool group of the chat models: only one is resident at a time
+LLM_GROUP = "llm"
+
+
+def llm_pool_key(model_id: str) -> str:
+    """Pool key of a chat model."""
+    return f"{LLM_GROUP}:{model_id}"
+
+
+def register_llm(pool, model_id: str, model_path: str, model_file: Optional[str],
+                 engine_factory: Callable[[str, str], object]) -> str:
+    """
+    Register a chat model with the pool unless it is already registered
+    with the same weight file.
+
+    Args:
+        pool: EnginePool owning the engine
+        model_id: Model identifier
+        model_path: Model directory
+        model_file: Weight file to load
+        engine_factory: Creates an engine from a model directory and weight file
+
+    Returns:
+        Pool key of the model
+    """
+    key = llm_pool_key(model_id)
+    source = model_file or model_path
+    if not pool.is_registered(key, source=source):
+        pool.register(key, lambda: engine_factory(model_path, model_file),
+                      group=LLM_GROUP, source=source)
+    return key
+
+
+class ModelWarmup:
+    """
+    Loads the selected chat model on a background thread at startup and runs
+    a short dummy prefill/decode, so the first message sees steady-state
+    latency instead of paying for session creation and first-run kernels.
+    """
+
+    IDLE = "idle"
+    LOADING = "loading"
+    WARMING = "warming"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self, settings, model_manager, pool, cache_dir: Optional[str] = None,
+                 engine_factory: Optional[Callable[[str, str], object]] = None,
+                 tune_sessions: bool = False):
+        """
+        Initialize the warm-up stage.
+
+        Args:
+            settings: SettingsManager providing `selected_model`
+            model_manager: ModelManager used to locate the model files
+            pool: EnginePool that will own the loaded engine
+            cache_dir: Directory for pre-optimized models
+            engine_factory: Creates an engine from a model directory and weight
+                file (ONNXInferenceEngine by default)
+            tune_sessions: Auto-tune the session threads before loading when
+                no tuned configuration is stored yet (the first launch)
+        """
+        self.settings = settings
+        self.model_manager = model_manager
+        self.pool = pool
+        self.cache_dir = cache_dir
+        self.engine_factory = engine_factory or self._create_engine
+        self.tune_sessions = tune_sessions
+
+        self.status = self.IDLE
+        self.model_id = None
+        self.error = None
+        self.timings = {}
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def is_ready(self) -> bool:
+        """True once the model is loaded and warmed up."""
+        return self.status == self.READY
+
+    def _create_engine(self, model_path: str, model_file: str) -> ONNXInferenceEngine:
+        """Default engine factory using the tuned session configuration."""
+        return ONNXInferenceEngine(model_path, cache_dir=self.cache_dir,
+                                   session_config=SessionConfig.from_settings(self.settings),
+                                   model_file=model_file)
+
+    def start(self, on_status: Optional[Callable[[str], None]] = None) -> None:
+        """
+        Start loading on a daemon thread.
+
+        Args:
+            on_status: Called with each status change, on the warm-up thread
+        """
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.run, args=(on_status,), daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for warm-up to finish.
+
+        Args:
+            timeout: Seconds to wait (None waits forever)
+
+        Returns:
+            True if the model is ready
+        """
+        self._ready.wait(timeout)
+        return self.is_ready
+
+    def run(self, on_status: Optional[Callable[[str], None]] = None) -> bool:
+        """
+        Load and warm up the selected model on the calling thread.
+
+        Args:
+            on_status: Called with each status change
+
+        Returns:
+            True if the model is ready
+        """
+        def report(status):
+            self.status = status
+            if on_status:
+                on_status(status)
+
+        try:
+            self.model_id = self.settings.get("selected_model")
+            model_path = self.model_manager.get_model_path(self.model_id) if self.model_id else None
+            if model_path is None:
+                raise FileNotFoundError(f"Model not downloaded: {self.model_id}")
+            # Fastest installed weight variant that fits the pool's budget
+            model_file = self.model_manager.get_model_file(self.model_id, self.pool.budget_bytes)
+
+            report(self.LOADING)
+            if self.tune_sessions and not self.settings.get(SESSION_SETTINGS_KEY):
+                # Tuning needs its own threads, so it runs before any other session
+                start = time.perf_counter()
+                try:
+                    auto_tune(model_file, self.settings)
+                except Exception as e:
+                    print(f"Session auto-tuning failed: {e}")
+                self.timings["tune"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            key = register_llm(self.pool, self.model_id, model_path, model_file,
+                               self.engine_factory)
+            # Borrowed so another load cannot evict the engine mid warm-up
+            with self.pool.use(key) as engine:
+                if engine is None:
+                    raise RuntimeError(f"Failed to load model: {self.model_id}")
+                self.timings["load"] = time.perf_counter() - start
+
+                report(self.WARMING)
+                self.timings["warm_up"] = engine.warm_up()
+            report(self.READY)
+        except Exception as e:
+            print(f"Model warm-up failed: {e}")
+            self.error = e
+            report(self.FAILED)
+        finally:
+            self._ready.set()
+        return self.is_ready
@@ -1,7 +1,22 @@
 import os
 import json
+import threading
+import time
+from contextlib import nullcontext
 import numpy as np
-from typing import List, Dict, Optional, Generator, Callable
+from typing import List, Dict, Optional, Generator, Callable, AsyncIterator, Union
+from libs.services.kv_cache import KVCache
+from libs.services.bpe_tokenizer import BPETokenizer
+from libs.services.streaming_detokenizer import StreamingDetokenizer
+from libs.services.prefix_cache import PrefixCache, common_prefix_length
+from libs.services.sampler import Sampler
+from libs.services.speculative_decoder import SpeculativeDecoder
+from libs.services.token_stream import TokenStream
+from libs.services.io_binding import DecodeBinding
+from libs.services.onnx_session import SessionConfig, create_session
+from libs.services.model_manager import find_model_file
+from libs.services.generation_cache import GenerationCache
+from libs.services.profiler import Profiler
 
 class ONNXInferenceEngine:
     """
@@ -9,46 +24,78 @@ class ONNXInferenceEngine:
     Supports streaming, temperature, top-k, and top-p sampling.
     """
     
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, max_context: int = 2048,
+                 prefix_cache_bytes: int = 64 * 1024 * 1024,
+                 io_binding: bool = True, cache_dir: Optional[str] = None,
+                 session_config: Optional[SessionConfig] = None,
+                 model_file: Optional[str] = None):
         """
         Initialize the inference engine.
         
         Args:
             model_path: Path to directory containing model files
+            max_context: Maximum number of positions held in the KV cache
+            prefix_cache_bytes: Memory budget for cached prompt prefixes (0 disables)
+            io_binding: Decode single tokens through preallocated IO binding
+            cache_dir: Directory for pre-optimized models, e.g.
+                StorageManager.onnx_cache_dir (None optimizes on every load)
+            session_config: Thread topology, e.g. SessionConfig.from_settings(settings)
+            model_file: Weight variant to load (the installed one if None)
         """
         self.model_path = model_path
+        self.max_context = max_context
+        self.use_io_binding = io_binding
+        self.cache_dir = cache_dir
+        self.session_config = session_config
+        self.model_file = model_file
+        self.load_info = None
+        self.result_cache = None
+        self.profiler = None
+        self._loaded_model_file = None
         self.session = None
         self.tokenizer = None
         self.config = None
+        self.kv_cache = None
+        self.decode_binding = None
+        self.prefix_cache = PrefixCache(prefix_cache_bytes) if prefix_cache_bytes > 0 else None
+        self.sampler = Sampler()
+        self.speculative = None
+        self.eos_token_ids = {2}
         self.is_loaded = False
+        
+        # Tokens whose KV currently sits in self.kv_cache
+        self._cache_ids = []
+        
+        # One generation at a time owns the KV cache
+        self._generate_lock = threading.Lock()
+        
+        # Decoder IO names discovered from the session
+        self._input_names = set()
+        self._past_names = []
+        self._output_names = []
     
     def load(self) -> bool:
         """Load the ONNX model and tokenizer."""
         try:
-            # Import ONNX Runtime
-            import onnxruntime as ort
-            
             # Load model
-            model_file = os.path.join(self.model_path, "model_int8.onnx")
-            if not os.path.exists(model_file):
-                print(f"Model file not found: {model_file}")
+            model_file = self.model_file or find_model_file(self.model_path)
+            if model_file is None or not os.path.exists(model_file):
+                print(f"Model file not found in: {self.model_path}")
                 return False
             
-            # Create ONNX session with CPU provider
-            session_options = ort.SessionOptions()
-            session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            # Create ONNX session, reusing the optimized graph from a previous launch
+            self.session, self.load_info = create_session(model_file, self.cache_dir,
+                                                          self.session_config)
+            self._loaded_model_file = model_file
+            print(f"Model session ready in {self.load_info['seconds']:.2f}s "
+                  f"(optimized cache {'hit' if self.load_info['cache_hit'] else 'miss'})")
             
-            self.session = ort.InferenceSession(
-                model_file,
-                sess_options=session_options,
-                providers=['CPUExecutionProvider']
-            )
-            
-            # Load tokenizer
+            # Load tokenizer (compiled once, then reused on later starts)
             tokenizer_file = os.path.join(self.model_path, "tokenizer.json")
-            if os.path.exists(tokenizer_file):
-                with open(tokenizer_file, 'r') as f:
-                    self.tokenizer = json.load(f)
+            if not os.path.exists(tokenizer_file):
+                print(f"Tokenizer file not found: {tokenizer_file}")
+                return False
+            self.tokenizer = BPETokenizer.from_file(tokenizer_file)
             
             # Load config
             config_file = os.path.join(self.model_path, "config.json")
@@ -56,6 +103,8 @@ class ONNXInferenceEngine:
                 with open(config_file, 'r') as f:
                     self.config = json.load(f)
             
+            self._setup_decoder_io()
+            
             self.is_loaded = True
             return True
             
@@ -63,23 +112,195 @@ class ONNXInferenceEngine:
             print(f"Failed to load model: {e}")
             return False
     
-    def tokenize(self, text: str) -> List[int]:
+    def _setup_decoder_io(self) -> None:
         """
-        Tokenize input text.
-        This is a placeholder - actual tokenization depends on the model.
+        Discover the decoder's input/output names and allocate the KV cache.
+        Expects the Hugging Face/Optimum export layout: `past_key_values.{i}.key`
+        inputs and `present.{i}.key` outputs shaped (batch, heads, seq, head_dim).
         """
-        # TODO: Implement proper tokenization based on tokenizer.json
-        # For now, return mock token IDs
-        return [1] + [ord(c) % 1000 for c in text[:100]] + [2]
+        inputs = self.session.get_inputs()
+        self._input_names = {inp.name for inp in inputs}
+        past_inputs = [inp for inp in inputs if inp.name.startswith("past_key_values.")]
+        num_layers = len(past_inputs) // 2
+        
+        self._past_names = [
+            (f"past_key_values.{layer}.key", f"past_key_values.{layer}.value")
+            for layer in range(num_layers)
+        ]
+        self._output_names = ["logits"]
+        for layer in range(num_layers):
+            self._output_names += [f"present.{layer}.key", f"present.{layer}.value"]
+        
+        # Fill in anything config.json lacks from the exported input shapes
+        config = dict(self.config or {})
+        config["num_hidden_layers"] = num_layers
+        if past_inputs:
+            _, heads, _, head_dim = past_inputs[0].shape
+            if isinstance(heads, int):
+                config["num_key_value_heads"] = heads
+                config.setdefault("num_attention_heads", heads)
+            if isinstance(head_dim, int):
+                config["head_dim"] = head_dim
+        
+        dtype = np.float32
+        if past_inputs and past_inputs[0].type == "tensor(float16)":
+            dtype = np.float16
+        
+        eos = config.get("eos_token_id")
+        if eos is not None:
+            self.eos_token_ids = set(eos) if isinstance(eos, list) else {eos}
+        
+        self.decode_binding = None
+        vocab_size = None
+        if self.use_io_binding and hasattr(self.session, "io_binding"):
+            logits = self.session.get_outputs()[0]
+            vocab_size = logits.shape[-1] if isinstance(logits.shape[-1], int) \
+                else config.get("vocab_size")
+        # The bound decode steps run on the packed cache's own buffers
+        self.kv_cache = KVCache.from_config(config, self.max_context, dtype=dtype,
+                                            packed=bool(vocab_size))
+        if vocab_size:
+            present_names = [tuple(self._output_names[1 + 2 * layer:3 + 2 * layer])
+                             for layer in range(num_layers)]
+            logits_dtype = np.float16 if logits.type == "tensor(float16)" else np.float32
+            self.decode_binding = DecodeBinding(
+                self.session, self._input_names, self._past_names, present_names,
+                self.kv_cache.max_length, vocab_size, logits_dtype
+            )
     
-    def detokenize(self, token_ids: List[int]) -> str:
+    def _run_decoder(self, input_ids: np.ndarray, position_ids: np.ndarray,
+                     attention_mask: np.ndarray, past: List) -> tuple:
+        """
+        Run one decoder call on explicit, possibly batched, inputs.
+        
+        Args:
+            input_ids: New tokens (batch, seq)
+            position_ids: Positions of the new tokens (batch, seq)
+            attention_mask: Valid past and new positions (batch, past + seq)
+            past: (key, value) per layer shaped (batch, heads, past, head_dim)
+            
+        Returns:
+            (logits (batch, seq, vocab), presents as (key, value) per layer)
+        """
+        feeds = {"input_ids": input_ids}
+        if "attention_mask" in self._input_names:
+            feeds["attention_mask"] = attention_mask
+        if "position_ids" in self._input_names:
+            feeds["position_ids"] = position_ids
+        for (key_name, value_name), (key, value) in zip(self._past_names, past):
+            feeds[key_name] = key
+            feeds[value_name] = value
+        
+        outputs = self.session.run(self._output_names, feeds)
+        
+        presents = [(outputs[1 + 2 * layer], outputs[2 + 2 * layer])
+                    for layer in range(len(self._past_names))]
+        return outputs[0], presents
+    
+    def _forward(self, token_ids: List[int], all_logits: bool = False) -> np.ndarray:
+        """
+        Run the decoder on new tokens, reusing and extending the KV cache.
+        
+        Args:
+            token_ids: Tokens not yet seen by the cache
+            all_logits: Return logits for every new position instead of the last
+            
+        Returns:
+            Logits for the last position (vocab_size,), or (len(token_ids), vocab_size);
+            single-token logits may be a buffer reused by the next step
+        """
+        if self.decode_binding is not None and len(token_ids) == 1 and not all_logits:
+            logits = self.decode_binding.step(token_ids[0], self.kv_cache)
+            self._cache_ids.extend(token_ids)
+            return logits
+        
+        past_length = self.kv_cache.length
+        total_length = past_length + len(token_ids)
+        
+        logits, presents = self._run_decoder(
+            np.array([token_ids], dtype=np.int64),
+            np.arange(past_length, total_length, dtype=np.int64)[None, :],
+            np.ones((1, total_length), dtype=np.int64),
+            self.kv_cache.past()
+        )
+        self.kv_cache.append(presents)
+        self._cache_ids.extend(token_ids)
+        
+        return logits[0] if all_logits else logits[0, -1]
+    
+    def _truncate_cache(self, length: int) -> None:
+        """Roll the KV cache back to its first `length` positions."""
+        self.kv_cache.truncate(length)
+        del self._cache_ids[length:]
+    
+    def _prefill(self, input_ids: List[int]) -> np.ndarray:
         """
-        Convert token IDs back to text.
-        This is a placeholder - actual detokenization depends on the model.
+        Prefill a prompt, reusing the longest already computed prefix.
+        The live KV cache (previous turn) and the prefix cache are both
+        checked, so only tokens after the shared prefix are run.
+        
+        Args:
+            input_ids: Prompt token ids
+            
+        Returns:
+            Logits for the last prompt position
+        """
+        # Always leave at least one token to run so there are fresh logits
+        limit = max(len(input_ids) - 1, 0)
+        reuse = min(common_prefix_length(self._cache_ids, input_ids), limit)
+        
+        if self.prefix_cache is not None:
+            length, snapshot = self.prefix_cache.lookup(input_ids)
+            length = min(length, limit)
+            if length > reuse:
+                self.kv_cache.restore(snapshot[0], snapshot[1], length)
+                reuse = length
+        
+        self._truncate_cache(reuse)
+        self._cache_ids = list(input_ids[:reuse])
+        logits = self._forward(input_ids[reuse:])
+        
+        # Prompts too large for the prefix cache are not copied out at all
+        if self.prefix_cache is not None and \
+                self.prefix_cache.would_fit(self.kv_cache.snapshot_nbytes(len(input_ids))):
+            self.prefix_cache.store(input_ids, *self.kv_cache.snapshot(len(input_ids)))
+        
+        return logits
+    
+    def warm_up(self, prompt_tokens: int = 16, decode_tokens: int = 4) -> float:
         """
-        # TODO: Implement proper detokenization
-        # For now, return placeholder
-        return "".join([chr(min(127, tid)) for tid in token_ids if tid > 2])
+        Run a short dummy prefill and decode so kernels, allocator arenas and
+        the IO binding are initialized before the first real request.
+        The KV cache is emptied afterwards and the prefix cache is untouched.
+        
+        Args:
+            prompt_tokens: Length of the dummy prompt
+            decode_tokens: Number of single-token decode steps
+            
+        Returns:
+            Seconds spent warming up
+        """
+        if not self.is_loaded:
+            return 0.0
+        
+        start = time.perf_counter()
+        with self._generate_lock:
+            vocab_size = getattr(self.tokenizer, "vocab_size", None) or 2
+            prompt_tokens = max(1, min(prompt_tokens, self.kv_cache.max_length - decode_tokens - 1))
+            self._truncate_cache(0)
+            logits = self._forward([i % vocab_size for i in range(prompt_tokens)])
+            for _ in range(decode_tokens):
+                logits = self._forward([int(np.argmax(logits))])
+            self._truncate_cache(0)
+        return time.perf_counter() - start
+    
+    def tokenize(self, text: str, add_special_tokens: bool = True) -> List[int]:
+        """Tokenize input text with the model's BPE tokenizer."""
+        return self.tokenizer.encode(text, add_special_tokens=add_special_tokens)
+    
+    def detokenize(self, token_ids: List[int]) -> str:
+        """Convert token IDs back to text, dropping special tokens."""
+        return self.tokenizer.decode(token_ids, skip_special_tokens=True)
     
     def generate(self, 
                  prompt: str,
@@ -87,7 +308,14 @@ class ONNXInferenceEngine:
                  temperature: float = 0.7,
                  top_k: int = 40,
                  top_p: float = 0.9,
-                 streaming_callback: Optional[Callable[[str], None]] = None) -> str:
+                 streaming_callback: Optional[Callable[[str], None]] = None,
+                 stop: Optional[List[str]] = None,
+                 seed: Optional[int] = None,
+                 repetition_penalty: float = 1.0,
+                 frequency_penalty: float = 0.0,
+                 presence_penalty: float = 0.0,
+                 cancel_event: Optional[threading.Event] = None,
+                 n: int = 1) -> Union[str, List[Dict]]:
         """
         Generate text based on prompt.
         
@@ -98,43 +326,375 @@ class ONNXInferenceEngine:
             top_k: Top-K sampling parameter
             top_p: Top-P (nucleus) sampling parameter
             streaming_callback: Optional callback for streaming tokens
+            stop: Optional strings that end generation (not included in output)
+            seed: Optional seed for reproducible sampling
+            repetition_penalty: CTRL-style penalty for tokens already seen (1.0 = off)
+            frequency_penalty: Penalty per previous occurrence of a token
+            presence_penalty: Penalty for any previous occurrence of a token
+            cancel_event: Optional event that ends generation early when set
+            n: Number of independent completions; above 1 the prompt is
+                prefilled once and all samples decode together in one batch
+                (streaming_callback is not used)
             
         Returns:
-            Generated text
+            Generated text, or for n > 1 a list of n dicts with "text",
+            "logprob" (sum of the model's log-probabilities of the sampled
+            tokens) and "tokens"
         """
         if not self.is_loaded:
             return "Error: Model not loaded"
         
         try:
-            # Tokenize input
+            if n > 1:
+                return self._sample_many(prompt, n, max_tokens, temperature, top_k, top_p,
+                                         stop, seed, repetition_penalty, frequency_penalty,
+                                         presence_penalty, cancel_event)
+            return self._generate(prompt, max_tokens, temperature, top_k, top_p,
+                                  streaming_callback, stop, seed, repetition_penalty,
+                                  frequency_penalty, presence_penalty, cancel_event)
+        except Exception as e:
+            return f"Error during generation: {e}"
+    
+    def generate_stream(self, prompt: str, queue_size: int = 32, **kwargs) -> TokenStream:
+        """
+        Generate on a worker thread and iterate over the streamed text.
+        
+        Args:
+            prompt: Input text prompt
+            queue_size: Maximum number of chunks buffered ahead of the consumer
+            **kwargs: Sampling options accepted by generate()
+            
+        Returns:
+            TokenStream yielding text chunks; cancel() or leaving a `with`
+            block stops decoding, and errors are raised from the iterator
+        """
+        if not self.is_loaded:
+            raise RuntimeError("Model not loaded")
+        
+        def run(callback, cancel_event):
+            return self._generate(prompt, streaming_callback=callback,
+                                  cancel_event=cancel_event, **kwargs)
+        
+        return TokenStream(run, queue_size)
+    
+    async def agenerate(self, prompt: str, queue_size: int = 32, **kwargs) -> AsyncIterator[str]:
+        """
+        Async iterator over the streamed text; decoding runs on a worker
+        thread so the event loop is never blocked.
+        
+        Args:
+            prompt: Input text prompt
+            queue_size: Maximum number of chunks buffered ahead of the consumer
+            **kwargs: Sampling options accepted by generate()
+            
+        Yields:
+            Text chunks as they are decoded
+        """
+        stream = self.generate_stream(prompt, queue_size, **kwargs)
+        try:
+            async for text in stream:
+                yield text
+        finally:
+            stream.cancel()
+    
+    def enable_result_cache(self, cache: Optional[GenerationCache]) -> None:
+        """
+        Serve repeated deterministic requests (greedy or seeded) from a cache.
+        
+        Args:
+            cache: GenerationCache, e.g. under StorageManager.generation_cache_dir
+                (None disables caching)
+        """
+        self.result_cache = cache
+    
+    def _result_cache_key(self, input_ids: List[int], max_tokens: int, temperature: float,
+                          top_k: int, top_p: float, stop: Optional[List[str]],
+                          seed: Optional[int], repetition_penalty: float,
+                          frequency_penalty: float, presence_penalty: float) -> str:
+        """Cache key of a deterministic request."""
+        if temperature <= 1e-5 or top_k == 1:
+            # Greedy output does not depend on the other sampling settings
+            temperature, top_k, top_p, seed = 0.0, 1, 1.0, None
+        params = {
+            "max_tokens": max_tokens, "temperature": temperature, "top_k": top_k,
+            "top_p": top_p, "stop": stop, "seed": seed,
+            "repetition_penalty": repetition_penalty,
+            "frequency_penalty": frequency_penalty,
+            "presence_penalty": presence_penalty,
+            "max_length": self.kv_cache.max_length,
+        }
+        if self.speculative is not None:
+            params["draft"] = [self.speculative.draft.model_path,
+                               self.speculative.num_draft_tokens]
+        files = [self._loaded_model_file or self.model_path,
+                 os.path.join(self.model_path, "tokenizer.json"),
+                 os.path.join(self.model_path, "config.json")]
+        model_id = os.path.basename(os.path.normpath(self.model_path))
+        return self.result_cache.make_key(model_id, files, input_ids, params)
+    
+    def _generate(self, prompt: str, max_tokens: int = 512, temperature: float = 0.7,
+                  top_k: int = 40, top_p: float = 0.9,
+                  streaming_callback: Optional[Callable[[str], None]] = None,
+                  stop: Optional[List[str]] = None, seed: Optional[int] = None,
+                  repetition_penalty: float = 1.0, frequency_penalty: float = 0.0,
+                  presence_penalty: float = 0.0,
+                  cancel_event: Optional[threading.Event] = None) -> str:
+        """Result cache in front of the decode loop; raises instead of returning errors."""
+        args = (max_tokens, temperature, top_k, top_p)
+        penalties = (repetition_penalty, frequency_penalty, presence_penalty)
+        if self.result_cache is None or \
+                not GenerationCache.is_deterministic(temperature, top_k, seed):
+            return self._decode(prompt, *args, streaming_callback, stop, seed,
+                                *penalties, cancel_event)
+        
+        key = self._result_cache_key(self.tokenize(prompt), *args, stop, seed, *penalties)
+        chunks = self.result_cache.get(key)
+        if chunks is not None:
+            # Replay the stored stream without running the model
+            for i, chunk in enumerate(chunks):
+                if cancel_event is not None and cancel_event.is_set():
+                    return "".join(chunks[:i])
+                if streaming_callback:
+                    streaming_callback(chunk)
+            return "".join(chunks)
+        
+        chunks = []
+        
+        def record(text):
+            chunks.append(text)
+            if streaming_callback:
+                streaming_callback(text)
+        
+        text = self._decode(prompt, *args, record, stop, seed, *penalties, cancel_event)
+        if cancel_event is None or not cancel_event.is_set():
+            self.result_cache.put(key, chunks)
+        return text
+    
+    def _decode(self, prompt: str, max_tokens: int = 512, temperature: float = 0.7,
+                top_k: int = 40, top_p: float = 0.9,
+                streaming_callback: Optional[Callable[[str], None]] = None,
+                stop: Optional[List[str]] = None, seed: Optional[int] = None,
+                repetition_penalty: float = 1.0, frequency_penalty: float = 0.0,
+                presence_penalty: float = 0.0,
+                cancel_event: Optional[threading.Event] = None) -> str:
+        """Decode loop behind generate(); raises instead of returning errors."""
+        profiler = self.profiler
+        with self._generate_lock:
+            if self.speculative is not None and repetition_penalty == 1.0 \
+                    and not frequency_penalty and not presence_penalty:
+                timer = profiler.phase("speculative") if profiler is not None else nullcontext()
+                with timer:
+                    return self.speculative._generate(prompt, max_tokens, temperature, top_k,
+                                                      top_p, streaming_callback, stop, seed,
+                                                      cancel_event)
+            
+            # Tokenize input, keeping the most recent tokens if the prompt
+            # would not leave room in the cache for at least one new token
+            if profiler is not None:
+                profiler.mark()
             input_ids = self.tokenize(prompt)
+            input_ids = input_ids[-(self.kv_cache.max_length - 1):]
+            # Nothing to condition on; the model cannot run on zero positions
+            if not input_ids:
+                return ""
+            if profiler is not None:
+                profiler.lap("tokenize")
+            
+            # Prefill only what is not already cached
+            logits = self._prefill(input_ids)
+            if profiler is not None:
+                profiler.lap("prefill")
+                profiler.end_step()
+            
+            if seed is not None:
+                self.sampler.reseed(seed)
+            
+            # Token counts for the penalties, updated in place per step
+            token_counts = None
+            if repetition_penalty != 1.0 or frequency_penalty or presence_penalty:
+                token_counts = np.bincount(input_ids, minlength=logits.shape[-1])
             
-            # Generate tokens
-            generated_ids = []
+            # Decode one position per step on top of the cache; the streamer
+            # builds the output text incrementally as tokens arrive
+            streamer = StreamingDetokenizer(self.tokenizer, stop_strings=stop)
             for _ in range(max_tokens):
-                # Run inference (placeholder logic)
-                # In real implementation, this would call self.session.run()
-                # For now, simulate token generation
-                
-                # Mock: Generate random token
-                next_token = np.random.randint(3, 1000)
-                generated_ids.append(next_token)
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                if profiler is not None:
+                    profiler.mark()
+                next_token = self.sampler.sample(
+                    logits, temperature, top_k, top_p,
+                    token_counts=token_counts,
+                    repetition_penalty=repetition_penalty,
+                    frequency_penalty=frequency_penalty,
+                    presence_penalty=presence_penalty
+                )
+                if profiler is not None:
+                    profiler.lap("sample")
                 
-                # Check for EOS token (mock: token ID 2)
-                if next_token == 2:
+                if next_token in self.eos_token_ids:
                     break
+                if token_counts is not None and next_token < len(token_counts):
+                    token_counts[next_token] += 1
                 
-                # Stream token if callback provided
-                if streaming_callback:
-                    token_text = self.detokenize([next_token])
+                # Stream completed text if callback provided
+                token_text = streamer.push(next_token)
+                if profiler is not None:
+                    profiler.lap("detokenize")
+                if token_text and streaming_callback:
                     streaming_callback(token_text)
+                    if profiler is not None:
+                        profiler.lap("callback")
+                
+                finished = streamer.stopped or self.kv_cache.remaining == 0
+                if not finished:
+                    logits = self._forward([next_token])
+                if profiler is not None:
+                    if not finished:
+                        profiler.lap("decode")
+                    profiler.end_step(next_token)
+                if finished:
+                    break
             
-            # Detokenize to text
-            output_text = self.detokenize(generated_ids)
-            return output_text
+            tail = streamer.flush()
+            if tail and streaming_callback:
+                streaming_callback(tail)
             
-        except Exception as e:
-            return f"Error during generation: {e}"
+            return streamer.text
+    
+    def _sample_many(self, prompt: str, n: int, max_tokens: int = 512,
+                     temperature: float = 0.7, top_k: int = 40, top_p: float = 0.9,
+                     stop: Optional[List[str]] = None, seed: Optional[int] = None,
+                     repetition_penalty: float = 1.0, frequency_penalty: float = 0.0,
+                     presence_penalty: float = 0.0,
+                     cancel_event: Optional[threading.Event] = None) -> List[Dict]:
+        """
+        Decode n samples of one prompt in a batch; raises instead of returning errors.
+        The prompt KV is computed once and repeated along the batch axis; each
+        step feeds the model's presents straight back as the next past, and
+        finished samples drop out so later steps only run the sequences still
+        decoding.
+        """
+        with self._generate_lock:
+            input_ids = self.tokenize(prompt)
+            input_ids = input_ids[-(self.kv_cache.max_length - 1):]
+            if not input_ids:
+                return [{"text": "", "logprob": 0.0, "tokens": 0} for _ in range(n)]
+            logits = self._prefill(input_ids)
+            if seed is not None:
+                self.sampler.reseed(seed)
+            
+            keys, values = self.kv_cache.snapshot(len(input_ids))
+            past = [(np.repeat(keys[layer], n, axis=0), np.repeat(values[layer], n, axis=0))
+                    for layer in range(self.kv_cache.num_layers)]
+            
+            penalized = repetition_penalty != 1.0 or frequency_penalty or presence_penalty
+            counts = np.bincount(input_ids, minlength=logits.shape[-1]) if penalized else None
+            samples = [{
+                "streamer": StreamingDetokenizer(self.tokenizer, stop_strings=stop),
+                "counts": counts.copy() if penalized else None,
+                "logprob": 0.0,
+                "tokens": 0,
+            } for _ in range(n)]
+            
+            # Slot i decodes samples[active[i]]; every slot starts from the prompt logits
+            active = list(range(n))
+            rows = np.broadcast_to(logits, (n,) + logits.shape)
+            for step in range(max_tokens):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                survivors, next_tokens = [], []
+                for slot, index in enumerate(active):
+                    sample = samples[index]
+                    token = self.sampler.sample(
+                        rows[slot], temperature, top_k, top_p,
+                        token_counts=sample["counts"],
+                        repetition_penalty=repetition_penalty,
+                        frequency_penalty=frequency_penalty,
+                        presence_penalty=presence_penalty
+                    )
+                    if token in self.eos_token_ids:
+                        continue
+                    row = rows[slot].astype(np.float32)
+                    peak = row.max()
+                    sample["logprob"] += float(row[token] - peak - np.log(np.exp(row - peak).sum()))
+                    sample["tokens"] += 1
+                    if sample["counts"] is not None and token < len(sample["counts"]):
+                        sample["counts"][token] += 1
+                    sample["streamer"].push(token)
+                    if not sample["streamer"].stopped:
+                        survivors.append(slot)
+                        next_tokens.append(token)
+                
+                t = past[0][0].shape[2]
+                if not survivors or step == max_tokens - 1 or t >= self.kv_cache.max_length:
+                    break
+                if len(survivors) < len(active):
+                    # Drop finished sequences from the batch
+                    past = [(key[survivors], value[survivors]) for key, value in past]
+                    active = [active[slot] for slot in survivors]
+                
+                batch = len(active)
+                batch_logits, past = self._run_decoder(
+                    np.array(next_tokens, dtype=np.int64)[:, None],
+                    np.full((batch, 1), t, dtype=np.int64),
+                    np.ones((batch, t + 1), dtype=np.int64),
+                    past
+                )
+                rows = batch_logits[:, -1]
+            
+            results = []
+            for sample in samples:
+                sample["streamer"].flush()
+                results.append({"text": sample["streamer"].text,
+                                "logprob": sample["logprob"],
+                                "tokens": sample["tokens"]})
+            return results
+    
+    def enable_profiler(self, profiler: Optional[Profiler]) -> None:
+        """
+        Time generation phases (tokenize, prefill, sample, detokenize,
+        callback, decode) and report every decoded token.
+        
+        Args:
+            profiler: Profiler to record into (None turns timing off)
+        """
+        self.profiler = profiler
+    
+    def end_profiling(self) -> Optional[str]:
+        """
+        Stop the ONNX Runtime profiler enabled through
+        SessionConfig.profile_dir and write its trace.
+        
+        Returns:
+            Path of the Chrome trace JSON file, or None if profiling is off
+        """
+        if self.session is None or not self.session.get_session_options().enable_profiling:
+            return None
+        return self.session.end_profiling()
+    
+    def enable_speculative(self, draft_engine: "ONNXInferenceEngine",
+                           num_draft_tokens: int = 4) -> bool:
+        """
+        Use a smaller loaded model of the same tokenizer family as a draft model.
+        
+        Args:
+            draft_engine: Loaded draft engine (e.g. SmolLM2-135M for SmolLM2-360M)
+            num_draft_tokens: Tokens drafted per verification pass
+            
+        Returns:
+            True if speculative decoding was enabled
+        """
+        try:
+            self.speculative = SpeculativeDecoder(self, draft_engine, num_draft_tokens)
+            return True
+        except ValueError as e:
+            print(f"Failed to enable speculative decoding: {e}")
+            return False
+    
+    def disable_speculative(self) -> None:
+        """Return to plain autoregressive decoding."""
+        self.speculative = None
     
     def sample_token(self, logits: np.ndarray, temperature: float, 
                      top_k: int, top_p: float) -> int:
@@ -150,46 +710,18 @@ class ONNXInferenceEngine:
         Returns:
             Sampled token ID
         """
-        # Apply temperature
-        logits = logits / max(temperature, 1e-5)
-        
-        # Top-K filtering
-        if top_k > 0:
-            indices_to_remove = logits < np.partition(logits, -top_k)[-top_k]
-            logits[indices_to_remove] = -float('inf')
-        
-        # Convert to probabilities
-        probs = self._softmax(logits)
-        
-        # Top-P (nucleus) filtering
-        if top_p < 1.0:
-            sorted_indices = np.argsort(probs)[::-1]
-            sorted_probs = probs[sorted_indices]
-            cumsum = np.cumsum(sorted_probs)
-            
-            # Remove tokens with cumulative probability above threshold
-            remove_indices = cumsum > top_p
-            if np.any(remove_indices):
-                # Keep at least one token
-                remove_indices[0] = False
-                sorted_indices_to_remove = sorted_indices[remove_indices]
-                probs[sorted_indices_to_remove] = 0
-        
-        # Renormalize
-        probs = probs / np.sum(probs)
-        
-        # Sample
-        return np.random.choice(len(probs), p=probs)
-    
-    @staticmethod
-    def _softmax(x: np.ndarray) -> np.ndarray:
-        """Compute softmax values."""
-        exp_x = np.exp(x - np.max(x))
-        return exp_x / exp_x.sum()
+        return self.sampler.sample(logits, temperature, top_k, top_p)
     
     def unload(self) -> None:
         """Unload the model to free memory."""
         self.session = None
         self.tokenizer = None
         self.config = None
+        self.kv_cache = None
+        self.decode_binding = None
+        self._loaded_model_file = None
+        self._cache_ids = []
+        self.speculative = None
+        if self.prefix_cache is not None:
+            self.prefix_cache.clear()
         self.is_loaded = False
@@ -0,0 +1,469 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import platform
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+# Bumped when the cache layout or keying changes
+OPTIMIZED_CACHE_VERSION = 1
+
+HASH_CHUNK_BYTES = 1 << 20
+
+# Largest model (with its external data) whose optimized copy is cached: the
+# copy duplicates every weight on disk, and protobuf cannot serialize a model
+# of 2 GB or more without external data
+OPTIMIZED_CACHE_MAX_BYTES = 1 << 30
+
+# Name of the digest memo kept next to the optimized models
+HASH_MEMO = "model_hashes.json"
+
+# Age after which a partial optimized model is assumed abandoned (seconds)
+PARTIAL_MAX_AGE = 3600
+
+# Settings key holding the tuned SessionConfig
+SETTINGS_KEY = "onnx_session"
+
+# Sizes of the process-wide thread pools once created (None = not created)
+_global_pool_sizes = None
+_sessions_created = False
+
+
+class SessionConfig:
+    """
+    Thread topology shared by every ONNX Runtime session in the app.
+    With the global thread pool enabled, the LLM and the embedding model run
+    on one set of worker threads instead of each sizing its own pool to the
+    whole CPU and oversubscribing the cores during RAG.
+    """
+
+    def __init__(self, intra_op_threads: int = 0, inter_op_threads: int = 1,
+                 allow_spinning: bool = True, parallel_execution: bool = False,
+                 use_global_thread_pool: bool = True, profile_dir: str = ""):
+        """
+        Initialize the configuration.
+
+        Args:
+            intra_op_threads: Threads used inside one operator (0 = ORT default)
+            inter_op_threads: Threads running independent operators in parallel
+            allow_spinning: Let idle workers busy-wait for lower latency at the
+                cost of battery (per-session threads only: the Python API cannot
+                set spin control on the global pool)
+            parallel_execution: Use ORT_PARALLEL execution mode instead of sequential
+            use_global_thread_pool: Share one process-wide pool between sessions
+            profile_dir: Write ONNX Runtime profiler traces into this directory
+                (empty disables the profiler)
+        """
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.allow_spinning = allow_spinning
+        self.parallel_execution = parallel_execution
+        self.use_global_thread_pool = use_global_thread_pool
+        self.profile_dir = profile_dir
+
+    def to_dict(self) -> Dict:
+        """Serialize for SettingsManager."""
+        return {
+            "intra_op_threads": self.intra_op_threads,
+            "inter_op_threads": self.inter_op_threads,
+            "allow_spinning": self.allow_spinning,
+            "parallel_execution": self.parallel_execution,
+            "use_global_thread_pool": self.use_global_thread_pool,
+            "profile_dir": self.profile_dir,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "SessionConfig":
+        """Build a configuration from `to_dict` output, ignoring unknown keys."""
+        defaults = cls().to_dict()
+        values = {key: (data or {}).get(key, value) for key, value in defaults.items()}
+        return cls(**values)
+
+    @classmethod
+    def from_settings(cls, settings) -> "SessionConfig":
+        """Load the configuration stored in a SettingsManager."""
+        return cls.from_dict(settings.get(SETTINGS_KEY))
+
+    def save(self, settings) -> None:
+        """Store the configuration in a SettingsManager."""
+        settings.set(SETTINGS_KEY, self.to_dict())
+
+    def session_options(self):
+        """
+        Build SessionOptions for this configuration.
+        The global pool can only be sized before the first session exists,
+        so sessions fall back to their own threads if that moment has passed.
+        Once the global pool exists, ONNX Runtime requires every later
+        session to use it, whatever this configuration asks for.
+
+        Returns:
+            onnxruntime.SessionOptions
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.execution_mode = (ort.ExecutionMode.ORT_PARALLEL if self.parallel_execution
+                                  else ort.ExecutionMode.ORT_SEQUENTIAL)
+
+        if _global_pool_sizes is not None or \
+                (self.use_global_thread_pool and _ensure_global_pool(self)):
+            options.use_per_session_threads = False
+        else:
+            options.intra_op_num_threads = self.intra_op_threads
+            options.inter_op_num_threads = self.inter_op_threads
+            # Spinning entries only reach per-session pools
+            spinning = "1" if self.allow_spinning else "0"
+            options.add_session_config_entry("session.intra_op.allow_spinning", spinning)
+            options.add_session_config_entry("session.inter_op.allow_spinning", spinning)
+
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            options.enable_profiling = True
+            options.profile_file_prefix = os.path.join(self.profile_dir, "onnxruntime_profile")
+        return options
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, SessionConfig) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"SessionConfig({self.to_dict()})"
+
+
+def _ensure_global_pool(config: SessionConfig) -> bool:
+    """Create the process-wide thread pools once; False if it is too late."""
+    global _global_pool_sizes
+    if _global_pool_sizes is not None:
+        return True
+    if _sessions_created:
+        return False
+
+    import onnxruntime as ort
+    try:
+        ort.set_global_thread_pool_sizes(config.intra_op_threads, config.inter_op_threads)
+    except Exception as e:
+        print(f"Global thread pool unavailable, using per-session threads: {e}")
+        return False
+    _global_pool_sizes = (config.intra_op_threads, config.inter_op_threads)
+    return True
+
+
+def _mark_session_created() -> None:
+    """Record that the ONNX Runtime environment now exists."""
+    global _sessions_created
+    _sessions_created = True
+
+
+def sample_feeds(session, seq_len: int = 16) -> Dict[str, np.ndarray]:
+    """
+    Build dummy inputs from a session's input metadata for benchmarking.
+    Batch dimensions get 1, past-sequence dimensions 0, other symbolic
+    dimensions `seq_len`.
+
+    Args:
+        session: onnxruntime.InferenceSession
+        seq_len: Length used for symbolic sequence dimensions
+
+    Returns:
+        Feed dict for session.run
+    """
+    feeds = {}
+    for inp in session.get_inputs():
+        shape = []
+        for dim in inp.shape:
+            if isinstance(dim, int):
+                shape.append(dim)
+            elif dim and "batch" in dim:
+                shape.append(1)
+            elif dim and "past" in dim and "+" not in dim:
+                shape.append(0)
+            else:
+                shape.append(seq_len)
+        if inp.type == "tensor(int64)":
+            if inp.name == "position_ids":
+                feeds[inp.name] = np.broadcast_to(np.arange(shape[-1], dtype=np.int64), shape).copy()
+            else:
+                feeds[inp.name] = np.ones(shape, dtype=np.int64)
+        elif inp.type == "tensor(float16)":
+            feeds[inp.name] = np.zeros(shape, dtype=np.float16)
+        else:
+            feeds[inp.name] = np.zeros(shape, dtype=np.float32)
+    return feeds
+
+
+def candidate_configs(cpu_count: Optional[int] = None) -> List[SessionConfig]:
+    """
+    Thread counts worth trying on this device. Spinning is not tuned: the
+    winner sizes the global pool, where it cannot be applied.
+    """
+    cores = cpu_count or os.cpu_count() or 1
+    threads = sorted({n for n in (1, 2, 4, cores // 2, cores) if 1 <= n <= cores})
+    return [SessionConfig(intra_op_threads=n) for n in threads]
+
+
+def _time_config(model_file: str, config: SessionConfig, feeds: Optional[Dict],
+                 runs: int) -> float:
+    """Median run time of a model under one configuration with per-session threads."""
+    import onnxruntime as ort
+
+    per_session = SessionConfig.from_dict(config.to_dict())
+    per_session.use_global_thread_pool = False
+    session = ort.InferenceSession(model_file, sess_options=per_session.session_options(),
+                                   providers=['CPUExecutionProvider'])
+    _mark_session_created()
+    inputs = feeds if feeds is not None else sample_feeds(session)
+    session.run(None, inputs)
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        session.run(None, inputs)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def auto_tune(model_file: str, settings=None, feeds: Optional[Dict] = None,
+              candidates: Optional[List[SessionConfig]] = None,
+              runs: int = 5) -> Tuple[SessionConfig, List[Tuple[SessionConfig, float]]]:
+    """
+    Benchmark session configurations on this device and keep the fastest.
+    Each candidate runs with its own threads, so tuning must happen before
+    the global pool exists; call it before the first session of the launch.
+    The tuning sessions create the ONNX Runtime environment, so this launch
+    keeps per-session threads sized by the winner and the global pool
+    follows it from the next launch.
+
+    Args:
+        model_file: Model to benchmark
+        settings: Optional SettingsManager to store the winner in
+        feeds: Representative inputs (dummy inputs from sample_feeds if None)
+        candidates: Configurations to try (candidate_configs() if None)
+        runs: Timed runs per configuration (median is compared)
+
+    Returns:
+        (best configuration, [(configuration, median seconds)] for every
+        candidate), or (None, []) if the global pool already exists
+    """
+    if _global_pool_sizes is not None:
+        print("Session auto-tuning skipped: run it before the first session is created")
+        return None, []
+
+    results = []
+    for candidate in candidates or candidate_configs():
+        seconds = _time_config(model_file, candidate, feeds, runs)
+        results.append((candidate, seconds))
+
+    best = min(results, key=lambda item: item[1])[0]
+    if settings is not None:
+        # Tuning only picks threads; keep the user's profiler switch
+        best.profile_dir = SessionConfig.from_settings(settings).profile_dir
+        best.save(settings)
+    return best, results
+
+
+def file_sha256(path: str, memo_file: Optional[str] = None) -> str:
+    """
+    Hash a file, reusing a memoized digest while its size and mtime are unchanged.
+
+    Args:
+        path: File to hash
+        memo_file: Optional JSON file remembering digests between launches
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    stat = os.stat(path)
+    signature = [stat.st_size, stat.st_mtime_ns]
+    key = os.path.abspath(path)
+
+    memo = {}
+    if memo_file and os.path.exists(memo_file):
+        try:
+            with open(memo_file, 'r') as f:
+                memo = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            memo = {}
+        entry = memo.get(key)
+        if entry and entry.get("signature") == signature:
+            return entry["sha256"]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    sha256 = digest.hexdigest()
+
+    if memo_file:
+        memo[key] = {"signature": signature, "sha256": sha256}
+        try:
+            with open(memo_file, 'w') as f:
+                json.dump(memo, f)
+        except IOError as e:
+            print(f"Failed to save model hashes: {e}")
+    return sha256
+
+
+def optimized_model_path(model_file: str, cache_dir: str, options: Dict) -> str:
+    """
+    Location of the pre-optimized copy of a model.
+    The name is keyed by the model's content hash, the ONNX Runtime version,
+    the CPU architecture and the options that shape the optimized graph.
+
+    Args:
+        model_file: Source .onnx file
+        cache_dir: Directory holding optimized models
+        options: Session options that affect optimization
+
+    Returns:
+        Path of the optimized model (may not exist yet)
+    """
+    import onnxruntime as ort
+
+    model_hash = file_sha256(model_file, os.path.join(cache_dir, HASH_MEMO))
+    key = json.dumps({
+        "cache_version": OPTIMIZED_CACHE_VERSION,
+        "model": model_hash,
+        "ort": ort.__version__,
+        "machine": platform.machine(),
+        "options": options,
+    }, sort_keys=True)
+    key_hash = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{_model_prefix(model_file)}-{key_hash}.onnx")
+
+
+def _model_prefix(model_file: str) -> str:
+    """Stable file-name prefix for every optimized copy of one model path."""
+    return hashlib.sha256(os.path.abspath(model_file).encode()).hexdigest()[:12]
+
+
+def model_bytes(model_file: str) -> int:
+    """Size of a model file plus the external data file next to it, if any."""
+    total = os.path.getsize(model_file)
+    for suffix in ("_data", ".data"):
+        if os.path.exists(model_file + suffix):
+            total += os.path.getsize(model_file + suffix)
+    return total
+
+
+def _prune_cache(model_file: str, cache_dir: str, keep: Optional[str] = None) -> None:
+    """
+    Delete optimized copies that can no longer be used: copies of this model
+    made for another model version, ONNX Runtime version or options, copies
+    of models that no longer exist and partial files an interrupted launch
+    left behind. Digests of vanished models are dropped from the memo too.
+
+    Args:
+        model_file: Model whose copy was just written (or skipped)
+        cache_dir: Directory holding optimized models
+        keep: Optimized copy to keep
+    """
+    memo_file = os.path.join(cache_dir, HASH_MEMO)
+    memo = {}
+    try:
+        with open(memo_file, 'r') as f:
+            memo = json.load(f)
+    except (json.JSONDecodeError, IOError):
+        pass
+    live = {path: entry for path, entry in memo.items() if os.path.exists(path)}
+    if len(live) != len(memo):
+        try:
+            with open(memo_file, 'w') as f:
+                json.dump(live, f)
+        except IOError as e:
+            print(f"Failed to save model hashes: {e}")
+
+    own = _model_prefix(model_file)
+    prefixes = {_model_prefix(path) for path in live} - {own}
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if not name.endswith(".onnx") or path == keep:
+            continue
+        try:
+            if name.endswith(".partial.onnx"):
+                # Another process may still be writing a recent one
+                stale = time.time() - os.path.getmtime(path) > PARTIAL_MAX_AGE
+            else:
+                stale = name.split("-", 1)[0] not in prefixes
+            if stale:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def create_session(model_file: str, cache_dir: Optional[str] = None,
+                   session_config: Optional[SessionConfig] = None,
+                   providers: Optional[List[str]] = None,
+                   max_cached_bytes: int = OPTIMIZED_CACHE_MAX_BYTES) -> Tuple[object, Dict]:
+    """
+    Create an InferenceSession, reusing a serialized pre-optimized model.
+    The first load optimizes with ORT_ENABLE_ALL and writes the result to
+    `cache_dir`; later loads read that file with optimization disabled.
+    Models larger than `max_cached_bytes`, or than the free disk space,
+    are optimized on every load instead.
+
+    Args:
+        model_file: Path to the .onnx model
+        cache_dir: Directory for optimized models (None disables the cache)
+        session_config: Thread topology (SessionConfig defaults if None)
+        providers: Execution providers (CPU by default)
+        max_cached_bytes: Largest model (with external data) to cache
+
+    Returns:
+        (session, load info with "seconds", "cache_hit" and "optimized_model")
+    """
+    import onnxruntime as ort
+
+    providers = providers or ['CPUExecutionProvider']
+    options = (session_config or SessionConfig()).session_options()
+    _mark_session_created()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+    start = time.perf_counter()
+    info = {"cache_hit": False, "optimized_model": None}
+
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        size = model_bytes(model_file)
+        if size > max_cached_bytes or size > shutil.disk_usage(cache_dir).free:
+            print(f"Not caching the optimized copy of {model_file} ({size / 1e6:.0f} MB)")
+            _prune_cache(model_file, cache_dir)
+            cache_dir = None
+
+    if cache_dir is None:
+        session = ort.InferenceSession(model_file, sess_options=options, providers=providers)
+        info["seconds"] = time.perf_counter() - start
+        return session, info
+
+    cached = optimized_model_path(model_file, cache_dir, {
+        "providers": providers,
+        "optimization": str(options.graph_optimization_level),
+    })
+    info["optimized_model"] = cached
+
+    session = None
+    if os.path.exists(cached):
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        try:
+            session = ort.InferenceSession(cached, sess_options=options, providers=providers)
+            info["cache_hit"] = True
+        except Exception as e:
+            print(f"Discarding unreadable optimized model {cached}: {e}")
+            os.remove(cached)
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+    if session is None:
+        # Write to a temporary name so an interrupted launch never leaves a
+        # truncated file behind under the final name
+        partial = cached[:-len(".onnx")] + f".{os.getpid()}.partial.onnx"
+        options.optimized_model_filepath = partial
+        session = ort.InferenceSession(model_file, sess_options=options, providers=providers)
+        options.optimized_model_filepath = ""
+        try:
+            os.replace(partial, cached)
+            _prune_cache(model_file, cache_dir, keep=cached)
+        except OSError as e:
+            print(f"Failed to cache optimized model: {e}")
+
+    info["seconds"] = time.perf_counter() - start
+    return session, info
@@ -0,0 +1,116 @@
+import numpy as np
+from collections import OrderedDict
+from typing import List, Tuple, Optional
+
+def common_prefix_length(a, b) -> int:
+    """
+    Length of the shared prefix of two token id sequences.
+
+    Args:
+        a: First token sequence
+        b: Second token sequence
+
+    Returns:
+        Number of leading tokens that are equal
+    """
+    n = min(len(a), len(b))
+    if n == 0:
+        return 0
+    diff = np.flatnonzero(np.asarray(a[:n]) != np.asarray(b[:n]))
+    return int(diff[0]) if diff.size else n
+
+
+class PrefixCache:
+    """
+    Byte-budgeted LRU cache of KV snapshots keyed by token prefix.
+    Because attention is causal, the KV of the first N positions of any
+    stored sequence is valid for every prompt sharing those N tokens, so
+    lookups return the longest shared prefix across all entries.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes: Memory budget for stored KV tensors
+        """
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, token_ids: List[int]) -> Tuple[int, Optional[Tuple[np.ndarray, np.ndarray]]]:
+        """
+        Find the entry sharing the longest prefix with `token_ids`.
+
+        Args:
+            token_ids: Prompt token ids
+
+        Returns:
+            (matched length, (keys, values)) or (0, None) on a miss
+        """
+        best_key = None
+        best_length = 0
+        for key, (ids, _, _) in self.entries.items():
+            length = common_prefix_length(ids, token_ids)
+            if length > best_length:
+                best_key = key
+                best_length = length
+
+        if best_key is None:
+            self.misses += 1
+            return 0, None
+
+        self.hits += 1
+        self.entries.move_to_end(best_key)
+        _, keys, values = self.entries[best_key]
+        return best_length, (keys, values)
+
+    def would_fit(self, nbytes: int) -> bool:
+        """Check whether an entry of `nbytes` fits the budget at all."""
+        return 0 < nbytes <= self.max_bytes
+
+    def store(self, token_ids: List[int], keys: np.ndarray, values: np.ndarray) -> bool:
+        """
+        Store the KV snapshot of a token sequence.
+
+        Args:
+            token_ids: Tokens covered by the snapshot
+            keys: Key tensors (layers, batch, heads, len(token_ids), head_dim)
+            values: Value tensors with the same shape as `keys`
+
+        Returns:
+            True if the snapshot was stored
+        """
+        size = keys.nbytes + values.nbytes
+        if not token_ids or not self.would_fit(size):
+            return False
+
+        key = tuple(token_ids)
+        ids = np.asarray(token_ids, dtype=np.int64)
+
+        # Drop entries this one fully covers (they are prefixes of it)
+        for other in list(self.entries):
+            other_ids = self.entries[other][0]
+            if len(other_ids) <= len(ids) and \
+                    common_prefix_length(other_ids, ids) == len(other_ids):
+                self._remove(other)
+
+        self.entries[key] = (ids, keys, values)
+        self.total_bytes += size
+
+        while self.total_bytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+        return True
+
+    def _remove(self, key: Tuple[int, ...]) -> None:
+        """Remove one entry and release its bytes."""
+        _, keys, values = self.entries.pop(key)
+        self.total_bytes -= keys.nbytes + values.nbytes
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        self.entries.clear()
+        self.total_bytes = 0
@@ -0,0 +1,99 @@
+import time
+from typing import Dict, Optional, Callable
+
+class Profiler:
+    """
+    Per-phase timers and per-step timing callbacks for the inference engines.
+    Engines only touch a profiler when one is attached (`engine.profiler`),
+    so an unprofiled run pays nothing beyond a None check per step.
+    """
+
+    def __init__(self, step_callback: Optional[Callable[[Dict], None]] = None):
+        """
+        Initialize the profiler.
+
+        Args:
+            step_callback: Called after the prompt prefill and after every
+                decoded token with a dict holding "step", "token" (None for
+                the prefill) and the seconds spent in each phase of that step
+        """
+        self.step_callback = step_callback
+        self.totals = {}
+        self.counts = {}
+        self.steps = 0
+        self._mark = 0.0
+        self._step = {}
+
+    def mark(self) -> None:
+        """Start timing the next lap from now."""
+        self._mark = time.perf_counter()
+
+    def lap(self, name: str) -> None:
+        """Charge the time since the last mark or lap to phase `name`."""
+        now = time.perf_counter()
+        self.add(name, now - self._mark)
+        self._step[name] = self._step.get(name, 0.0) + now - self._mark
+        self._mark = now
+
+    def add(self, name: str, seconds: float) -> None:
+        """
+        Record time spent in a phase.
+
+        Args:
+            name: Phase name, e.g. "prefill" or "sample"
+            seconds: Elapsed wall time
+        """
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def phase(self, name: str) -> "_Phase":
+        """
+        Time a block as phase `name`.
+
+        Returns:
+            Context manager
+        """
+        return _Phase(self, name)
+
+    def end_step(self, token: Optional[int] = None) -> None:
+        """Close the current step and report its laps to the step callback."""
+        laps, self._step = self._step, {}
+        if self.step_callback:
+            self.step_callback({"step": self.steps, "token": token, **laps})
+        self.steps += 1
+
+    def summary(self) -> Dict[str, Dict]:
+        """
+        Get the accumulated timings.
+
+        Returns:
+            Dict of phase name -> {"seconds", "count", "mean_ms"}
+        """
+        return {name: {"seconds": seconds,
+                       "count": self.counts[name],
+                       "mean_ms": seconds * 1000 / self.counts[name]}
+                for name, seconds in self.totals.items()}
+
+    def reset(self) -> None:
+        """Forget all recorded timings."""
+        self.totals.clear()
+        self.counts.clear()
+        self._step = {}
+        self.steps = 0
+
+
+class _Phase:
+    """Context manager returned by Profiler.phase."""
+
+    def __init__(self, profiler: Profiler, name: str):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+        return False
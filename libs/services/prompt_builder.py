@@ -0,0 +1,270 @@
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# ChatML, as used by the SmolLM2 instruct models
+CHATML_MESSAGE = "<|im_start|>{role}\n{content}<|im_end|>\n"
+CHATML_GENERATION_PREFIX = "<|im_start|>assistant\n"
+
+
+class _ChatHistory:
+    """Rendered messages of one chat with running token totals."""
+
+    def __init__(self, start: Optional[int] = None):
+        self.rendered = []
+        # totals[i] = tokens of the first i messages
+        self.totals = [0]
+        # (role, timestamp, content) of the last message seen, to detect edits
+        self.last = None
+        # Oldest earlier turn kept in the prompt (None = keep as much as fits)
+        self.start = start
+
+
+class PromptBuilder:
+    """
+    Assembles a chat prompt that fits a token budget.
+    The system prompt, retrieved RAG chunks and the most recent turns are
+    counted with the model's tokenizer. Counts are cached per message, and
+    for a chat built with a window key its rendered messages and running
+    token totals are kept too, so a new turn only renders and tokenizes
+    what is new. The window of kept turns slides in steps rather than one
+    turn at a time, which keeps the prompt prefix, and so the engine's
+    prefix KV cache, stable across consecutive turns.
+    """
+
+    def __init__(self, tokenizer, context_tokens: int = 2048, reserve_tokens: int = 512,
+                 context_fraction: float = 0.5, slide_fraction: float = 0.75,
+                 message_format: str = CHATML_MESSAGE,
+                 generation_prefix: str = CHATML_GENERATION_PREFIX,
+                 cache_size: int = 4096, chat_cache_size: int = 16):
+        """
+        Initialize the builder.
+
+        Args:
+            tokenizer: Tokenizer with encode(text, add_special_tokens=False)
+            context_tokens: Model context window
+            reserve_tokens: Tokens kept free for the reply
+            context_fraction: Largest share of the free budget RAG chunks may use
+            slide_fraction: Share of the history budget filled after the window
+                slides, leaving room for the next few turns
+            message_format: Format of one message with {role} and {content}
+            generation_prefix: Text that opens the assistant reply
+            cache_size: Number of cached token counts
+            chat_cache_size: Number of chats whose rendered history is kept
+        """
+        self.tokenizer = tokenizer
+        self.context_tokens = context_tokens
+        self.reserve_tokens = reserve_tokens
+        self.context_fraction = context_fraction
+        self.slide_fraction = slide_fraction
+        self.message_format = message_format
+        self.generation_prefix = generation_prefix
+        self.cache_size = cache_size
+        self.chat_cache_size = chat_cache_size
+
+        self._counts = OrderedDict()
+        self._histories = OrderedDict()
+        self.tokenized = 0
+
+    @property
+    def budget(self) -> int:
+        """Tokens available for the prompt."""
+        return max(self.context_tokens - self.reserve_tokens, 0)
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Count the tokens of a piece of text, cached by content.
+
+        Args:
+            text: Text to count
+
+        Returns:
+            Number of tokens
+        """
+        count = self._counts.get(text)
+        if count is not None:
+            self._counts.move_to_end(text)
+            return count
+
+        count = len(self.tokenizer.encode(text, add_special_tokens=False))
+        self.tokenized += 1
+        self._counts[text] = count
+        if len(self._counts) > self.cache_size:
+            self._counts.popitem(last=False)
+        return count
+
+    def format_message(self, role: str, content: str) -> str:
+        """Render one message with the chat template."""
+        return self.message_format.format(role=role, content=content)
+
+    def build(self, messages: List[Dict[str, Any]], system_prompt: str = "",
+              context_chunks: Optional[List[str]] = None,
+              window_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Assemble a prompt within the budget.
+
+        Args:
+            messages: Chat messages with "role" and "content", oldest first;
+                the last one (normally the new user turn) is always kept, cut
+                from the front if it alone does not fit
+            system_prompt: Instructions placed first
+            context_chunks: Retrieved passages, most relevant first
+            window_key: Chat id whose window position is remembered between calls
+
+        Returns:
+            Dict with "prompt", "tokens", per-section token counts in "sections"
+            (system, context, history, generation_prefix), "messages_used",
+            "chunks_used" and "truncated" (whether the last message was cut)
+        """
+        budget = self.budget
+        prefix_tokens = self.count_tokens(self.generation_prefix)
+
+        system_text = self.format_message("system", system_prompt) if system_prompt else ""
+        system_tokens = self.count_tokens(system_text) if system_text else 0
+
+        history = self._history(messages, window_key)
+        totals = history.totals
+        # Earlier turns are messages[:end]; the latest one is always kept
+        end = max(len(messages) - 1, 0)
+        latest_text = "".join(history.rendered[end:])
+        latest_tokens = totals[-1] - totals[end]
+        room = budget - prefix_tokens - system_tokens
+        truncated = bool(messages) and latest_tokens > room
+        if truncated:
+            latest_text, latest_tokens = self._truncate(messages[-1], room)
+        free = room - latest_tokens
+
+        # Most relevant chunks first, up to their share of the free budget
+        chunks = []
+        if context_chunks:
+            limit = int(max(free, 0) * self.context_fraction)
+            used = self.count_tokens(self._context_text([]))
+            for chunk in context_chunks:
+                cost = self.count_tokens(self._chunk_text(chunk))
+                if used + cost > limit:
+                    break
+                chunks.append(chunk)
+                used += cost
+
+        if chunks:
+            system_content = system_prompt + self._context_text(chunks)
+            system_text = self.format_message("system", system_content)
+        context_tokens = (self.count_tokens(system_text) - system_tokens) if chunks else 0
+
+        # Earlier turns, newest first, with whatever is left
+        history_budget = max(free - context_tokens, 0)
+        start = self._window(history, end, history_budget)
+        history_tokens = totals[end] - totals[start]
+
+        prompt = system_text + "".join(history.rendered[start:end]) + latest_text + \
+            self.generation_prefix
+        return {
+            "prompt": prompt,
+            "tokens": system_tokens + context_tokens + history_tokens + latest_tokens + prefix_tokens,
+            "sections": {
+                "system": system_tokens,
+                "context": context_tokens,
+                "history": history_tokens + latest_tokens,
+                "generation_prefix": prefix_tokens,
+            },
+            "messages_used": len(messages) - start,
+            "chunks_used": len(chunks),
+            "truncated": truncated,
+        }
+
+    def build_chat(self, chat_manager, chat_id: str, system_prompt: str = "",
+                   context_chunks: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Assemble the prompt for a stored chat.
+
+        Args:
+            chat_manager: ChatManager holding the chat
+            chat_id: Chat to continue
+            system_prompt: Instructions placed first
+            context_chunks: Retrieved passages, most relevant first
+
+        Returns:
+            Same as build(), or None if the chat does not exist
+        """
+        chat = chat_manager.load_chat(chat_id)
+        if chat is None:
+            return None
+        return self.build(chat["messages"], system_prompt, context_chunks, window_key=chat_id)
+
+    def _history(self, messages: List[Dict[str, Any]],
+                 window_key: Optional[str]) -> _ChatHistory:
+        """Cached history of a chat, extended with its new messages."""
+        history = self._histories.get(window_key) if window_key is not None else None
+        if history is None:
+            history = _ChatHistory(0 if window_key is not None else None)
+            if window_key is not None:
+                self._histories[window_key] = history
+                if len(self._histories) > self.chat_cache_size:
+                    self._histories.popitem(last=False)
+        else:
+            self._histories.move_to_end(window_key)
+
+        # Chats only grow; if the last seen message changed, render it all again
+        seen = len(history.rendered)
+        if seen and (seen > len(messages) or self._signature(messages[seen - 1]) != history.last):
+            history.__init__(history.start)
+            seen = 0
+
+        for message in messages[seen:]:
+            text = self.format_message(message["role"], message["content"])
+            history.rendered.append(text)
+            history.totals.append(history.totals[-1] + self.count_tokens(text))
+        if messages:
+            history.last = self._signature(messages[-1])
+        return history
+
+    def _truncate(self, message: Dict[str, Any], room: int) -> tuple:
+        """
+        Render a message keeping only the end of its content that fits.
+
+        Args:
+            message: Message larger than the room left in the budget
+            room: Tokens available for the rendered message
+
+        Returns:
+            Rendered text and its token count (over `room` only if not even
+            the empty message fits)
+        """
+        role, content = message["role"], message["content"]
+        # Smallest number of leading characters to drop
+        low, high = 0, len(content)
+        while low < high:
+            cut = (low + high) // 2
+            text = self.format_message(role, content[cut:])
+            self.tokenized += 1
+            if len(self.tokenizer.encode(text, add_special_tokens=False)) <= room:
+                high = cut
+            else:
+                low = cut + 1
+        text = self.format_message(role, content[low:])
+        return text, self.count_tokens(text)
+
+    @staticmethod
+    def _signature(message: Dict[str, Any]) -> tuple:
+        return message["role"], message.get("timestamp"), message["content"]
+
+    def _window(self, history: _ChatHistory, end: int, budget: int) -> int:
+        """Index of the oldest earlier turn to keep among messages[:end]."""
+        totals = history.totals
+        start = history.start
+        if start is not None:
+            start = min(start, end)
+        if start is None or totals[end] - totals[start] > budget:
+            # Keep the newest turns that fit; after a slide only a fraction
+            # of the budget, leaving room for the next few turns
+            target = budget if start is None else budget * self.slide_fraction
+            start = bisect_left(totals, totals[end] - target, 0, end + 1)
+        history.start = start
+        return start
+
+    @staticmethod
+    def _chunk_text(chunk: str) -> str:
+        return f"\n- {chunk}"
+
+    def _context_text(self, chunks: List[str]) -> str:
+        return "\n\nContext:" + "".join(self._chunk_text(c) for c in chunks)
@@ -0,0 +1,190 @@
+import numpy as np
+from typing import Optional
+
+class Sampler:
+    """
+    Vectorized next-token sampler with temperature, top-k, top-p and
+    repetition/frequency/presence penalties.
+    Candidates are narrowed with `argpartition` before anything is sorted,
+    so a step costs O(vocab) plus O(k log k) instead of a full-vocabulary sort.
+    """
+
+    # Initial candidate count when top-p runs without top-k
+    NUCLEUS_START = 64
+
+    def __init__(self, seed: Optional[int] = None):
+        """
+        Initialize the sampler.
+
+        Args:
+            seed: Seed for the random generator (None for nondeterministic)
+        """
+        self.rng = np.random.default_rng(seed)
+
+    def reseed(self, seed: Optional[int]) -> None:
+        """Reset the random generator."""
+        self.rng = np.random.default_rng(seed)
+
+    @staticmethod
+    def apply_penalties(logits: np.ndarray, token_counts: np.ndarray,
+                        repetition_penalty: float = 1.0,
+                        frequency_penalty: float = 0.0,
+                        presence_penalty: float = 0.0) -> np.ndarray:
+        """
+        Penalize tokens that already appeared.
+
+        Args:
+            logits: Model output logits (vocab_size,), not modified
+            token_counts: Occurrence count per token id, e.g. from np.bincount
+            repetition_penalty: CTRL-style divisor for seen tokens (1.0 = off)
+            frequency_penalty: Subtracted once per occurrence
+            presence_penalty: Subtracted once for any occurrence
+
+        Returns:
+            Penalized copy of the logits
+        """
+        seen = np.flatnonzero(token_counts[:len(logits)])
+        logits = logits.astype(np.float32, copy=True)
+        if seen.size == 0:
+            return logits
+
+        values = logits[seen]
+        if repetition_penalty != 1.0:
+            values = np.where(values > 0, values / repetition_penalty,
+                              values * repetition_penalty)
+        if frequency_penalty:
+            values = values - frequency_penalty * token_counts[seen]
+        if presence_penalty:
+            values = values - presence_penalty
+        logits[seen] = values
+        return logits
+
+    def sample(self, logits: np.ndarray, temperature: float = 0.7,
+               top_k: int = 40, top_p: float = 0.9,
+               token_counts: Optional[np.ndarray] = None,
+               repetition_penalty: float = 1.0,
+               frequency_penalty: float = 0.0,
+               presence_penalty: float = 0.0) -> int:
+        """
+        Sample the next token id.
+
+        Args:
+            logits: Model output logits (vocab_size,), not modified
+            temperature: Sampling temperature (<= 0 selects greedily)
+            top_k: Keep only the k most likely tokens (0 = off)
+            top_p: Keep the smallest set with cumulative probability >= top_p
+            token_counts: Occurrence count per token id for the penalties
+            repetition_penalty: CTRL-style divisor for seen tokens (1.0 = off)
+            frequency_penalty: Subtracted once per occurrence
+            presence_penalty: Subtracted once for any occurrence
+
+        Returns:
+            Sampled token id
+        """
+        if token_counts is not None and (repetition_penalty != 1.0 or
+                                         frequency_penalty or presence_penalty):
+            logits = self.apply_penalties(logits, token_counts, repetition_penalty,
+                                          frequency_penalty, presence_penalty)
+
+        if temperature <= 1e-5 or top_k == 1:
+            return int(np.argmax(logits))
+
+        candidates, probs = self.distribution(logits, temperature, top_k, top_p)
+        return self.draw(candidates, probs)
+
+    def distribution(self, logits: np.ndarray, temperature: float = 0.7,
+                     top_k: int = 40, top_p: float = 0.9):
+        """
+        Compute the filtered sampling distribution.
+
+        Args:
+            logits: Model output logits (vocab_size,), not modified
+            temperature: Sampling temperature (<= 0 selects greedily)
+            top_k: Keep only the k most likely tokens (0 = off)
+            top_p: Keep the smallest set with cumulative probability >= top_p
+
+        Returns:
+            (candidate ids, probabilities) with candidates None meaning the
+            whole vocabulary in id order; probabilities may be unnormalized
+        """
+        if temperature <= 1e-5 or top_k == 1:
+            return np.array([np.argmax(logits)]), np.ones(1, dtype=np.float32)
+
+        vocab_size = logits.shape[-1]
+        scaled = logits * np.float32(1.0 / temperature)
+
+        if 0 < top_k < vocab_size:
+            # Top-k first: softmax and nucleus only over the k candidates
+            candidates = np.argpartition(scaled, -top_k)[-top_k:]
+            cand_logits = scaled[candidates]
+            order = np.argsort(cand_logits)[::-1]
+            candidates = candidates[order]
+            probs = np.exp(cand_logits[order] - cand_logits[order[0]])
+            probs /= probs.sum()
+        elif top_p < 1.0:
+            candidates, probs = self._nucleus_candidates(scaled, top_p)
+        else:
+            return None, np.exp(scaled - scaled.max())
+
+        if top_p < 1.0:
+            # Smallest prefix whose mass reaches top_p (always keeps one)
+            cutoff = int(np.searchsorted(np.cumsum(probs), top_p)) + 1
+            probs = probs[:cutoff]
+            candidates = candidates[:cutoff]
+
+        return candidates, probs
+
+    def probabilities(self, logits: np.ndarray, temperature: float = 0.7,
+                      top_k: int = 40, top_p: float = 0.9) -> np.ndarray:
+        """
+        Get the filtered sampling distribution as a dense vector.
+
+        Returns:
+            Normalized probabilities (vocab_size,)
+        """
+        candidates, probs = self.distribution(logits, temperature, top_k, top_p)
+        if candidates is None:
+            return probs / probs.sum()
+        dense = np.zeros(logits.shape[-1], dtype=np.float64)
+        dense[candidates] = probs / probs.sum()
+        return dense
+
+    def draw(self, candidates: Optional[np.ndarray], probs: np.ndarray) -> int:
+        """
+        Draw one token from a (possibly unnormalized) distribution.
+
+        Args:
+            candidates: Token ids, or None when probs covers the whole vocabulary
+            probs: Non-negative weights aligned with candidates
+
+        Returns:
+            Sampled token id
+        """
+        cdf = np.cumsum(probs)
+        index = int(np.searchsorted(cdf, self.rng.random() * cdf[-1], side='right'))
+        index = min(index, len(probs) - 1)
+        return index if candidates is None else int(candidates[index])
+
+    def _nucleus_candidates(self, scaled: np.ndarray, top_p: float):
+        """
+        Find enough top candidates to cover `top_p` of the full distribution,
+        growing a partitioned candidate set instead of sorting the vocabulary.
+
+        Returns:
+            (candidate ids sorted by probability, their full-vocab probabilities)
+        """
+        exp = np.exp(scaled - scaled.max())
+        exp /= exp.sum()
+
+        vocab_size = scaled.shape[-1]
+        k = min(self.NUCLEUS_START, vocab_size)
+        while True:
+            if k < vocab_size:
+                candidates = np.argpartition(exp, -k)[-k:]
+            else:
+                candidates = np.arange(vocab_size)
+            probs = exp[candidates]
+            if k >= vocab_size or probs.sum() >= top_p:
+                order = np.argsort(probs)[::-1]
+                return candidates[order], probs[order]
+            k *= 4
@@ -37,7 +37,10 @@ class SettingsManager:
             "top_k": 40,
             "top_p": 0.9,
             "max_tokens": 512,
-            "theme": "dark"
+            "theme": "dark",
+            "onnx_session": {},
+            "memory_budget_mb": 0,
+            "model_routing": {}
         }
     
     def get(self, key: str, default: Any = None) -> Any:
@@ -0,0 +1,207 @@
+import threading
+import numpy as np
+from typing import List, Optional, Callable
+from libs.services.sampler import Sampler
+from libs.services.streaming_detokenizer import StreamingDetokenizer
+
+class SpeculativeDecoder:
+    """
+    Speculative decoding with a small draft model and a larger target model.
+    The draft proposes a few tokens, the target scores all of them in one
+    forward pass, and standard acceptance sampling (accept with probability
+    min(1, p/q), otherwise resample from max(0, p - q)) keeps the output
+    distributed exactly as if the target had decoded alone.
+    """
+
+    def __init__(self, target, draft, num_draft_tokens: int = 4,
+                 seed: Optional[int] = None):
+        """
+        Initialize the decoder.
+
+        Args:
+            target: Loaded ONNXInferenceEngine whose distribution is preserved
+            draft: Loaded ONNXInferenceEngine sharing the target's vocabulary
+            num_draft_tokens: Tokens proposed per verification pass
+            seed: Seed for draft sampling and acceptance tests
+        """
+        if target.tokenizer is not None and draft.tokenizer is not None and \
+                getattr(target.tokenizer, "vocab", None) != getattr(draft.tokenizer, "vocab", None):
+            raise ValueError("Draft and target models must share a tokenizer vocabulary")
+
+        if draft is target:
+            raise ValueError("The draft model must be a separate engine")
+
+        self.target = target
+        self.draft = draft
+        self.num_draft_tokens = num_draft_tokens
+        self.sampler = Sampler(seed)
+
+        # Acceptance statistics from the last generate() call
+        self.proposed = 0
+        self.accepted = 0
+
+    @property
+    def acceptance_rate(self) -> float:
+        """Fraction of drafted tokens accepted by the target."""
+        return self.accepted / self.proposed if self.proposed else 0.0
+
+    def generate(self,
+                 prompt: str,
+                 max_tokens: int = 512,
+                 temperature: float = 0.7,
+                 top_k: int = 40,
+                 top_p: float = 0.9,
+                 streaming_callback: Optional[Callable[[str], None]] = None,
+                 stop: Optional[List[str]] = None,
+                 seed: Optional[int] = None,
+                 cancel_event: Optional[threading.Event] = None) -> str:
+        """
+        Generate text with draft-and-verify decoding.
+
+        Args:
+            prompt: Input text prompt
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            top_k: Top-K sampling parameter
+            top_p: Top-P (nucleus) sampling parameter
+            streaming_callback: Optional callback for streaming text
+            stop: Optional strings that end generation (not included in output)
+            seed: Optional seed for reproducible sampling
+            cancel_event: Optional event that ends generation early when set
+
+        Returns:
+            Generated text
+        """
+        if not (self.target.is_loaded and self.draft.is_loaded):
+            return "Error: Model not loaded"
+
+        try:
+            with self.target._generate_lock:
+                return self._generate(prompt, max_tokens, temperature, top_k, top_p,
+                                      streaming_callback, stop, seed, cancel_event)
+        except Exception as e:
+            return f"Error during generation: {e}"
+
+    def _generate(self, prompt: str, max_tokens: int = 512, temperature: float = 0.7,
+                  top_k: int = 40, top_p: float = 0.9,
+                  streaming_callback: Optional[Callable[[str], None]] = None,
+                  stop: Optional[List[str]] = None, seed: Optional[int] = None,
+                  cancel_event: Optional[threading.Event] = None) -> str:
+        """
+        Draft-and-verify loop behind generate(); raises instead of returning errors.
+        The caller holds the target's generate lock; the draft's is taken
+        here so nothing else can use the draft's KV cache mid-generation.
+        """
+        with self.draft._generate_lock:
+            return self._decode(prompt, max_tokens, temperature, top_k, top_p,
+                                streaming_callback, stop, seed, cancel_event)
+
+    def _decode(self, prompt: str, max_tokens: int, temperature: float, top_k: int,
+                top_p: float, streaming_callback: Optional[Callable[[str], None]],
+                stop: Optional[List[str]], seed: Optional[int],
+                cancel_event: Optional[threading.Event]) -> str:
+        """Draft-and-verify loop run with both engines locked."""
+        if seed is not None:
+            self.sampler.reseed(seed)
+        self.proposed = 0
+        self.accepted = 0
+
+        target, draft = self.target, self.draft
+        capacity = min(target.kv_cache.max_length, draft.kv_cache.max_length)
+        input_ids = target.tokenize(prompt)[-(capacity - 1):]
+        if not input_ids:
+            return ""
+
+        target_logits = target._prefill(input_ids)
+        draft_logits = draft._prefill(input_ids)
+        vocab_size = target_logits.shape[-1]
+
+        # Tokens already decided but not yet fed to each model
+        target_pending = []
+        draft_pending = []
+
+        streamer = StreamingDetokenizer(target.tokenizer, stop_strings=stop)
+        produced = 0
+        finished = False
+
+        while not finished and produced < max_tokens:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            room = capacity - max(target.kv_cache.length, draft.kv_cache.length) - 2
+            n = min(self.num_draft_tokens, max_tokens - produced, room)
+            if n < 1:
+                break
+
+            # Draft n tokens autoregressively
+            if draft_pending:
+                draft_logits = draft._forward(draft_pending)
+                draft_pending = []
+            draft_base = draft.kv_cache.length
+            drafts, draft_probs = [], []
+            for i in range(n):
+                q = self._probs(draft_logits, vocab_size, temperature, top_k, top_p)
+                token = self.sampler.draw(None, q)
+                drafts.append(token)
+                draft_probs.append(q)
+                if i < n - 1:
+                    draft_logits = draft._forward([token])
+
+            # Score every draft position with one target pass
+            target_base = target.kv_cache.length
+            rows = target._forward(target_pending + drafts, all_logits=True)
+            predictors = list(rows) if target_pending else [target_logits] + list(rows)
+
+            accepted = 0
+            correction = None
+            for i, token in enumerate(drafts):
+                p = self._probs(predictors[i], vocab_size, temperature, top_k, top_p)
+                q = draft_probs[i]
+                if self.sampler.rng.random() * q[token] < p[token]:
+                    accepted += 1
+                    continue
+                residual = np.maximum(p - q, 0.0)
+                if residual.sum() <= 0:
+                    residual = p
+                correction = self.sampler.draw(None, residual)
+                break
+            if correction is None:
+                p = self._probs(predictors[n], vocab_size, temperature, top_k, top_p)
+                correction = self.sampler.draw(None, p)
+
+            self.proposed += n
+            self.accepted += accepted
+
+            # Keep only the accepted positions in both caches
+            target._truncate_cache(target_base + len(target_pending) + accepted)
+            target_pending = [correction]
+            if accepted == n:
+                draft_pending = [drafts[-1], correction]
+            else:
+                draft._truncate_cache(draft_base + accepted)
+                draft_pending = [correction]
+
+            for token in drafts[:accepted] + [correction]:
+                if token in target.eos_token_ids or produced >= max_tokens:
+                    finished = True
+                    break
+                produced += 1
+                text = streamer.push(token)
+                if text and streaming_callback:
+                    streaming_callback(text)
+                if streamer.stopped:
+                    finished = True
+                    break
+
+        tail = streamer.flush()
+        if tail and streaming_callback:
+            streaming_callback(tail)
+
+        return streamer.text
+
+    def _probs(self, logits: np.ndarray, vocab_size: int, temperature: float,
+               top_k: int, top_p: float) -> np.ndarray:
+        """Dense sampling distribution trimmed or padded to the target vocabulary."""
+        probs = self.sampler.probabilities(logits[:vocab_size], temperature, top_k, top_p)
+        if len(probs) < vocab_size:
+            probs = np.pad(probs, (0, vocab_size - len(probs)))
+        return probs
@@ -10,14 +10,20 @@ class StorageManager:
     def __init__(self, base_dir: str = "."):
         self.base_dir = base_dir
         self.cache_dir = os.path.join(base_dir, "cache")
+        self.onnx_cache_dir = os.path.join(self.cache_dir, "onnx")
+        self.generation_cache_dir = os.path.join(self.cache_dir, "generations")
+        self.embedding_cache_dir = os.path.join(self.cache_dir, "embeddings")
         self.downloads_dir = os.path.join(base_dir, "downloads")
         self.models_dir = os.path.join(base_dir, "models")
         self.rag_dir = os.path.join(base_dir, "rag")
         self.chat_history_dir = os.path.join(base_dir, "chat_history")
+        self.logs_dir = os.path.join(base_dir, "logs")
+        self.router_log = os.path.join(self.logs_dir, "model_routing.jsonl")
         
         # Ensure directories exist
         for dir_path in [self.cache_dir, self.downloads_dir, 
-                        self.models_dir, self.rag_dir, self.chat_history_dir]:
+                        self.models_dir, self.rag_dir, self.chat_history_dir,
+                        self.logs_dir]:
             os.makedirs(dir_path, exist_ok=True)
     
     def get_storage_info(self) -> Dict[str, int]:
@@ -0,0 +1,111 @@
+import codecs
+from typing import List, Optional
+
+class StreamingDetokenizer:
+    """
+    Incremental, UTF-8 safe detokenizer for streamed generation.
+    Token bytes go through an incremental UTF-8 decoder so multi-byte
+    characters split across tokens are only emitted once complete, and stop
+    strings are matched against a short tail instead of the whole output.
+    """
+
+    def __init__(self, tokenizer, stop_strings: Optional[List[str]] = None,
+                 skip_special_tokens: bool = True):
+        """
+        Initialize the detokenizer.
+
+        Args:
+            tokenizer: BPETokenizer providing `token_bytes`
+            stop_strings: Strings that end generation when produced
+            skip_special_tokens: Drop special tokens from the output
+        """
+        self.tokenizer = tokenizer
+        self.stop_strings = [s for s in (stop_strings or []) if s]
+        self.skip_special_tokens = skip_special_tokens
+        self.stopped = False
+
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._max_hold = max((len(s) for s in self.stop_strings), default=1) - 1
+        self._pending = ""
+        self._pieces = []
+        self._strip_left = getattr(tokenizer, "strip_left", 0)
+
+    @property
+    def text(self) -> str:
+        """All text emitted so far."""
+        return "".join(self._pieces)
+
+    def push(self, token_id: int) -> str:
+        """
+        Add one generated token.
+
+        Args:
+            token_id: Newly generated token id
+
+        Returns:
+            Newly completed text, possibly empty
+        """
+        if self.stopped:
+            return ""
+        if self.skip_special_tokens and token_id in self.tokenizer.special_ids:
+            return ""
+
+        new_text = self._decoder.decode(self.tokenizer.token_bytes(token_id))
+        if not new_text:
+            return ""
+
+        # Decoder-level strip of the leading prefix space (Metaspace)
+        while self._strip_left and new_text:
+            if new_text[0] != " ":
+                self._strip_left = 0
+                break
+            new_text = new_text[1:]
+            self._strip_left -= 1
+        if not new_text:
+            return ""
+
+        return self._emit(self._pending + new_text)
+
+    def flush(self) -> str:
+        """
+        Emit any text held back at the end of generation.
+
+        Returns:
+            Remaining text, possibly empty
+        """
+        if self.stopped:
+            return ""
+        tail = self._decoder.decode(b"", final=True)
+        return self._emit(self._pending + tail, final=True)
+
+    def _emit(self, buffer: str, final: bool = False) -> str:
+        """Emit buffered text, holding back a possible partial stop string."""
+        if not self.stop_strings:
+            self._pieces.append(buffer)
+            return buffer
+
+        # The buffer only spans the held tail plus the new text
+        cut = -1
+        for stop in self.stop_strings:
+            index = buffer.find(stop)
+            if index != -1 and (cut == -1 or index < cut):
+                cut = index
+        if cut != -1:
+            self.stopped = True
+            self._pending = ""
+            self._pieces.append(buffer[:cut])
+            return buffer[:cut]
+
+        # Hold back the longest suffix that could still start a stop string
+        hold = 0
+        if not final:
+            for k in range(min(len(buffer), self._max_hold), 0, -1):
+                suffix = buffer[-k:]
+                if any(stop.startswith(suffix) for stop in self.stop_strings):
+                    hold = k
+                    break
+
+        self._pending = buffer[len(buffer) - hold:] if hold else ""
+        emitted = buffer[:len(buffer) - hold]
+        self._pieces.append(emitted)
+        return emitted
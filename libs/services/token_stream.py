@@ -0,0 +1,125 @@
+import asyncio
+import queue
+import threading
+from typing import Callable, Optional
+
+class TokenStream:
+    """
+    Iterator over text produced by a generation running on a worker thread.
+    Chunks pass through a bounded queue, so a slow consumer pauses decoding
+    instead of buffering the whole reply; `cancel()` stops the worker at the
+    next token. Supports both `for` and `async for`.
+    """
+
+    # Poll interval for queue waits, so cancellation is noticed promptly
+    POLL_SECONDS = 0.05
+
+    _DONE = object()
+
+    def __init__(self, run: Callable[[Callable[[str], None], threading.Event], str],
+                 queue_size: int = 32):
+        """
+        Start the generation.
+
+        Args:
+            run: Called on the worker thread with (streaming_callback, cancel_event);
+                returns the final text and may raise on failure
+            queue_size: Maximum number of chunks buffered ahead of the consumer
+        """
+        self.text = None
+        self.error = None
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._cancel = threading.Event()
+        self._finished = False
+        self._thread = threading.Thread(target=self._worker, args=(run,), daemon=True)
+        self._thread.start()
+
+    @property
+    def cancelled(self) -> bool:
+        """True once cancel() has been called."""
+        return self._cancel.is_set()
+
+    def cancel(self) -> None:
+        """Stop the generation; iteration ends at the next chunk."""
+        self._cancel.set()
+
+    close = cancel
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the worker thread to exit.
+
+        Args:
+            timeout: Seconds to wait (None waits forever)
+
+        Returns:
+            True if the worker has exited
+        """
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _put(self, item) -> None:
+        """Queue an item, giving up once the stream is cancelled."""
+        while not self._cancel.is_set():
+            try:
+                self._queue.put(item, timeout=self.POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def _worker(self, run) -> None:
+        """Run the generation and forward its chunks to the queue."""
+        try:
+            self.text = run(self._put, self._cancel)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._put(self._DONE)
+
+    def _next(self):
+        """Block for the next chunk; returns _DONE when the stream has ended."""
+        while not self._finished:
+            if self._cancel.is_set():
+                self._finished = True
+                break
+            try:
+                item = self._queue.get(timeout=self.POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if item is self._DONE:
+                self._finished = True
+                if self.error is not None:
+                    raise self.error
+                break
+            return item
+        return self._DONE
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        item = self._next()
+        if item is self._DONE:
+            raise StopIteration
+        return item
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        loop = asyncio.get_running_loop()
+        try:
+            item = await loop.run_in_executor(None, self._next)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        if item is self._DONE:
+            raise StopAsyncIteration
+        return item
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cancel()
+        return False
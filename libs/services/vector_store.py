@@ -3,19 +3,43 @@ import json
 import numpy as np
 from typing import List, Dict, Tuple, Optional
 
+# Rows scored per block, so float16 matrices are widened a slice at a time
+SEARCH_BLOCK_ROWS = 65536
+
 class VectorStore:
     """
     NumPy-based vector store for document embeddings and similarity search.
+    Besides each document's own .npy file, every chunk vector is kept
+    L2-normalized in one contiguous memory-mapped matrix with a parallel
+    array of (document, chunk index) rows, so a query is a single
+    matrix-vector product and an argpartition with no file reads; chunk
+    texts are loaded once per document and kept in memory.
     """
     
-    def __init__(self, rag_dir: str = "rag"):
+    def __init__(self, rag_dir: str = "rag", dtype: str = "float32"):
+        """
+        Initialize the store.
+        
+        Args:
+            rag_dir: Directory holding the index, the matrix and the documents
+            dtype: Storage type of the search matrix ("float32" or "float16")
+        """
         self.rag_dir = rag_dir
         self.documents_dir = os.path.join(rag_dir, "documents")
         self.index_file = os.path.join(rag_dir, "index.json")
+        self.matrix_file = os.path.join(rag_dir, "matrix.bin")
+        self.rows_file = os.path.join(rag_dir, "matrix_rows.bin")
+        self.dtype = np.dtype(dtype)
         os.makedirs(self.documents_dir, exist_ok=True)
         
         # In-memory index
         self.index = self._load_index()
+        
+        # Search matrix state: row -> (position in doc_ids, chunk index)
+        self._matrix = None
+        self._rows = np.empty((0, 2), dtype=np.int32)
+        self._doc_data = {}
+        self._load_matrix()
     
     def _load_index(self) -> Dict:
         """Load the document index."""
@@ -35,7 +59,79 @@ class VectorStore:
         except Exception as e:
             print(f"Failed to save index: {e}")
     
-    def add_document(self, doc_id: str, chunks: List[str], 
+    def _load_matrix(self) -> None:
+        """Open the search matrix, rebuilding it if it does not match the index."""
+        info = self.index.get("matrix")
+        documents = self.index["documents"]
+        try:
+            if info is None or info["dtype"] != self.dtype.name or \
+                    any(doc_id not in documents for doc_id in info["doc_ids"]) or \
+                    info["rows"] != sum(documents[doc_id]["chunk_count"]
+                                        for doc_id in info["doc_ids"]):
+                raise ValueError("search matrix out of date")
+            row_bytes = info["dim"] * self.dtype.itemsize
+            if os.path.getsize(self.matrix_file) != info["rows"] * row_bytes or \
+                    os.path.getsize(self.rows_file) != info["rows"] * 8:
+                raise ValueError("search matrix size mismatch")
+            self._rows = np.fromfile(self.rows_file, dtype=np.int32).reshape(-1, 2)
+        except (OSError, ValueError, KeyError):
+            self.rebuild_matrix()
+    
+    def rebuild_matrix(self) -> None:
+        """Recreate the search matrix from the per-document embedding files."""
+        self._matrix = None
+        loaded = []
+        for doc_id, doc_info in self.index["documents"].items():
+            try:
+                loaded.append((doc_id, self._normalize(np.load(doc_info["embeddings_file"]))))
+            except Exception as e:
+                print(f"Skipping document {doc_id} in search matrix: {e}")
+        
+        # Documents embedded with an older model cannot share the matrix
+        dim = loaded[-1][1].shape[1] if loaded else 0
+        doc_ids, blocks, rows = [], [], []
+        for doc_id, embeddings in loaded:
+            if embeddings.shape[1] != dim:
+                print(f"Skipping document {doc_id} in search matrix: dimension "
+                      f"{embeddings.shape[1]} != {dim}")
+                continue
+            rows.append(np.stack([np.full(len(embeddings), len(doc_ids)),
+                                  np.arange(len(embeddings))], axis=1))
+            blocks.append(embeddings.astype(self.dtype))
+            doc_ids.append(doc_id)
+        
+        self._rows = np.concatenate(rows).astype(np.int32) if rows else \
+            np.empty((0, 2), dtype=np.int32)
+        self._write_file(self.matrix_file, b"".join(block.tobytes() for block in blocks))
+        self._write_file(self.rows_file, self._rows.tobytes())
+        self.index["matrix"] = {"dtype": self.dtype.name, "dim": dim,
+                                "rows": len(self._rows), "doc_ids": doc_ids}
+        self._save_index()
+    
+    @staticmethod
+    def _write_file(path: str, data: bytes) -> None:
+        partial = path + ".partial"
+        with open(partial, 'wb') as f:
+            f.write(data)
+        os.replace(partial, path)
+    
+    @staticmethod
+    def _normalize(embeddings: np.ndarray) -> np.ndarray:
+        """L2-normalize rows as float32."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        return embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-8)
+    
+    def _search_matrix(self) -> Optional[np.ndarray]:
+        """Memory map of the search matrix, reopened after it changes."""
+        info = self.index["matrix"]
+        if info["rows"] == 0:
+            return None
+        if self._matrix is None or self._matrix.shape[0] != info["rows"]:
+            self._matrix = np.memmap(self.matrix_file, dtype=self.dtype, mode='r',
+                                     shape=(info["rows"], info["dim"]))
+        return self._matrix
+    
+    def add_document(self, doc_id: str, chunks: List[str],
                      embeddings: np.ndarray, metadata: Dict) -> bool:
         """
         Add a document to the vector store.
@@ -45,11 +141,14 @@ class VectorStore:
             chunks: List of text chunks
             embeddings: Embedding vectors for chunks (N x D)
             metadata: Document metadata
-            
+        
         Returns:
             True if successful
         """
         try:
+            if doc_id in self.index["documents"]:
+                self.delete_document(doc_id)
+            
             # Save embeddings as numpy array
             embeddings_file = os.path.join(self.documents_dir, f"{doc_id}_embeddings.npy")
             np.save(embeddings_file, embeddings)
@@ -73,14 +172,42 @@ class VectorStore:
                 "metadata_file": metadata_file,
                 "chunk_count": len(chunks)
             }
+            self._doc_data[doc_id] = doc_data
+            
+            # Append the normalized vectors to the search matrix
+            info = self.index["matrix"]
+            if info["rows"] and info["dim"] != embeddings.shape[1]:
+                print(f"Embedding dimension changed to {embeddings.shape[1]}, "
+                      f"rebuilding search matrix")
+                self.rebuild_matrix()
+            else:
+                rows = np.stack([np.full(len(embeddings), len(info["doc_ids"])),
+                                 np.arange(len(embeddings))], axis=1).astype(np.int32)
+                with open(self.matrix_file, 'ab') as f:
+                    f.write(self._normalize(embeddings).astype(self.dtype).tobytes())
+                with open(self.rows_file, 'ab') as f:
+                    f.write(rows.tobytes())
+                self._rows = np.concatenate([self._rows, rows])
+                info.update(dim=int(embeddings.shape[1]), rows=len(self._rows))
+                info["doc_ids"].append(doc_id)
             self._save_index()
             
             return True
-            
+        
         except Exception as e:
             print(f"Failed to add document: {e}")
             return False
     
+    def _document(self, doc_id: str) -> Dict:
+        """Chunks and metadata of a document, read from disk once."""
+        doc_data = self._doc_data.get(doc_id)
+        if doc_data is None:
+            with open(self.index["documents"][doc_id]["metadata_file"], 'r',
+                      encoding='utf-8') as f:
+                doc_data = json.load(f)
+            self._doc_data[doc_id] = doc_data
+        return doc_data
+    
     def search(self, query_embedding: np.ndarray, top_k: int = 3) -> List[Dict]:
         """
         Search for similar chunks across all documents.
@@ -88,40 +215,43 @@ class VectorStore:
         Args:
             query_embedding: Query embedding vector
             top_k: Number of top results to return
-            
+        
         Returns:
             List of top-k similar chunks with metadata
         """
-        results = []
+        matrix = self._search_matrix()
+        if matrix is None or top_k <= 0:
+            return []
         
-        for doc_id, doc_info in self.index["documents"].items():
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) + 1e-8)
+        similarities = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), SEARCH_BLOCK_ROWS):
+            block = matrix[start:start + SEARCH_BLOCK_ROWS]
+            similarities[start:start + len(block)] = block.astype(np.float32, copy=False) @ query
+        
+        k = min(top_k, len(similarities))
+        best = np.argpartition(-similarities, k - 1)[:k]
+        best = best[np.argsort(-similarities[best])]
+        
+        results = []
+        doc_ids = self.index["matrix"]["doc_ids"]
+        for row in best:
+            doc_number, chunk_index = self._rows[row]
+            doc_id = doc_ids[doc_number]
             try:
-                # Load embeddings
-                embeddings = np.load(doc_info["embeddings_file"])
-                
-                # Load metadata
-                with open(doc_info["metadata_file"], 'r', encoding='utf-8') as f:
-                    doc_data = json.load(f)
-                
-                # Compute similarities
-                similarities = self._cosine_similarity(query_embedding, embeddings)
-                
-                # Add results with chunk info
-                for i, sim in enumerate(similarities):
-                    results.append({
-                        "doc_id": doc_id,
-                        "chunk_index": i,
-                        "chunk_text": doc_data["chunks"][i],
-                        "similarity": float(sim),
-                        "metadata": doc_data["metadata"]
-                    })
-                    
+                doc_data = self._document(doc_id)
+                results.append({
+                    "doc_id": doc_id,
+                    "chunk_index": int(chunk_index),
+                    "chunk_text": doc_data["chunks"][chunk_index],
+                    "similarity": float(similarities[row]),
+                    "metadata": doc_data["metadata"]
+                })
             except Exception as e:
                 print(f"Error searching document {doc_id}: {e}")
         
-        # Sort by similarity and return top-k
-        results.sort(key=lambda x: x["similarity"], reverse=True)
-        return results[:top_k]
+        return results
     
     def delete_document(self, doc_id: str) -> bool:
         """Delete a document from the vector store."""
@@ -139,14 +269,39 @@ class VectorStore:
             
             # Remove from index
             del self.index["documents"][doc_id]
+            self._doc_data.pop(doc_id, None)
+            self._remove_rows(doc_id)
             self._save_index()
             
             return True
-            
+        
         except Exception as e:
             print(f"Failed to delete document: {e}")
             return False
     
+    def _remove_rows(self, doc_id: str) -> None:
+        """Rewrite the search matrix without one document's rows."""
+        info = self.index["matrix"]
+        if doc_id not in info["doc_ids"]:
+            return
+        doc_number = info["doc_ids"].index(doc_id)
+        keep = self._rows[:, 0] != doc_number
+        
+        matrix = self._search_matrix()
+        vectors = np.ascontiguousarray(matrix[keep]) if matrix is not None else \
+            np.empty((0, info["dim"]), dtype=self.dtype)
+        rows = self._rows[keep]
+        rows[rows[:, 0] > doc_number, 0] -= 1
+        
+        # Release the map so the file can be replaced on every platform
+        self._matrix = None
+        del matrix
+        self._write_file(self.matrix_file, vectors.tobytes())
+        self._write_file(self.rows_file, rows.tobytes())
+        self._rows = rows
+        del info["doc_ids"][doc_number]
+        info["rows"] = len(rows)
+    
     def list_documents(self) -> List[Dict]:
         """List all documents in the store."""
         docs = []
@@ -162,24 +317,3 @@ class VectorStore:
             except:
                 pass
         return docs
-    
-    @staticmethod
-    def _cosine_similarity(vec1: np.ndarray, vec2: np.ndarray) -> np.ndarray:
-        """
-        Compute cosine similarity between a vector and a matrix of vectors.
-        
-        Args:
-            vec1: Query vector (D,)
-            vec2: Document vectors (N x D)
-            
-        Returns:
-            Similarity scores (N,)
-        """
-        # Normalize vectors
-        vec1_norm = vec1 / (np.linalg.norm(vec1) + 1e-8)
-        vec2_norm = vec2 / (np.linalg.norm(vec2, axis=1, keepdims=True) + 1e-8)
-        
-        # Compute dot product
-        similarities = np.dot(vec2_norm, vec1_norm)
-        
-        return similarities
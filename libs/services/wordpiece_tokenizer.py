@@ -0,0 +1,322 @@
+import os
+import json
+import unicodedata
+from functools import lru_cache
+from itertools import chain, islice
+import numpy as np
+from typing import List, Dict, Optional, Sequence, Tuple
+
+
+def is_punctuation(char: str) -> bool:
+    """BERT punctuation: every non-alphanumeric ASCII symbol plus Unicode P*."""
+    cp = ord(char)
+    if 33 <= cp <= 47 or 58 <= cp <= 64 or 91 <= cp <= 96 or 123 <= cp <= 126:
+        return True
+    return unicodedata.category(char).startswith("P")
+
+
+def is_cjk(cp: int) -> bool:
+    """CJK ideographs, which BERT splits into single characters."""
+    return (0x4E00 <= cp <= 0x9FFF or 0x3400 <= cp <= 0x4DBF or 0x20000 <= cp <= 0x2A6DF or
+            0x2A700 <= cp <= 0x2B73F or 0x2B740 <= cp <= 0x2B81F or 0x2B820 <= cp <= 0x2CEAF or
+            0xF900 <= cp <= 0xFAFF or 0x2F800 <= cp <= 0x2FA1F)
+
+
+class _CleanMap(dict):
+    """
+    str.translate table for BERT's text cleaning, filled lazily per character:
+    control characters are dropped, whitespace becomes a space, and CJK
+    ideographs and punctuation are padded with spaces so a plain split()
+    separates them.
+    """
+
+    def __missing__(self, cp: int):
+        char = chr(cp)
+        category = unicodedata.category(char)
+        if cp == 0 or cp == 0xFFFD:
+            value = None
+        elif char in " \t\n\r" or category == "Zs":
+            value = " "
+        elif category in ("Cc", "Cf"):
+            value = None
+        elif is_cjk(cp) or is_punctuation(char):
+            value = f" {char} "
+        else:
+            value = char
+        self[cp] = value
+        return value
+
+
+class _MarkMap(dict):
+    """str.translate table dropping combining marks (category Mn), filled lazily."""
+
+    def __missing__(self, cp: int):
+        value = None if unicodedata.category(chr(cp)) == "Mn" else chr(cp)
+        self[cp] = value
+        return value
+
+
+# Shared by every tokenizer; each character is classified once per process
+_CLEAN = _CleanMap()
+_MARKS = _MarkMap()
+
+# Key of the token id stored at a trie node
+_ID = ""
+
+
+class WordPieceTokenizer:
+    """
+    BERT WordPiece tokenizer for sentence embedding models such as
+    MiniLM-L6-v2, loaded from the model's tokenizer.json or vocab.txt.
+    Text is cleaned with one str.translate pass, words are split by a
+    longest-match walk over prefix tries, per-word results are memoized,
+    and batches are written straight into padded int64 arrays.
+    """
+
+    def __init__(self, vocab: Dict[str, int], do_lower_case: bool = True,
+                 strip_accents: Optional[bool] = None, unk_token: str = "[UNK]",
+                 continuing_prefix: str = "##", max_input_chars_per_word: int = 100,
+                 cache_size: int = 65536):
+        """
+        Initialize the tokenizer.
+
+        Args:
+            vocab: Token -> id
+            do_lower_case: Lowercase input before splitting
+            strip_accents: Remove combining marks (follows do_lower_case if None)
+            unk_token: Token used for words that cannot be split
+            continuing_prefix: Marker of word-internal pieces
+            max_input_chars_per_word: Longer words map straight to unk_token
+            cache_size: Maximum number of words kept in the encoding cache
+        """
+        self.vocab = vocab
+        self.do_lower_case = do_lower_case
+        self.strip_accents = do_lower_case if strip_accents is None else strip_accents
+        self.continuing_prefix = continuing_prefix
+        self.max_input_chars_per_word = max_input_chars_per_word
+
+        self.unk_id = vocab[unk_token]
+        self.cls_id = vocab.get("[CLS]", self.unk_id)
+        self.sep_id = vocab.get("[SEP]", self.unk_id)
+        self.pad_id = vocab.get("[PAD]", 0)
+
+        # Word-initial pieces and ## continuations, as nested dicts per character
+        self._start_trie = {}
+        self._continue_trie = {}
+        for token, token_id in vocab.items():
+            if continuing_prefix and token.startswith(continuing_prefix) and \
+                    len(token) > len(continuing_prefix):
+                self._insert(self._continue_trie, token[len(continuing_prefix):], token_id)
+            else:
+                self._insert(self._start_trie, token, token_id)
+
+        self._encode_word = lru_cache(maxsize=cache_size)(self._wordpiece)
+
+    @staticmethod
+    def _insert(trie: Dict, piece: str, token_id: int) -> None:
+        """Add one vocabulary piece to a trie."""
+        node = trie
+        for char in piece:
+            node = node.setdefault(char, {})
+        node[_ID] = token_id
+
+    @property
+    def vocab_size(self) -> int:
+        """Number of token ids."""
+        return len(self.vocab)
+
+    @classmethod
+    def from_file(cls, path: str, cache_size: int = 65536) -> "WordPieceTokenizer":
+        """
+        Load from a Hugging Face tokenizer.json or a BERT vocab.txt.
+
+        Args:
+            path: Path to tokenizer.json or vocab.txt
+            cache_size: Maximum number of words kept in the encoding cache
+
+        Returns:
+            New WordPieceTokenizer
+        """
+        if path.endswith(".json"):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            model = data["model"]
+            if model.get("type") != "WordPiece":
+                raise ValueError(f"Unsupported tokenizer model: {model.get('type')}")
+            normalizer = data.get("normalizer") or {}
+            return cls(dict(model["vocab"]),
+                       do_lower_case=normalizer.get("lowercase", True),
+                       strip_accents=normalizer.get("strip_accents"),
+                       unk_token=model.get("unk_token", "[UNK]"),
+                       continuing_prefix=model.get("continuing_subword_prefix", "##"),
+                       max_input_chars_per_word=model.get("max_input_chars_per_word", 100),
+                       cache_size=cache_size)
+
+        with open(path, 'r', encoding='utf-8') as f:
+            tokens = [line.rstrip("\n") for line in f]
+        return cls({token: i for i, token in enumerate(tokens) if token}, cache_size=cache_size)
+
+    @classmethod
+    def from_model_dir(cls, model_path: str) -> "WordPieceTokenizer":
+        """Load from tokenizer.json, falling back to vocab.txt."""
+        for name in ("tokenizer.json", "vocab.txt"):
+            path = os.path.join(model_path, name)
+            if os.path.exists(path):
+                return cls.from_file(path)
+        raise FileNotFoundError(f"No tokenizer.json or vocab.txt in {model_path}")
+
+    def basic_tokenize(self, text: str) -> List[str]:
+        """
+        Clean, normalize and split text into words and punctuation.
+
+        Args:
+            text: Input text
+
+        Returns:
+            List of words
+        """
+        text = text.translate(_CLEAN)
+        if self.do_lower_case:
+            text = text.lower()
+        if self.strip_accents and not text.isascii():
+            text = unicodedata.normalize("NFD", text).translate(_MARKS)
+        return text.split()
+
+    def _wordpiece(self, word: str) -> Tuple[int, ...]:
+        """
+        Split one word into the longest matching vocabulary pieces.
+
+        Args:
+            word: Normalized word
+
+        Returns:
+            Token ids ((unk,) if the word cannot be covered)
+        """
+        n = len(word)
+        if n > self.max_input_chars_per_word:
+            return (self.unk_id,)
+        ids = []
+        start = 0
+        trie = self._start_trie
+        while start < n:
+            # Walk the trie as far as the word allows, remembering the last piece
+            node = trie
+            match_id, match_end = None, start
+            for i in range(start, n):
+                node = node.get(word[i])
+                if node is None:
+                    break
+                token_id = node.get(_ID)
+                if token_id is not None:
+                    match_id, match_end = token_id, i + 1
+            if match_id is None:
+                return (self.unk_id,)
+            ids.append(match_id)
+            start = match_end
+            trie = self._continue_trie
+        return tuple(ids)
+
+    def wordpiece(self, word: str) -> List[int]:
+        """
+        Split one word into the longest matching vocabulary pieces.
+
+        Args:
+            word: Normalized word
+
+        Returns:
+            Token ids ([unk] if the word cannot be covered)
+        """
+        return list(self._encode_word(word))
+
+    def encode(self, text: str, max_length: int = 256,
+               add_special_tokens: bool = True) -> List[int]:
+        """
+        Tokenize text for the encoder.
+
+        Args:
+            text: Input text
+            max_length: Maximum sequence length including [CLS] and [SEP]
+            add_special_tokens: Wrap the ids in [CLS] ... [SEP]
+
+        Returns:
+            Token ids
+        """
+        ids = list(chain.from_iterable(map(self._encode_word, self.basic_tokenize(text))))
+        if not add_special_tokens:
+            return ids[:max_length]
+        return [self.cls_id] + ids[:max_length - 2] + [self.sep_id]
+
+    def word_ids(self, text: str) -> List[Tuple[int, ...]]:
+        """
+        Split text into words and look up each word's cached token ids.
+
+        Args:
+            text: Input text
+
+        Returns:
+            Token id tuple per word, without truncation or special tokens
+        """
+        return list(map(self._encode_word, self.basic_tokenize(text)))
+
+    @staticmethod
+    def sequence_lengths(words: Sequence[Sequence[Tuple[int, ...]]],
+                         max_length: int = 256) -> np.ndarray:
+        """
+        Encoder lengths of texts split by word_ids(), including [CLS] and [SEP].
+
+        Args:
+            words: word_ids() per text
+            max_length: Maximum sequence length including [CLS] and [SEP]
+
+        Returns:
+            int64 array of lengths
+        """
+        counts = np.fromiter((sum(map(len, ids)) for ids in words),
+                             dtype=np.int64, count=len(words))
+        return np.minimum(counts, max_length - 2) + 2
+
+    def pack(self, words: Sequence[Sequence[Tuple[int, ...]]],
+             max_length: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Write texts split by word_ids() straight into padded encoder inputs.
+
+        Args:
+            words: word_ids() per text
+            max_length: Maximum sequence length including [CLS] and [SEP]
+
+        Returns:
+            (input_ids, attention_mask), both int64 shaped (N, longest)
+        """
+        lengths = self.sequence_lengths(words, max_length)
+        width = int(lengths.max()) if len(lengths) else 0
+        positions = np.arange(width)
+        attention_mask = (positions < lengths[:, None]).astype(np.int64)
+        input_ids = np.full((len(words), width), self.pad_id, dtype=np.int64)
+        if not len(words):
+            return input_ids, attention_mask
+
+        input_ids[:, 0] = self.cls_id
+        input_ids[np.arange(len(words)), lengths - 1] = self.sep_id
+        # Row-major boolean assignment fills each row's body in order, so one
+        # stream of ids over the whole batch needs no per-text id list
+        body = (positions > 0) & (positions < lengths[:, None] - 1)
+        counts = (lengths - 2).tolist()
+        input_ids[body] = np.fromiter(
+            chain.from_iterable(islice(chain.from_iterable(ids), count)
+                                for ids, count in zip(words, counts)),
+            dtype=np.int64, count=sum(counts))
+        return input_ids, attention_mask
+
+    def encode_batch(self, texts: Sequence[str],
+                     max_length: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Tokenize several texts into padded encoder inputs.
+
+        Args:
+            texts: Input texts
+            max_length: Maximum sequence length including [CLS] and [SEP]
+
+        Returns:
+            (input_ids, attention_mask), both int64 shaped (N, longest)
+        """
+        return self.pack([self.word_ids(text) for text in texts], max_length)
@@ -109,6 +109,56 @@ if MDApp:
             # Actual screens will be added here or replaced
         """)
 
+        def on_start(self):
+            # Defer model loading until the first frame is on screen
+            from kivy.clock import Clock
+            self.model_status = "idle"
+            Clock.schedule_once(self.start_model_warmup, 0)
+
+        def start_model_warmup(self, *args):
+            try:
+                from libs.services.settings_manager import SettingsManager
+                from libs.services.storage_manager import StorageManager
+                from libs.services.model_manager import ModelManager
+                from libs.services.engine_pool import EnginePool
+                from libs.services.model_warmup import ModelWarmup
+                from libs.services.model_router import ModelRouter
+                
+                settings = SettingsManager()
+                storage = StorageManager()
+                model_manager = ModelManager(storage.models_dir)
+                budget = model_manager.get_memory_budget(settings.get("selected_model"),
+                                                         settings.get("memory_budget_mb", 0))
+                self.engine_pool = EnginePool(budget)
+                self.model_warmup = ModelWarmup(settings, model_manager, self.engine_pool,
+                                                cache_dir=storage.onnx_cache_dir,
+                                                tune_sessions=True)
+                self.model_warmup.start(on_status=self._post_model_status)
+                # Per-request model choice among the installed models
+                self.model_router = ModelRouter(settings, model_manager, self.engine_pool,
+                                                cache_dir=storage.onnx_cache_dir,
+                                                log_path=storage.router_log)
+            except Exception as e:
+                logging.error(f"Model warm-up could not start: {e}")
+                logging.error(traceback.format_exc())
+
+        def _post_model_status(self, status):
+            # Called on the warm-up thread; hop to the UI thread
+            from kivy.clock import Clock
+            Clock.schedule_once(lambda dt: self.on_model_status(status), 0)
+
+        def on_model_status(self, status):
+            self.model_status = status
+            warmup = getattr(self, "model_warmup", None)
+            if warmup is not None:
+                logging.info(f"Model {warmup.model_id}: {status} {warmup.timings}")
+            if self.root and 'screen_manager' in self.root.ids:
+                manager = self.root.ids.screen_manager
+                if manager.has_screen('chat'):
+                    screen = manager.get_screen('chat')
+                    if hasattr(screen, 'set_model_status'):
+                        screen.set_model_status(status)
+
         def switch_screen(self, screen_name):
             if self.root and 'screen_manager' in self.root.ids:
                 self.root.ids.screen_manager.current = screen_name
@@ -0,0 +1,146 @@
+"""
+Unit tests for BPETokenizer.
+"""
+import unittest
+import os
+import json
+import tempfile
+import shutil
+from libs.services.bpe_tokenizer import BPETokenizer, bytes_to_unicode
+from libs.services.streaming_detokenizer import StreamingDetokenizer
+
+
+def make_tokenizer_json():
+    """Build a small byte-level tokenizer.json."""
+    vocab = {c: i for i, c in enumerate(bytes_to_unicode().values())}
+    merges = ["h e", "l l", "he ll", "hell o", "Ġ w", "o r", "Ġw or", "Ġwor l", "Ġworl d"]
+    for merge in merges:
+        vocab[merge.replace(" ", "")] = len(vocab)
+    return {
+        "added_tokens": [
+            {"id": len(vocab), "content": "<|im_start|>", "special": True},
+            {"id": len(vocab) + 1, "content": "<|im_end|>", "special": True}
+        ],
+        "normalizer": None,
+        "pre_tokenizer": {
+            "type": "Sequence",
+            "pretokenizers": [
+                {"type": "Digits", "individual_digits": True},
+                {"type": "ByteLevel", "add_prefix_space": False, "use_regex": True}
+            ]
+        },
+        "post_processor": None,
+        "decoder": {"type": "ByteLevel"},
+        "model": {"type": "BPE", "vocab": vocab, "merges": merges}
+    }
+
+
+class TestBPETokenizer(unittest.TestCase):
+    """Test cases for BPETokenizer."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.test_dir = tempfile.mkdtemp()
+        self.tokenizer_file = os.path.join(self.test_dir, "tokenizer.json")
+        self.tokenizer_json = make_tokenizer_json()
+        with open(self.tokenizer_file, 'w') as f:
+            json.dump(self.tokenizer_json, f)
+        self.tokenizer = BPETokenizer.from_file(self.tokenizer_file)
+        self.vocab = self.tokenizer_json["model"]["vocab"]
+
+    def tearDown(self):
+        """Clean up test environment."""
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_merges_applied(self):
+        """Test that merges combine bytes into whole words."""
+        ids = self.tokenizer.encode("hello world")
+        self.assertEqual(ids, [self.vocab["hello"], self.vocab["Ġworld"]])
+
+    def test_digits_isolated(self):
+        """Test that digits are split one by one."""
+        ids = self.tokenizer.encode("42")
+        self.assertEqual(ids, [self.vocab["4"], self.vocab["2"]])
+
+    def test_round_trip_unicode(self):
+        """Test that multi-byte text survives encode/decode."""
+        text = "héllo wörld 日本 😀 x_1  y\n"
+        self.assertEqual(self.tokenizer.decode(self.tokenizer.encode(text)), text)
+
+    def test_added_tokens(self):
+        """Test that added tokens are matched whole and skipped on decode."""
+        ids = self.tokenizer.encode("<|im_start|>hello<|im_end|>")
+        start = self.tokenizer.added_tokens["<|im_start|>"]
+        end = self.tokenizer.added_tokens["<|im_end|>"]
+        self.assertEqual(ids, [start, self.vocab["hello"], end])
+        self.assertEqual(self.tokenizer.decode(ids), "hello")
+        self.assertEqual(self.tokenizer.decode(ids, skip_special_tokens=False),
+                         "<|im_start|>hello<|im_end|>")
+
+    def test_compiled_form_reused(self):
+        """Test that the compiled tables are written and loaded back."""
+        compiled_file = os.path.join(self.test_dir, "tokenizer.compiled")
+        self.assertTrue(os.path.exists(compiled_file))
+
+        reloaded = BPETokenizer.from_file(self.tokenizer_file)
+        self.assertEqual(reloaded.merges, self.tokenizer.merges)
+        self.assertEqual(reloaded.encode("hello world"), self.tokenizer.encode("hello world"))
+
+    def test_word_cache_bounded(self):
+        """Test that the per-word cache respects its size limit."""
+        tokenizer = BPETokenizer.from_file(self.tokenizer_file, cache_size=4)
+        tokenizer.encode(" ".join(f"w{i}" for i in range(20)))
+        info = tokenizer._encode_word.cache_info()
+        self.assertEqual(info.maxsize, 4)
+        self.assertLessEqual(info.currsize, 4)
+
+
+class TestStreamingDetokenizer(unittest.TestCase):
+    """Test cases for StreamingDetokenizer."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.test_dir = tempfile.mkdtemp()
+        tokenizer_file = os.path.join(self.test_dir, "tokenizer.json")
+        with open(tokenizer_file, 'w') as f:
+            json.dump(make_tokenizer_json(), f)
+        self.tokenizer = BPETokenizer.from_file(tokenizer_file)
+
+    def tearDown(self):
+        """Clean up test environment."""
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_multibyte_characters(self):
+        """Test that characters split across byte tokens are emitted whole."""
+        text = "hello 日本 😀 world"
+        streamer = StreamingDetokenizer(self.tokenizer)
+        pieces = [streamer.push(t) for t in self.tokenizer.encode(text)]
+        pieces.append(streamer.flush())
+
+        self.assertNotIn("\ufffd", "".join(pieces))
+        self.assertEqual("".join(pieces), text)
+        self.assertEqual(streamer.text, text)
+
+    def test_stop_string_not_streamed(self):
+        """Test that a stop string spanning tokens is never emitted."""
+        streamer = StreamingDetokenizer(self.tokenizer, stop_strings=["<END>"])
+        pieces = [streamer.push(t) for t in self.tokenizer.encode("hello <END> world")]
+
+        self.assertTrue(streamer.stopped)
+        self.assertEqual("".join(pieces), "hello ")
+        self.assertEqual(streamer.text, "hello ")
+
+    def test_partial_stop_released(self):
+        """Test that held-back text is released when the stop does not follow."""
+        streamer = StreamingDetokenizer(self.tokenizer, stop_strings=["<END>"])
+        pieces = [streamer.push(t) for t in self.tokenizer.encode("a <EN b")]
+        pieces.append(streamer.flush())
+
+        self.assertFalse(streamer.stopped)
+        self.assertEqual("".join(pieces), "a <EN b")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Unit tests for EmbeddingCache.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import unicodedata
+import numpy as np
+from libs.services.embedding_cache import EmbeddingCache, INDEX_DTYPE
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    """Test cases for EmbeddingCache."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.test_dir, "embeddings")
+        self.cache = EmbeddingCache(self.cache_dir)
+        self.vectors = np.random.default_rng(0).standard_normal((3, 8)).astype(np.float32)
+
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir)
+
+    def test_round_trip_and_persistence(self):
+        """Test that vectors survive a restart and count hits and misses."""
+        texts = ["first chunk", "second chunk", "third chunk"]
+        self.assertEqual(self.cache.get("model", texts), [None] * 3)
+        self.cache.put("model", texts, self.vectors)
+
+        reopened = EmbeddingCache(self.cache_dir)
+        found = reopened.get("model", ["second chunk", "unknown", "first chunk"])
+        self.assertIsNone(found[1])
+        np.testing.assert_allclose(found[0], self.vectors[1], atol=1e-2)
+        np.testing.assert_allclose(found[2], self.vectors[0], atol=1e-2)
+        self.assertEqual((reopened.hits, reopened.misses), (2, 1))
+
+    def test_key_is_model_and_normalized_text(self):
+        """Test that whitespace changes hit while another model misses."""
+        self.cache.put("model", ["hello  world\n"], self.vectors[:1])
+        self.assertIsNotNone(self.cache.get("model", [" hello world"])[0])
+        self.assertIsNone(self.cache.get("other-model", ["hello world"])[0])
+        self.assertIsNone(self.cache.get("model", ["Hello world"])[0])
+
+    def test_normalize_keeps_dropped_control_characters(self):
+        """Test that only characters the tokenizer maps to a space are collapsed."""
+        self.assertEqual(EmbeddingCache.normalize("a\u3000\t b"), "a b")
+        self.assertEqual(EmbeddingCache.normalize("a\x0bb"), "a\x0bb")
+        self.assertNotEqual(EmbeddingCache.digest("a\x1fb"), EmbeddingCache.digest("a b"))
+
+        # Every Zs character lies below U+3001
+        for cp in range(0x3001):
+            char = chr(cp)
+            collapsed = EmbeddingCache.normalize(f"a{char}b") == "a b"
+            self.assertEqual(collapsed, char in " \t\n\r" or
+                             unicodedata.category(char) == "Zs", hex(cp))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entries are compacted away."""
+        entry = 8 * 2 + INDEX_DTYPE.itemsize
+        cache = EmbeddingCache(self.cache_dir, max_bytes=4 * entry)
+        vectors = np.ones((1, 8), dtype=np.float32)
+        for i in range(4):
+            cache.put("model", [f"text {i}"], vectors * i)
+        cache.get("model", ["text 0"])
+        cache.put("model", ["text 4"], vectors * 4)
+
+        self.assertLessEqual(cache.total_bytes, 4 * entry)
+        self.assertEqual(os.path.getsize(cache._stores["model"].vector_file),
+                         len(cache._stores["model"].rows) * 16)
+        found = EmbeddingCache(self.cache_dir).get("model", [f"text {i}" for i in range(5)])
+        self.assertEqual([vector is not None for vector in found],
+                         [True, False, False, True, True])
+        np.testing.assert_array_equal(found[4], vectors[0] * 4)
+
+    def test_access_order_survives_restart(self):
+        """Test that a lookup made before a restart still protects the entry."""
+        entry = 8 * 2 + INDEX_DTYPE.itemsize
+        vectors = np.ones((1, 8), dtype=np.float32)
+        cache = EmbeddingCache(self.cache_dir, max_bytes=4 * entry)
+        for i in range(4):
+            cache.put("model", [f"text {i}"], vectors * i)
+        cache.get("model", ["text 0"])
+
+        EmbeddingCache(self.cache_dir, max_bytes=4 * entry).put("model", ["text 4"], vectors * 4)
+        found = EmbeddingCache(self.cache_dir).get("model", [f"text {i}" for i in range(5)])
+        self.assertEqual([vector is not None for vector in found],
+                         [True, False, False, True, True])
+
+    def test_budget_covers_other_models(self):
+        """Test that files of models not used in this session count and are evicted."""
+        entry = 8 * 2 + INDEX_DTYPE.itemsize
+        vectors = np.ones((1, 8), dtype=np.float32)
+        old = EmbeddingCache(self.cache_dir, max_bytes=4 * entry)
+        for i in range(4):
+            old.put("old-model", [f"text {i}"], vectors)
+
+        cache = EmbeddingCache(self.cache_dir, max_bytes=4 * entry)
+        cache.put("new-model", ["fresh"], vectors)
+        self.assertLessEqual(cache.total_bytes, 4 * entry)
+        self.assertIsNotNone(cache.get("new-model", ["fresh"])[0])
+        found = EmbeddingCache(self.cache_dir).get("old-model", [f"text {i}" for i in range(4)])
+        self.assertEqual([vector is not None for vector in found],
+                         [False, False, True, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
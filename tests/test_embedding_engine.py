@@ -0,0 +1,129 @@
+"""
+Unit tests for WordPieceTokenizer and batched EmbeddingEngine encoding.
+"""
+import importlib.util
+import tempfile
+import unittest
+import numpy as np
+from libs.services.embedding_cache import EmbeddingCache
+from libs.services.embedding_engine import EmbeddingEngine
+from libs.services.profiler import Profiler
+from libs.services.wordpiece_tokenizer import WordPieceTokenizer
+
+HAS_ORT = all(importlib.util.find_spec(name) for name in ("onnx", "onnxruntime"))
+
+VOCAB = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "hello", "world", "un", "##believ", "##able",
+         "cafe", ",", "!", "'", "t", "don", "日", "本"]
+
+
+class TestWordPieceTokenizer(unittest.TestCase):
+    """Test cases for WordPieceTokenizer."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.tokenizer = WordPieceTokenizer({token: i for i, token in enumerate(VOCAB)})
+
+    def tokens(self, text, **kwargs):
+        return [VOCAB[i] for i in self.tokenizer.encode(text, **kwargs)]
+
+    def test_basic_normalization(self):
+        """Test lowercasing, accent stripping and punctuation/CJK splitting."""
+        self.assertEqual(self.tokenizer.basic_tokenize("Café, don't!​ 日本"),
+                         ["cafe", ",", "don", "'", "t", "!", "日", "本"])
+
+    def test_longest_match_pieces(self):
+        """Test greedy longest-match subwords and unknown words."""
+        self.assertEqual(self.tokens("Hello unbelievable xyz"),
+                         ["[CLS]", "hello", "un", "##believ", "##able", "[UNK]", "[SEP]"])
+
+    def test_truncation_keeps_special_tokens(self):
+        """Test that long inputs are cut before [SEP]."""
+        self.assertEqual(self.tokens("hello world hello world", max_length=4),
+                         ["[CLS]", "hello", "world", "[SEP]"])
+
+    def test_encode_batch_fills_padded_arrays(self):
+        """Test that batches come back as padded int64 ids and mask."""
+        input_ids, attention_mask = self.tokenizer.encode_batch(["hello world", "unbelievable!", ""])
+        self.assertEqual(input_ids.dtype, np.int64)
+        self.assertEqual(attention_mask.dtype, np.int64)
+        np.testing.assert_array_equal(input_ids, [[2, 4, 5, 3, 0, 0],
+                                                  [2, 6, 7, 8, 11, 3],
+                                                  [2, 3, 0, 0, 0, 0]])
+        np.testing.assert_array_equal(attention_mask.sum(axis=1), [4, 6, 2])
+
+        texts = ["hello world hello world", "unbelievable", ""]
+        input_ids, attention_mask = self.tokenizer.encode_batch(texts, max_length=4)
+        expected = [self.tokenizer.encode(text, max_length=4) for text in texts]
+        np.testing.assert_array_equal(input_ids, [ids + [0] * (4 - len(ids)) for ids in expected])
+        np.testing.assert_array_equal(attention_mask.sum(axis=1), [4, 4, 2])
+        self.assertEqual(self.tokenizer.encode_batch([])[0].shape, (0, 0))
+
+    def test_words_are_memoized(self):
+        """Test that repeated words are split only once."""
+        self.tokenizer.encode("hello hello unbelievable hello")
+        info = self.tokenizer._encode_word.cache_info()
+        self.assertEqual((info.misses, info.hits), (2, 2))
+
+
+@unittest.skipUnless(HAS_ORT, "onnx and onnxruntime are required")
+class TestEmbeddingEngine(unittest.TestCase):
+    """Test cases for batched encoding on a tiny random encoder."""
+
+    @classmethod
+    def setUpClass(cls):
+        from benchmarks.tiny_model import build_tiny_encoder
+        cls.tempdir = tempfile.TemporaryDirectory()
+        build_tiny_encoder(cls.tempdir.name, num_layers=1, num_words=200)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tempdir.cleanup()
+
+    def setUp(self):
+        """Set up test environment."""
+        self.engine = EmbeddingEngine(self.tempdir.name, batch_size=2)
+        self.assertTrue(self.engine.load())
+        self.texts = ["a much longer chunk of text about the model " * 4, "hi",
+                      "the cache", "another chunk that is of medium length", "ok"]
+
+    def test_batch_matches_single(self):
+        """Test that bucketed padding does not change any embedding."""
+        batch = self.engine.encode_batch(self.texts)
+        single = np.stack([self.engine.encode(text) for text in self.texts])
+
+        self.assertEqual(batch.shape, (5, self.engine.embedding_dim))
+        np.testing.assert_allclose(batch, single, atol=1e-5)
+        np.testing.assert_allclose(np.linalg.norm(batch, axis=1), 1.0, rtol=1e-5)
+
+    def test_one_run_per_bucket(self):
+        """Test that texts are grouped by length into batch_size buckets."""
+        steps = []
+        self.engine.enable_profiler(Profiler(step_callback=steps.append))
+        self.engine.encode_batch(self.texts)
+        self.assertEqual(len(steps), 3)
+        self.assertIn("inference", steps[0])
+
+    def test_cache_skips_encoder(self):
+        """Test that cached texts are not encoded again."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.engine.enable_cache(EmbeddingCache(cache_dir))
+            first = self.engine.encode_batch(self.texts[:3])
+
+            steps = []
+            self.engine.enable_profiler(Profiler(step_callback=steps.append))
+            second = self.engine.encode_batch(self.texts)
+
+            self.assertEqual(len(steps), 1)
+            self.assertEqual((self.engine.cache.hits, self.engine.cache.misses), (3, 5))
+            np.testing.assert_allclose(second[:3], first, atol=1e-2)
+            np.testing.assert_allclose(second[3:], self.engine.run_encoder(self.texts[3:]),
+                                       atol=1e-5)
+
+    def test_not_loaded(self):
+        """Test that an unloaded engine returns None."""
+        self.engine.unload()
+        self.assertIsNone(self.engine.encode_batch(self.texts))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Unit tests for EmbeddingWorkers.
+"""
+import importlib.util
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from libs.services.embedding_cache import EmbeddingCache
+from libs.services.embedding_engine import EmbeddingEngine
+from libs.services.embedding_workers import EmbeddingWorkers, worker_session_config
+from libs.services.engine_pool import EnginePool, estimate_engine_bytes
+from libs.services.onnx_session import SessionConfig
+
+HAS_ORT = all(importlib.util.find_spec(name) for name in ("onnx", "onnxruntime"))
+
+
+class TestWorkerSessionConfig(unittest.TestCase):
+    """Test cases for splitting cores between workers."""
+
+    def test_cores_are_divided(self):
+        """Test that each worker gets its share of the cores."""
+        config = worker_session_config(SessionConfig(allow_spinning=False), 3, cpu_count=8)
+        self.assertEqual(config.intra_op_threads, 2)
+        self.assertFalse(config.use_global_thread_pool)
+        self.assertFalse(config.allow_spinning)
+        self.assertEqual(worker_session_config(None, 4, cpu_count=2).intra_op_threads, 1)
+
+
+@unittest.skipUnless(HAS_ORT, "onnx and onnxruntime are required")
+class TestEmbeddingWorkers(unittest.TestCase):
+    """Test cases for sharded encoding on a tiny random encoder."""
+
+    @classmethod
+    def setUpClass(cls):
+        from benchmarks.tiny_model import build_tiny_encoder
+        cls.tempdir = tempfile.TemporaryDirectory()
+        build_tiny_encoder(cls.tempdir.name, num_layers=1, num_words=200)
+        cls.engine = EmbeddingEngine(cls.tempdir.name, batch_size=2)
+        assert cls.engine.load()
+        words = "the model reads a chunk of text and returns one vector".split()
+        cls.texts = [" ".join(words[:1 + i % len(words)]) * (1 + i % 3) for i in range(11)]
+        cls.expected = cls.engine.run_encoder(cls.texts)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tempdir.cleanup()
+
+    def test_threads_keep_input_order(self):
+        """Test that sharded thread results match a single run."""
+        with EmbeddingWorkers(self.engine, num_workers=3, mode="thread", shard_size=2) as workers:
+            embeddings = workers.encode_batch(self.texts)
+        np.testing.assert_allclose(embeddings, self.expected, atol=1e-5)
+
+    def test_processes_keep_input_order(self):
+        """Test that worker processes load their own sessions and keep order."""
+        with EmbeddingWorkers(self.engine, num_workers=2, mode="process") as workers:
+            embeddings = workers.encode_batch(self.texts)
+        np.testing.assert_allclose(embeddings, self.expected, atol=1e-5)
+
+    def test_cache_is_checked_first(self):
+        """Test that only uncached texts reach the workers."""
+        encoded = []
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.engine.enable_cache(EmbeddingCache(cache_dir))
+            try:
+                self.engine.encode_batch(self.texts[:6])
+                workers = EmbeddingWorkers(self.engine, num_workers=2, mode="thread")
+                run_encoder = self.engine.run_encoder
+                self.engine.run_encoder = lambda texts: encoded.extend(texts) or run_encoder(texts)
+                embeddings = workers.encode_batch(self.texts)
+                workers.close()
+            finally:
+                del self.engine.run_encoder
+                self.engine.enable_cache(None)
+        self.assertEqual(sorted(encoded), sorted(self.texts[6:]))
+        np.testing.assert_allclose(embeddings, self.expected, atol=1e-2)
+
+    def test_thread_mode_is_the_default(self):
+        """Test that workers share the session unless processes are requested."""
+        self.assertEqual(EmbeddingWorkers(self.engine).mode, "thread")
+
+    def test_processes_need_a_supported_platform(self):
+        """Test that the Android app falls back to threads."""
+        with mock.patch.dict("os.environ", {"ANDROID_ARGUMENT": "/data/app"}):
+            workers = EmbeddingWorkers(self.engine, mode="process")
+        self.assertEqual(workers.mode, "thread")
+
+    def test_processes_count_against_the_pool_budget(self):
+        """Test that only as many processes start as model copies fit in the budget."""
+        size = estimate_engine_bytes(self.engine)
+        self.assertGreater(size, 0)
+
+        workers = EmbeddingWorkers(self.engine, num_workers=4, mode="process",
+                                   pool=EnginePool(budget_bytes=size))
+        workers.start()
+        try:
+            self.assertEqual(workers.mode, "thread")
+        finally:
+            workers.close()
+
+        workers = EmbeddingWorkers(self.engine, num_workers=4, mode="process",
+                                   pool=EnginePool(budget_bytes=2 * size))
+        with workers:
+            self.assertEqual((workers.mode, workers.num_workers), ("process", 2))
+            embeddings = workers.encode_batch(self.texts)
+        np.testing.assert_allclose(embeddings, self.expected, atol=1e-5)
+
+    def test_unknown_mode(self):
+        """Test that an unknown mode is rejected."""
+        with self.assertRaises(ValueError):
+            EmbeddingWorkers(self.engine, mode="fiber")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+"""
+Unit tests for EnginePool.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from libs.services.engine_pool import (EnginePool, WEIGHT_OVERHEAD, estimate_engine_bytes,
+                                       memory_budget_bytes)
+from libs.services.prefix_cache import PrefixCache
+
+MB = 1024 * 1024
+
+
+class FakeEngine:
+    """Engine stand-in recording load and unload calls."""
+
+    def __init__(self, log, name, ok=True, gate=None):
+        self.log = log
+        self.name = name
+        self.ok = ok
+        self.gate = gate
+        self.is_loaded = False
+
+    def load(self):
+        self.log.append(("load", self.name))
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.is_loaded = self.ok
+        return self.ok
+
+    def unload(self):
+        self.log.append(("unload", self.name))
+        self.is_loaded = False
+
+
+class TestEnginePool(unittest.TestCase):
+    """Test cases for EnginePool."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.log = []
+        self.pool = EnginePool(budget_bytes=300 * MB)
+
+    def register(self, name, size_mb, group=None, ok=True, gate=None):
+        self.pool.register(name, lambda: FakeEngine(self.log, name, ok, gate),
+                           group=group, size_bytes=size_mb * MB)
+
+    def test_lru_eviction_and_reload(self):
+        """Test that the least recently used engine makes room and reloads later."""
+        self.register("llm", 200)
+        self.register("embed", 80)
+        self.register("voice", 60)
+
+        self.pool.get("llm")
+        self.pool.get("embed")
+        self.pool.get("llm")
+        self.pool.get("voice")
+        self.assertEqual(self.pool.loaded_keys, ["llm", "voice"])
+        self.assertLessEqual(self.pool.resident_bytes, 300 * MB)
+
+        engine = self.pool.get("embed")
+        self.assertTrue(engine.is_loaded)
+        self.assertEqual(self.log.count(("load", "embed")), 2)
+
+    def test_exclusive_group(self):
+        """Test that two LLMs are never resident together."""
+        self.register("smollm2-135m", 100, group="llm")
+        self.register("smollm2-360m", 150, group="llm")
+        self.pool.get("smollm2-135m")
+        self.pool.get("smollm2-360m")
+        self.assertEqual(self.pool.loaded_keys, ["smollm2-360m"])
+        self.assertIn(("unload", "smollm2-135m"), self.log)
+
+    def test_engine_in_use_is_not_evicted(self):
+        """Test that a borrowed engine survives pressure from another load."""
+        self.register("llm", 200)
+        self.register("embed", 200)
+        with self.pool.use("llm") as llm:
+            self.pool.get("embed")
+            self.assertTrue(llm.is_loaded)
+            self.assertIn("llm", self.pool.loaded_keys)
+        self.pool.get("llm")
+        self.pool.get("embed")
+        self.assertEqual(self.pool.loaded_keys, ["embed"])
+
+    def test_reregister_while_in_use(self):
+        """Test that a borrowed engine is only unloaded once it is released."""
+        self.register("llm", 100)
+        with self.pool.use("llm") as llm:
+            self.register("llm", 120)
+            self.assertTrue(llm.is_loaded)
+            self.assertNotIn(("unload", "llm"), self.log)
+            self.assertEqual(self.pool.resident_bytes, 100 * MB)
+        self.assertFalse(llm.is_loaded)
+        self.assertEqual(self.pool.resident_bytes, 0)
+        self.assertTrue(self.pool.get("llm").is_loaded)
+
+    def test_unload_all_while_in_use(self):
+        """Test that unload_all defers borrowed engines until they are released."""
+        self.register("llm", 100)
+        self.register("embed", 50)
+        self.pool.get("embed")
+        with self.pool.use("llm") as llm:
+            self.pool.unload_all()
+            self.assertTrue(llm.is_loaded)
+            self.assertEqual(self.pool.loaded_keys, ["llm"])
+        self.assertFalse(llm.is_loaded)
+        self.assertEqual(self.pool.loaded_keys, [])
+
+    def test_group_load_waits_for_release(self):
+        """Test that a group member in use is evicted on release before the next loads."""
+        self.register("smollm2-135m", 100, group="llm")
+        self.register("smollm2-360m", 150, group="llm")
+        results = []
+        with self.pool.use("smollm2-135m") as small:
+            thread = threading.Thread(
+                target=lambda: results.append(self.pool.get("smollm2-360m")))
+            thread.start()
+            thread.join(0.2)
+            self.assertTrue(thread.is_alive())
+            self.assertTrue(small.is_loaded)
+            self.assertEqual(self.pool.loaded_keys, ["smollm2-135m"])
+        thread.join(5)
+        self.assertFalse(small.is_loaded)
+        self.assertTrue(results[0].is_loaded)
+        self.assertEqual(self.pool.loaded_keys, ["smollm2-360m"])
+
+    def test_group_load_in_borrowing_thread_fails(self):
+        """Test that a thread using one group member cannot load another."""
+        self.register("smollm2-135m", 100, group="llm")
+        self.register("smollm2-360m", 150, group="llm")
+        with self.pool.use("smollm2-135m") as small:
+            self.assertIsNone(self.pool.get("smollm2-360m"))
+            self.assertTrue(small.is_loaded)
+        self.assertEqual(self.pool.loaded_keys, ["smollm2-135m"])
+
+    def test_failed_load(self):
+        """Test that a failing engine is not kept as resident."""
+        self.register("broken", 10, ok=False)
+        self.assertIsNone(self.pool.get("broken"))
+        self.assertEqual(self.pool.loaded_keys, [])
+
+    def test_failed_load_restores_evicted_engines(self):
+        """Test that engines evicted for a load that fails are loaded again."""
+        self.register("llm", 200, group="llm")
+        self.register("embed", 80)
+        self.register("broken", 250, group="llm", ok=False)
+        self.pool.get("llm")
+        self.pool.get("embed")
+
+        self.assertIsNone(self.pool.get("broken"))
+        self.assertEqual(sorted(self.pool.loaded_keys), ["embed", "llm"])
+        self.assertEqual(self.log.count(("load", "llm")), 2)
+
+    def test_load_runs_outside_the_lock(self):
+        """Test that a slow load neither blocks other engines nor loads twice."""
+        gate = threading.Event()
+        self.register("slow", 100, gate=gate)
+        self.register("embed", 80)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.pool.get("slow")))
+                   for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        while ("load", "slow") not in self.log:
+            threading.Event().wait(0.01)
+
+        self.assertFalse(self.pool.is_loaded("slow"))
+        self.assertTrue(self.pool.get("embed").is_loaded)
+        gate.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(self.log.count(("load", "slow")), 1)
+        self.assertIs(results[0], results[1])
+        self.assertTrue(results[0].is_loaded)
+
+    def test_estimate_counts_loaded_variant_only(self):
+        """Test that the estimate ignores other variants and unused prefix budget."""
+        model_dir = tempfile.mkdtemp()
+        try:
+            for name, size in (("model_int4.onnx", 1000), ("model_fp16.onnx", 4000)):
+                with open(os.path.join(model_dir, name), 'wb') as f:
+                    f.write(b"\0" * size)
+            engine = FakeEngine(self.log, "llm")
+            engine.model_path = model_dir
+            engine.model_file = os.path.join(model_dir, "model_int4.onnx")
+            engine.prefix_cache = PrefixCache(max_bytes=64 * MB)
+            engine.prefix_cache.total_bytes = 500
+            self.assertEqual(estimate_engine_bytes(engine), int(1000 * WEIGHT_OVERHEAD) + 500)
+        finally:
+            shutil.rmtree(model_dir)
+
+    def test_budget_from_min_ram(self):
+        """Test that the default budget follows min_ram_gb and device RAM."""
+        self.assertEqual(memory_budget_bytes(2, device_bytes=8 * 1024 * MB), 1024 * MB)
+        self.assertEqual(memory_budget_bytes(4, device_bytes=2 * 1024 * MB), 1024 * MB)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+Unit tests for GenerationCache.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from libs.services.generation_cache import GenerationCache
+
+
+class TestGenerationCache(unittest.TestCase):
+    """Test cases for GenerationCache."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.test_dir = tempfile.mkdtemp()
+        self.model_file = os.path.join(self.test_dir, "model_int8.onnx")
+        with open(self.model_file, 'wb') as f:
+            f.write(b"weights")
+        self.cache = GenerationCache(os.path.join(self.test_dir, "generations"), max_bytes=200)
+
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir)
+
+    def key(self, token_ids, **params):
+        return self.cache.make_key("model", [self.model_file], token_ids, params)
+
+    def test_round_trip_and_persistence(self):
+        """Test that chunks are stored on disk and survive a restart."""
+        key = self.key([1, 2, 3], temperature=0.0)
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, ["Hello", " world"])
+
+        reopened = GenerationCache(self.cache.cache_dir, max_bytes=200)
+        self.assertEqual(reopened.get(key), ["Hello", " world"])
+        self.assertEqual(reopened.hits, 1)
+
+    def test_key_depends_on_prompt_params_and_files(self):
+        """Test that prompt, parameters and model files all change the key."""
+        key = self.key([1, 2, 3], temperature=0.0)
+        self.assertNotEqual(key, self.key([1, 2, 4], temperature=0.0))
+        self.assertNotEqual(key, self.key([1, 2, 3], temperature=0.0, max_tokens=5))
+
+        with open(self.model_file, 'ab') as f:
+            f.write(b" updated")
+        self.assertNotEqual(key, self.key([1, 2, 3], temperature=0.0))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry goes first."""
+        keys = [self.key([i]) for i in range(3)]
+        for key in keys:
+            self.cache.put(key, ["x" * 40])
+        self.cache.get(keys[0])
+        self.cache.put(self.key([9]), ["y" * 40])
+
+        self.assertLessEqual(self.cache.total_bytes, 200)
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNone(self.cache.get(keys[1]))
+
+    def test_is_deterministic(self):
+        """Test which requests are cacheable."""
+        self.assertTrue(GenerationCache.is_deterministic(0.0, 40, None))
+        self.assertTrue(GenerationCache.is_deterministic(0.7, 1, None))
+        self.assertTrue(GenerationCache.is_deterministic(0.7, 40, 123))
+        self.assertFalse(GenerationCache.is_deterministic(0.7, 40, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+Unit tests for ModelManager weight-variant selection.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from libs.services.model_manager import ModelManager, find_model_file
+
+MB = 1024 * 1024
+
+
+class TestModelManager(unittest.TestCase):
+    """Test cases for ModelManager."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.test_dir = tempfile.mkdtemp()
+        self.model_manager = ModelManager(self.test_dir)
+
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir)
+
+    def install(self, model_id, files):
+        model_path = os.path.join(self.test_dir, model_id)
+        os.makedirs(model_path, exist_ok=True)
+        for name in ["tokenizer.json", "config.json"] + files:
+            with open(os.path.join(model_path, name), 'w') as f:
+                f.write("{}")
+        return model_path
+
+    def test_select_fastest_variant_that_fits(self):
+        """Test that the fastest variant within the budget is chosen."""
+        self.assertEqual(self.model_manager.select_variant("smollm2-135m", 1024 * MB)["id"], "int8")
+        self.assertEqual(self.model_manager.select_variant("smollm2-135m", 150 * MB)["id"], "int4")
+        self.assertEqual(self.model_manager.select_variant("gemma-1b-instruct", 10 * MB)["id"], "int4")
+        self.assertIsNone(self.model_manager.select_variant("unknown", 1024 * MB))
+
+    def test_download_selected_variant(self):
+        """Test that downloading fetches only the variant that fits the budget."""
+        calls = []
+
+        class FakeDownloader:
+            def download_model(self, model_info, variant, models_dir, *callbacks):
+                calls.append((model_info["id"], variant["id"], models_dir))
+
+        variant = self.model_manager.download_model("smollm2-135m", FakeDownloader(), 150 * MB)
+        self.assertEqual(variant["id"], "int4")
+        self.assertEqual(calls, [("smollm2-135m", "int4", self.test_dir)])
+        self.assertIsNone(self.model_manager.download_model("unknown", FakeDownloader()))
+        self.assertEqual(len(calls), 1)
+
+    def test_any_variant_counts_as_downloaded(self):
+        """Test that a model with only int4 weights is ready to use."""
+        self.install("smollm2-135m", ["model_int4.onnx"])
+        self.assertTrue(self.model_manager.is_model_downloaded("smollm2-135m"))
+        self.install("smollm2-360m", [])
+        self.assertFalse(self.model_manager.is_model_downloaded("smollm2-360m"))
+
+    def test_model_file_follows_budget_and_manifest(self):
+        """Test weight-file choice among installed variants."""
+        model_path = self.install("smollm2-135m", ["model_int4.onnx", "model_int8.onnx"])
+        self.assertTrue(self.model_manager.get_model_file("smollm2-135m", 1024 * MB)
+                        .endswith("model_int8.onnx"))
+        self.assertTrue(self.model_manager.get_model_file("smollm2-135m", 150 * MB)
+                        .endswith("model_int4.onnx"))
+
+        with open(os.path.join(model_path, "manifest.json"), 'w') as f:
+            json.dump({"model_file": "model_int8.onnx"}, f)
+        self.assertTrue(find_model_file(model_path).endswith("model_int8.onnx"))
+
+
+if __name__ == '__main__':
+    unittest.main()
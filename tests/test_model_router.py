@@ -0,0 +1,149 @@
+"""
+Unit tests for ModelRouter.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from libs.services.engine_pool import EnginePool
+from libs.services.model_manager import ModelManager
+from libs.services.model_router import ModelRouter, SETTINGS_KEY
+from libs.services.model_warmup import ModelWarmup, llm_pool_key
+from libs.services.settings_manager import SettingsManager
+
+
+class FakeEngine:
+    """Engine stand-in that echoes which model answered."""
+
+    def __init__(self, model_path, model_file=None):
+        self.model_path = model_path
+        self.is_loaded = False
+
+    def load(self):
+        self.is_loaded = True
+        return True
+
+    def generate(self, prompt, **kwargs):
+        return f"{os.path.basename(self.model_path)} says hi"
+
+    def tokenize(self, text, add_special_tokens=True):
+        return ["<s>"] * add_special_tokens + text.split()
+
+    def warm_up(self):
+        return 0.0
+
+    def unload(self):
+        self.is_loaded = False
+
+
+class TestModelRouter(unittest.TestCase):
+    """Test cases for ModelRouter."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.test_dir = tempfile.mkdtemp()
+        self.settings = SettingsManager(os.path.join(self.test_dir, "settings.json"))
+        self.model_manager = ModelManager(os.path.join(self.test_dir, "models"))
+        self.pool = EnginePool(budget_bytes=1024 ** 3)
+        self.log_path = os.path.join(self.test_dir, "logs", "routing.jsonl")
+
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir)
+
+    def install(self, *model_ids):
+        for model_id in model_ids:
+            model_path = os.path.join(self.model_manager.models_dir, model_id)
+            os.makedirs(model_path)
+            for name in ("model_int8.onnx", "tokenizer.json", "config.json"):
+                with open(os.path.join(model_path, name), 'w') as f:
+                    f.write("{}")
+
+    def make_router(self):
+        return ModelRouter(self.settings, self.model_manager, self.pool,
+                           log_path=self.log_path, engine_factory=FakeEngine)
+
+    def test_routes_by_complexity(self):
+        """Test that chit-chat goes to the fast model and hard questions up."""
+        self.install("smollm2-135m", "smollm2-360m", "gemma-1b-instruct")
+        router = self.make_router()
+
+        self.assertEqual(router.route("hi there!")["model_id"], "smollm2-135m")
+        self.assertEqual(router.route("Why is the sky blue?")["model_id"], "smollm2-360m")
+        self.assertEqual(router.route("What does the report say?", has_context=True)["model_id"],
+                         "smollm2-360m")
+        hard = "Explain step by step and compare the two approaches in the attached notes."
+        self.assertEqual(router.route(hard, has_context=True)["model_id"], "gemma-1b-instruct")
+
+    def test_falls_back_to_nearest_installed(self):
+        """Test that a missing tier uses the nearest installed model."""
+        self.install("smollm2-135m", "gemma-1b-instruct")
+        router = self.make_router()
+        decision = router.route("Why is the sky blue?")
+        self.assertEqual(decision["model_id"], "gemma-1b-instruct")
+        self.assertEqual(decision["reason"], "nearest installed")
+
+    def test_prefers_loaded_model(self):
+        """Test that a loaded, more capable model serves chit-chat instead of a reload."""
+        self.install("smollm2-135m", "gemma-1b-instruct")
+        router = self.make_router()
+        self.assertEqual(router.route("hi")["model_id"], "smollm2-135m")
+
+        router.generate("Explain step by step why the sky is blue and compare it to sunsets.")
+        decision = router.route("hi")
+        self.assertEqual(decision["model_id"], "gemma-1b-instruct")
+        self.assertEqual(decision["reason"], "already loaded")
+
+        self.settings.set(SETTINGS_KEY, {"prefer_loaded": False})
+        self.assertEqual(self.make_router().route("hi")["model_id"], "smollm2-135m")
+
+    def test_disabled_uses_selected_model(self):
+        """Test that routing can be switched off in settings."""
+        self.install("smollm2-135m", "gemma-1b-instruct")
+        self.settings.set("selected_model", "gemma-1b-instruct")
+        self.settings.set(SETTINGS_KEY, {"enabled": False})
+        self.assertEqual(self.make_router().route("hi")["model_id"], "gemma-1b-instruct")
+
+    def test_generate_logs_decisions(self):
+        """Test that routed generations are logged with their latency."""
+        self.install("smollm2-135m", "smollm2-360m")
+        router = self.make_router()
+
+        self.assertEqual(router.generate("hi"), "smollm2-135m says hi")
+        prompt = "<context>...</context> What does it say?"
+        self.assertEqual(router.generate(prompt, query="What does it say?", has_context=True),
+                         "smollm2-360m says hi")
+
+        log = router.read_log()
+        self.assertEqual([entry["model_id"] for entry in log], ["smollm2-135m", "smollm2-360m"])
+        self.assertTrue(all(entry["tokens"] == 3 for entry in log))
+        self.assertGreaterEqual(log[0]["load_seconds"], 0.0)
+        self.assertEqual(router.latency_summary()["smollm2-135m"]["requests"], 1)
+
+        # Chat models share one exclusive group, so only the last stays resident
+        self.assertFalse(self.pool.is_loaded(llm_pool_key("smollm2-135m")))
+        self.assertTrue(self.pool.is_loaded(llm_pool_key("smollm2-360m")))
+
+    def test_shares_warm_up_engine(self):
+        """Test that the router reuses the engine the warm-up loaded for the same model."""
+        self.install("smollm2-135m")
+        self.settings.set("selected_model", "smollm2-135m")
+        warmup = ModelWarmup(self.settings, self.model_manager, self.pool,
+                             engine_factory=FakeEngine)
+        self.assertTrue(warmup.run())
+        engine = self.pool.get(llm_pool_key("smollm2-135m"))
+
+        router = self.make_router()
+        self.assertEqual(router.generate("hi"), "smollm2-135m says hi")
+        self.assertIs(self.pool.get(llm_pool_key("smollm2-135m")), engine)
+
+        # Selecting another variant file registers the model again
+        model_path = self.model_manager.get_model_path("smollm2-135m")
+        os.rename(os.path.join(model_path, "model_int8.onnx"),
+                  os.path.join(model_path, "model_int4.onnx"))
+        self.assertEqual(router.generate("hi"), "smollm2-135m says hi")
+        self.assertIsNot(self.pool.get(llm_pool_key("smollm2-135m")), engine)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Unit tests for ModelWarmup.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from libs.services.engine_pool import EnginePool
+from libs.services.model_manager import ModelManager
+from libs.services.model_warmup import ModelWarmup, llm_pool_key
+from libs.services.settings_manager import SettingsManager
+
+
+class FakeEngine:
+    """Engine stand-in that records warm-up."""
+
+    def __init__(self, model_path, model_file=None):
+        self.model_path = model_path
+        self.model_file = model_file
+        self.is_loaded = False
+        self.warmed = False
+
+    def load(self):
+        self.is_loaded = True
+        return True
+
+    def warm_up(self):
+        self.warmed = True
+        return 0.01
+
+    def unload(self):
+        self.is_loaded = False
+
+
+class TestModelWarmup(unittest.TestCase):
+    """Test cases for ModelWarmup."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.test_dir = tempfile.mkdtemp()
+        self.settings = SettingsManager(os.path.join(self.test_dir, "settings.json"))
+        self.model_manager = ModelManager(os.path.join(self.test_dir, "models"))
+        self.pool = EnginePool(budget_bytes=1024 ** 3)
+
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir)
+
+    def install(self, model_id):
+        model_path = os.path.join(self.model_manager.models_dir, model_id)
+        os.makedirs(model_path)
+        for name in ("model_int8.onnx", "tokenizer.json", "config.json"):
+            with open(os.path.join(model_path, name), 'w') as f:
+                f.write("{}")
+
+    def test_loads_and_warms_selected_model(self):
+        """Test that the selected model is loaded into the pool and warmed up."""
+        self.install("smollm2-135m")
+        statuses = []
+        warmup = ModelWarmup(self.settings, self.model_manager, self.pool,
+                             engine_factory=FakeEngine)
+        warmup.start(on_status=statuses.append)
+
+        self.assertTrue(warmup.wait(timeout=5))
+        self.assertEqual(statuses, ["loading", "warming", "ready"])
+        engine = self.pool.get(llm_pool_key("smollm2-135m"))
+        self.assertTrue(engine.warmed)
+        self.assertIn("warm_up", warmup.timings)
+
+    def test_first_launch_tunes_before_loading(self):
+        """Test that sessions are tuned once, before the first engine exists."""
+        self.install("smollm2-135m")
+        calls = []
+        pools = []
+
+        def fake_tune(model_file, settings):
+            calls.append(pools[-1].is_loaded(llm_pool_key("smollm2-135m")))
+            settings.set("onnx_session", {"intra_op_threads": 2})
+
+        with mock.patch("libs.services.model_warmup.auto_tune", fake_tune):
+            for _ in range(2):
+                pools.append(EnginePool(budget_bytes=1024 ** 3))
+                warmup = ModelWarmup(self.settings, self.model_manager, pools[-1],
+                                     engine_factory=FakeEngine, tune_sessions=True)
+                self.assertTrue(warmup.run())
+        self.assertEqual(calls, [False])
+
+    def test_engine_borrowed_during_warm_up(self):
+        """Test that a competing load cannot evict the engine while it warms up."""
+        self.install("smollm2-135m")
+        self.pool.register("llm:other", lambda: FakeEngine("other"), group="llm")
+        loaded_during_warm_up = []
+        pool = self.pool
+
+        class CompetingEngine(FakeEngine):
+            def warm_up(self):
+                pool.get("llm:other")
+                loaded_during_warm_up.append(self.is_loaded)
+                return super().warm_up()
+
+        warmup = ModelWarmup(self.settings, self.model_manager, self.pool,
+                             engine_factory=CompetingEngine)
+        self.assertTrue(warmup.run())
+        self.assertEqual(loaded_during_warm_up, [True])
+
+    def test_missing_model_fails(self):
+        """Test that a model that is not downloaded reports failure."""
+        statuses = []
+        warmup = ModelWarmup(self.settings, self.model_manager, self.pool,
+                             engine_factory=FakeEngine)
+        self.assertFalse(warmup.run(on_status=statuses.append))
+        self.assertEqual(statuses, ["failed"])
+        self.assertIsNotNone(warmup.error)
+
+
+if __name__ == '__main__':
+    unittest.main()
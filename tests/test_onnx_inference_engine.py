@@ -0,0 +1,581 @@
+"""
+Unit tests for ONNXInferenceEngine decoding.
+"""
+import asyncio
+import importlib.util
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from libs.services.onnx_inference_engine import ONNXInferenceEngine
+from libs.services.kv_cache import KVCache
+from libs.services.prefix_cache import PrefixCache
+from libs.services.generation_scheduler import GenerationScheduler
+from libs.services.generation_cache import GenerationCache
+from libs.services.profiler import Profiler
+from libs.services.onnx_session import create_session
+
+
+class FakeInput:
+    """Mimics onnxruntime.NodeArg."""
+
+    def __init__(self, name, shape, type="tensor(int64)"):
+        self.name = name
+        self.shape = shape
+        self.type = type
+
+
+class FakeDecoderSession:
+    """
+    Tiny stand-in for a decoder InferenceSession with KV-cache IO.
+    The cached key of each position holds its token id, and the next token
+    is the sum of every token seen so far modulo the vocabulary size, so a
+    wrong cache produces a wrong sequence.
+    """
+
+    def __init__(self, num_layers=2, num_heads=2, head_dim=4, vocab_size=50):
+        self.num_layers = num_layers
+        self.num_heads = num_heads
+        self.head_dim = head_dim
+        self.vocab_size = vocab_size
+        self.step_lengths = []
+        self.batch_sizes = []
+
+    def get_inputs(self):
+        inputs = [
+            FakeInput("input_ids", ["batch", "seq"]),
+            FakeInput("attention_mask", ["batch", "total"]),
+            FakeInput("position_ids", ["batch", "seq"]),
+        ]
+        for layer in range(self.num_layers):
+            for kind in ("key", "value"):
+                inputs.append(FakeInput(
+                    f"past_key_values.{layer}.{kind}",
+                    ["batch", self.num_heads, "past", self.head_dim],
+                    "tensor(float)"
+                ))
+        return inputs
+
+    def run(self, output_names, feeds):
+        input_ids = feeds["input_ids"]
+        batch, seq = input_ids.shape
+        self.step_lengths.append(seq)
+        self.batch_sizes.append(batch)
+
+        new = np.broadcast_to(
+            input_ids[:, None, :, None].astype(np.float32),
+            (batch, self.num_heads, seq, self.head_dim)
+        )
+        presents = []
+        for layer in range(self.num_layers):
+            key = np.concatenate([feeds[f"past_key_values.{layer}.key"], new], axis=2)
+            value = np.concatenate([feeds[f"past_key_values.{layer}.value"], new], axis=2)
+            presents += [key, value]
+
+        # Causal running sum over unmasked positions so every position gets
+        # its own prediction
+        mask = feeds["attention_mask"]
+        totals = (presents[0][:, 0, :, 0] * mask).sum(axis=1, keepdims=True)
+        running = totals - np.cumsum(input_ids[:, ::-1], axis=1)[:, ::-1] + input_ids
+        logits = np.zeros((batch, seq, self.vocab_size), dtype=np.float32)
+        next_ids = running.astype(np.int64) % self.vocab_size
+        for b in range(batch):
+            logits[b, np.arange(seq), next_ids[b]] = 10.0
+        return [logits] + presents
+
+
+class FakeTokenizer:
+    """Tokenizer whose token ids are written out as decimal words."""
+
+    special_ids = set()
+
+    def encode(self, text, add_special_tokens=True):
+        return [int(t) for t in text.split()]
+
+    def decode(self, token_ids, skip_special_tokens=True):
+        return "".join(f"{t} " for t in token_ids)
+
+    def token_bytes(self, token_id):
+        return f"{token_id} ".encode()
+
+
+def make_engine(max_context=64, **kwargs):
+    """Build an engine around a FakeDecoderSession."""
+    engine = ONNXInferenceEngine("unused", max_context=max_context)
+    engine.session = FakeDecoderSession(**kwargs)
+    engine.config = {"eos_token_id": 0}
+    engine._setup_decoder_io()
+    engine.tokenizer = FakeTokenizer()
+    engine.is_loaded = True
+    return engine
+
+
+def expected_sequence(prompt_ids, count, vocab_size=50):
+    """Reference sequence computed without any cache."""
+    seq = list(prompt_ids)
+    out = []
+    for _ in range(count):
+        token = sum(seq) % vocab_size
+        out.append(token)
+        seq.append(token)
+    return out
+
+
+class TestKVCache(unittest.TestCase):
+    """Test cases for KVCache."""
+
+    def test_from_config(self):
+        """Test sizing from config.json fields."""
+        config = {
+            "num_hidden_layers": 3,
+            "num_attention_heads": 8,
+            "num_key_value_heads": 2,
+            "hidden_size": 128,
+            "max_position_embeddings": 4096
+        }
+        cache = KVCache.from_config(config, max_context=512)
+        self.assertEqual(cache.keys.shape, (3, 1, 2, 512, 16))
+        self.assertEqual(cache.remaining, 512)
+
+    def test_append_copies_only_new_positions(self):
+        """Test that append fills the buffer in place."""
+        cache = KVCache(1, 1, 2, 8)
+        first = np.ones((1, 1, 3, 2), dtype=np.float32)
+        cache.append([(first, first)])
+        second = np.concatenate([first, np.full((1, 1, 2, 2), 5, np.float32)], axis=2)
+        cache.append([(second, second)])
+
+        self.assertEqual(cache.length, 5)
+        key, _ = cache.past()[0]
+        self.assertEqual(key.shape, (1, 1, 5, 2))
+        np.testing.assert_array_equal(key[0, 0, :, 0], [1, 1, 1, 5, 5])
+
+    def test_packed_layout_matches_dense(self):
+        """Test that a packed cache stores, snapshots and truncates like a dense one."""
+        dense = KVCache(2, 2, 3, 8)
+        packed = KVCache(2, 2, 3, 8, packed=True)
+        rng = np.random.default_rng(0)
+        presents = [tuple(rng.standard_normal((1, 2, 5, 3)).astype(np.float32)
+                          for _ in range(2)) for _ in range(2)]
+        for cache in (dense, packed):
+            cache.append([(key[:, :, :3], value[:, :, :3]) for key, value in presents])
+            cache.append(presents)
+            cache.truncate(4)
+
+        for (dense_key, dense_value), (key, value) in zip(dense.past(), packed.past()):
+            self.assertTrue(key.flags.c_contiguous)
+            np.testing.assert_array_equal(key, dense_key)
+            np.testing.assert_array_equal(value, dense_value)
+        for expected, actual in zip(dense.snapshot(2), packed.snapshot(2)):
+            np.testing.assert_array_equal(actual, expected)
+
+        packed.restore(*dense.snapshot(3), 3)
+        np.testing.assert_array_equal(packed.past()[1][0], dense.past()[1][0][:, :, :3])
+
+
+class TestPrefixCache(unittest.TestCase):
+    """Test cases for PrefixCache."""
+
+    @staticmethod
+    def snapshot(length):
+        keys = np.zeros((1, 1, 1, length, 4), dtype=np.float32)
+        return keys, keys.copy()
+
+    def test_longest_prefix(self):
+        """Test that lookups return the longest shared prefix."""
+        cache = PrefixCache()
+        cache.store([1, 2, 3], *self.snapshot(3))
+        cache.store([1, 5, 6, 7], *self.snapshot(4))
+
+        length, snapshot = cache.lookup([1, 2, 3, 4])
+        self.assertEqual(length, 3)
+        self.assertEqual(snapshot[0].shape[3], 3)
+
+        length, _ = cache.lookup([1, 5, 9])
+        self.assertEqual(length, 2)
+        self.assertEqual(cache.lookup([9])[0], 0)
+        self.assertEqual(cache.misses, 1)
+
+    def test_covered_prefix_replaced(self):
+        """Test that a longer sequence replaces its stored prefix."""
+        cache = PrefixCache()
+        cache.store([1, 2], *self.snapshot(2))
+        cache.store([1, 2, 3], *self.snapshot(3))
+        self.assertEqual(len(cache.entries), 1)
+
+    def test_byte_budget_evicts_lru(self):
+        """Test that the least recently used entry is evicted first."""
+        entry_bytes = sum(a.nbytes for a in self.snapshot(2))
+        cache = PrefixCache(max_bytes=2 * entry_bytes)
+        cache.store([1, 1], *self.snapshot(2))
+        cache.store([2, 2], *self.snapshot(2))
+        cache.lookup([1, 1])
+        cache.store([3, 3], *self.snapshot(2))
+
+        self.assertEqual(set(cache.entries), {(1, 1), (3, 3)})
+        self.assertLessEqual(cache.total_bytes, cache.max_bytes)
+
+    def test_oversized_prompt_is_not_snapshotted(self):
+        """Test that prefill skips the KV copy when the entry cannot fit."""
+        engine = make_engine()
+        position_bytes = engine.kv_cache.nbytes // engine.kv_cache.max_length
+        engine.prefix_cache = PrefixCache(max_bytes=3 * position_bytes - 1)
+        with mock.patch.object(engine.kv_cache, "snapshot",
+                               wraps=engine.kv_cache.snapshot) as snapshot:
+            engine._prefill([3, 4, 5])
+            snapshot.assert_not_called()
+            engine._prefill([3, 4])
+            snapshot.assert_called_once_with(2)
+        self.assertEqual(len(engine.prefix_cache.entries), 1)
+
+
+class TestONNXInferenceEngine(unittest.TestCase):
+    """Test cases for ONNXInferenceEngine decoding."""
+
+    def test_decode_uses_kv_cache(self):
+        """Test that each decode step feeds a single position."""
+        engine = make_engine()
+        engine.generate("3 4 5", max_tokens=6, temperature=0.01, top_k=1, top_p=1.0)
+
+        self.assertEqual(engine.session.step_lengths[0], 3)
+        self.assertTrue(all(n == 1 for n in engine.session.step_lengths[1:]))
+
+    def test_generate_matches_uncached_reference(self):
+        """Test that cached decoding reproduces a full recompute."""
+        engine = make_engine()
+        output = engine.generate("3 4 5", max_tokens=6, temperature=0.01, top_k=1, top_p=1.0)
+        expected = expected_sequence([3, 4, 5], 6)
+        self.assertEqual(output, "".join(f"{t} " for t in expected))
+
+    def test_generate_stops_when_cache_full(self):
+        """Test that decoding stops at the cache capacity."""
+        engine = make_engine(max_context=8)
+        engine.generate("3 4 5", max_tokens=50, temperature=0.01, top_k=1, top_p=1.0)
+        self.assertEqual(engine.kv_cache.length, 8)
+
+    def test_empty_prompt(self):
+        """Test that a prompt without tokens returns nothing instead of running the model."""
+        engine = make_engine()
+        self.assertEqual(engine.generate("", max_tokens=6), "")
+        self.assertEqual(engine.generate("", max_tokens=6, n=2),
+                         [{"text": "", "logprob": 0.0, "tokens": 0}] * 2)
+        self.assertEqual(engine.session.step_lengths, [])
+
+        draft = make_engine()
+        engine.enable_speculative(draft, num_draft_tokens=4)
+        self.assertEqual(engine.generate("", max_tokens=6, temperature=0.0), "")
+        self.assertEqual(draft.session.step_lengths, [])
+        self.assertEqual(engine.generate("3 4 5", max_tokens=2, temperature=0.0, top_k=1),
+                         "".join(f"{t} " for t in expected_sequence([3, 4, 5], 2)))
+
+    def test_streaming_matches_output(self):
+        """Test that streamed pieces add up to the returned text."""
+        engine = make_engine()
+        pieces = []
+        output = engine.generate("3 4 5", max_tokens=6, temperature=0.01, top_k=1,
+                                 top_p=1.0, streaming_callback=pieces.append)
+        self.assertEqual("".join(pieces), output)
+
+    def test_stop_string(self):
+        """Test that generation ends at a stop string."""
+        engine = make_engine()
+        pieces = []
+        output = engine.generate("3 4 5", max_tokens=6, temperature=0.01, top_k=1,
+                                 top_p=1.0, streaming_callback=pieces.append,
+                                 stop=["48 "])
+        self.assertEqual(output, "12 24 ")
+        self.assertEqual("".join(pieces), output)
+
+    def test_warm_up_leaves_cache_empty(self):
+        """Test that warm-up runs prefill and decode without keeping state."""
+        engine = make_engine()
+        engine.warm_up(prompt_tokens=5, decode_tokens=3)
+        self.assertEqual(engine.session.step_lengths, [5, 1, 1, 1])
+        self.assertEqual(engine.kv_cache.length, 0)
+        self.assertEqual(engine._cache_ids, [])
+
+        output = engine.generate("3 4 5", max_tokens=4, temperature=0.01, top_k=1, top_p=1.0)
+        self.assertEqual(output, "".join(f"{t} " for t in expected_sequence([3, 4, 5], 4)))
+
+    def test_n_samples_share_one_prefill(self):
+        """Test that n completions prefill once and decode in one batch."""
+        engine = make_engine()
+        samples = engine.generate("3 4 5", max_tokens=5, temperature=0.0, n=3)
+
+        expected = "".join(f"{t} " for t in expected_sequence([3, 4, 5], 5))
+        self.assertEqual([s["text"] for s in samples], [expected] * 3)
+        self.assertEqual([s["tokens"] for s in samples], [5] * 3)
+        self.assertTrue(all(s["logprob"] < 0 for s in samples))
+        self.assertEqual(engine.session.step_lengths, [3, 1, 1, 1, 1])
+        self.assertEqual(engine.session.batch_sizes, [1, 3, 3, 3, 3])
+
+    def test_n_samples_retire_independently(self):
+        """Test that a sample ending early leaves the others decoding correctly."""
+        engine = make_engine()
+        calls = []
+
+        def scripted(logits, *args, **kwargs):
+            # The first sample hits EOS (token 0) on its second token
+            calls.append(None)
+            return 0 if len(calls) == 4 else int(np.argmax(logits))
+
+        engine.sampler.sample = scripted
+        samples = engine.generate("3 4 5", max_tokens=5, temperature=0.0, n=3)
+
+        expected = expected_sequence([3, 4, 5], 5)
+        self.assertEqual(samples[0]["text"], f"{expected[0]} ")
+        for sample in samples[1:]:
+            self.assertEqual(sample["text"], "".join(f"{t} " for t in expected))
+        self.assertEqual(engine.session.batch_sizes, [1, 3, 2, 2, 2])
+
+    def test_profiler_reports_every_step(self):
+        """Test that an attached profiler times each phase and decoded token."""
+        engine = make_engine()
+        steps = []
+        profiler = Profiler(step_callback=steps.append)
+        engine.enable_profiler(profiler)
+        pieces = []
+        engine.generate("3 4 5", max_tokens=4, temperature=0.01, top_k=1, top_p=1.0,
+                        streaming_callback=pieces.append)
+
+        self.assertEqual([step["token"] for step in steps],
+                         [None] + expected_sequence([3, 4, 5], 4))
+        self.assertIn("prefill", steps[0])
+        self.assertIn("decode", steps[1])
+        summary = profiler.summary()
+        self.assertEqual(summary["sample"]["count"], 4)
+        self.assertEqual(summary["callback"]["count"], len(pieces))
+        self.assertEqual(summary["decode"]["count"], 4)
+
+        engine.enable_profiler(None)
+        engine.generate("3 4 5", max_tokens=4, temperature=0.01, top_k=1, top_p=1.0)
+        self.assertEqual(len(steps), 5)
+
+    def test_result_cache_replays_stream(self):
+        """Test that a repeated greedy request is served without running the model."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            engine = make_engine()
+            engine.enable_result_cache(GenerationCache(cache_dir))
+            first_pieces, second_pieces = [], []
+            first = engine.generate("3 4 5", max_tokens=5, temperature=0.0, top_k=40,
+                                    streaming_callback=first_pieces.append)
+            runs = len(engine.session.step_lengths)
+
+            second = engine.generate("3 4 5", max_tokens=5, temperature=0.0, top_k=7, seed=1,
+                                     streaming_callback=second_pieces.append)
+            self.assertEqual(second, first)
+            self.assertEqual(second_pieces, first_pieces)
+            self.assertEqual(len(engine.session.step_lengths), runs)
+
+            # Sampled requests without a seed always run the model
+            engine.generate("3 4 5", max_tokens=5, temperature=0.7)
+            self.assertGreater(len(engine.session.step_lengths), runs)
+
+    def test_generate_stream(self):
+        """Test that the sync iterator yields the same text as generate()."""
+        expected = make_engine().generate("3 4 5", max_tokens=6, temperature=0.01,
+                                          top_k=1, top_p=1.0)
+        engine = make_engine()
+        with engine.generate_stream("3 4 5", max_tokens=6, temperature=0.01,
+                                    top_k=1, top_p=1.0) as stream:
+            pieces = list(stream)
+        self.assertEqual("".join(pieces), expected)
+        self.assertEqual(stream.text, expected)
+
+    def test_generate_stream_cancel(self):
+        """Test that cancelling a stream stops decoding on the worker."""
+        engine = make_engine()
+        stream = engine.generate_stream("3 4 5", queue_size=1, max_tokens=40,
+                                        temperature=0.01, top_k=1, top_p=1.0)
+        first = next(stream)
+        stream.cancel()
+        self.assertEqual(list(stream), [])
+        self.assertTrue(stream.join(timeout=5))
+        self.assertTrue(first)
+        self.assertLess(len(engine._cache_ids), 3 + 40)
+
+    def test_agenerate(self):
+        """Test the async iterator and early exit from `async for`."""
+        engine = make_engine()
+
+        async def collect(limit):
+            pieces = []
+            async for text in engine.agenerate("3 4 5", max_tokens=6, temperature=0.01,
+                                               top_k=1, top_p=1.0):
+                pieces.append(text)
+                if len(pieces) == limit:
+                    break
+            return pieces
+
+        expected = make_engine().generate("3 4 5", max_tokens=6, temperature=0.01,
+                                          top_k=1, top_p=1.0)
+        self.assertEqual("".join(asyncio.run(collect(None))), expected)
+        self.assertEqual(len(asyncio.run(collect(2))), 2)
+
+    def test_next_turn_prefills_only_new_tokens(self):
+        """Test that a follow-up prompt reuses the previous turn's KV."""
+        engine = make_engine()
+        first = engine.generate("3 4 5", max_tokens=2, temperature=0.01, top_k=1, top_p=1.0)
+        engine.session.step_lengths = []
+
+        prompt = "3 4 5 " + first + "7 8"
+        output = engine.generate(prompt, max_tokens=3, temperature=0.01, top_k=1, top_p=1.0)
+
+        self.assertEqual(engine.session.step_lengths[0], 2)
+        expected = expected_sequence([int(t) for t in prompt.split()], 3)
+        self.assertEqual(output, "".join(f"{t} " for t in expected))
+
+    def test_prefix_cache_restores_shared_prefix(self):
+        """Test that a stored system prompt prefix is restored from the cache."""
+        engine = make_engine()
+        engine.generate("3 4 5 6", max_tokens=2, temperature=0.01, top_k=1, top_p=1.0)
+        engine.generate("9 9", max_tokens=2, temperature=0.01, top_k=1, top_p=1.0)
+        engine.session.step_lengths = []
+
+        output = engine.generate("3 4 5 8", max_tokens=2, temperature=0.01, top_k=1, top_p=1.0)
+        self.assertEqual(engine.session.step_lengths[0], 1)
+        expected = expected_sequence([3, 4, 5, 8], 2)
+        self.assertEqual(output, "".join(f"{t} " for t in expected))
+
+
+class OffByOneSession(FakeDecoderSession):
+    """Draft stand-in that guesses wrong whenever the running sum is odd."""
+
+    def run(self, output_names, feeds):
+        outputs = super().run(output_names, feeds)
+        logits = outputs[0]
+        odd = logits.argmax(axis=-1) % 2 == 1
+        logits[odd] = np.roll(logits[odd], 1, axis=-1)
+        return outputs
+
+
+HAS_ORT = all(importlib.util.find_spec(name) for name in ("onnx", "onnxruntime"))
+
+
+@unittest.skipUnless(HAS_ORT, "onnx and onnxruntime are required")
+class TestDecodeBinding(unittest.TestCase):
+    """Test IO-bound decode steps against plain session.run on a real model."""
+
+    @classmethod
+    def setUpClass(cls):
+        from benchmarks.tiny_model import build_tiny_model
+        cls.tempdir = tempfile.TemporaryDirectory()
+        cls.model_file = build_tiny_model(cls.tempdir.name, vocab_size=50)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tempdir.cleanup()
+
+    def make_real_engine(self, io_binding):
+        engine = ONNXInferenceEngine(self.tempdir.name, max_context=300, io_binding=io_binding)
+        engine.session, _ = create_session(self.model_file)
+        engine.config = {"eos_token_id": 49}
+        engine._setup_decoder_io()
+        engine.tokenizer = FakeTokenizer()
+        engine.is_loaded = True
+        return engine
+
+    def run_turns(self, engine):
+        kwargs = dict(temperature=0.0, top_k=1, top_p=1.0)
+        first = engine.generate("3 4 5", max_tokens=20, **kwargs)
+        second = engine.generate("3 4 5 " + first + "7", max_tokens=280, **kwargs)
+        engine._truncate_cache(10)
+        logits = engine._forward([engine._cache_ids[-1]]).copy()
+        return first, second, logits
+
+    def test_matches_session_run(self):
+        """Test that bound decoding reproduces unbound outputs and logits."""
+        bound = self.make_real_engine(io_binding=True)
+        plain = self.make_real_engine(io_binding=False)
+        self.assertIsNotNone(bound.decode_binding)
+        self.assertIsNone(plain.decode_binding)
+
+        expected = self.run_turns(plain)
+        actual = self.run_turns(bound)
+        self.assertEqual(actual[:2], expected[:2])
+        np.testing.assert_allclose(actual[2], expected[2], rtol=1e-5, atol=1e-5)
+        # The packed cache grew past its initial size for the long turn and
+        # is the only KV allocation
+        self.assertTrue(bound.kv_cache.packed)
+        self.assertGreater(bound.kv_cache.capacity, bound.kv_cache.INITIAL_CAPACITY)
+        self.assertLess(bound.decode_binding.nbytes, bound.kv_cache.nbytes)
+
+
+class TestSpeculativeDecoding(unittest.TestCase):
+    """Test cases for draft-and-verify decoding."""
+
+    def test_greedy_output_unchanged(self):
+        """Test that speculative greedy decoding matches plain decoding."""
+        expected = "".join(f"{t} " for t in expected_sequence([3, 4, 5], 12))
+        for draft_session in (FakeDecoderSession(), OffByOneSession()):
+            target = make_engine()
+            draft = make_engine()
+            draft.session = draft_session
+            self.assertTrue(target.enable_speculative(draft, num_draft_tokens=4))
+
+            output = target.generate("3 4 5", max_tokens=12, temperature=0.0, top_k=1, top_p=1.0)
+            self.assertEqual(output, expected)
+
+    def test_single_target_pass_per_draft_block(self):
+        """Test that a perfect draft needs one target pass per block."""
+        target = make_engine()
+        draft = make_engine()
+        target.enable_speculative(draft, num_draft_tokens=4)
+        target.generate("3 4 5", max_tokens=12, temperature=0.0, top_k=1, top_p=1.0)
+
+        # Prefill plus three verification passes of five positions or fewer
+        self.assertEqual(len(target.session.step_lengths), 4)
+        self.assertEqual(target.speculative.acceptance_rate, 1.0)
+
+
+class TestGenerationScheduler(unittest.TestCase):
+    """Test cases for continuous batching."""
+
+    def expected(self, prompt, count):
+        return "".join(f"{t} " for t in expected_sequence([int(t) for t in prompt.split()], count))
+
+    def test_batched_results_match_single_sequence(self):
+        """Test that interleaved batched decoding keeps sequences independent."""
+        engine = make_engine(max_context=32)
+        scheduler = GenerationScheduler(engine, max_batch_size=2)
+        jobs = [("3 4 5", 6), ("1 2", 9), ("7", 4), ("2 2 2 2", 5)]
+        requests = [scheduler.submit(p, max_tokens=n, temperature=0.0) for p, n in jobs]
+        scheduler.run_until_idle()
+
+        for (prompt, count), request in zip(jobs, requests):
+            self.assertEqual(request.result(timeout=1), self.expected(prompt, count))
+        self.assertIn(2, engine.session.batch_sizes)
+        self.assertEqual(scheduler.active_count, 0)
+
+    def test_compaction_when_cache_fills(self):
+        """Test that staggered sequences survive reclaiming cache positions."""
+        engine = make_engine(max_context=16)
+        scheduler = GenerationScheduler(engine, max_batch_size=2)
+        first = scheduler.submit("3 4 5", max_tokens=12, temperature=0.0)
+        scheduler.step()
+        scheduler.step()
+        scheduler.step()
+        second = scheduler.submit("1 2", max_tokens=12, temperature=0.0)
+        scheduler.run_until_idle()
+
+        self.assertEqual(first.result(timeout=1), self.expected("3 4 5", 12))
+        self.assertEqual(second.result(timeout=1), self.expected("1 2", 12))
+
+    def test_background_thread(self):
+        """Test submitting to a running scheduler and waiting for results."""
+        engine = make_engine()
+        scheduler = GenerationScheduler(engine, max_batch_size=4)
+        scheduler.start()
+        try:
+            pieces = []
+            request = scheduler.submit("3 4 5", max_tokens=5, temperature=0.0,
+                                       streaming_callback=pieces.append)
+            self.assertEqual(request.result(timeout=5), self.expected("3 4 5", 5))
+            self.assertEqual("".join(pieces), request.text)
+        finally:
+            scheduler.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
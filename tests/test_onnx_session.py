@@ -0,0 +1,192 @@
+"""
+Unit tests for ONNX session creation with the optimized model cache.
+"""
+import importlib.util
+import os
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from libs.services import onnx_session
+from libs.services.onnx_session import (file_sha256, create_session, auto_tune,
+                                        candidate_configs, SessionConfig)
+from libs.services.settings_manager import SettingsManager
+
+HAS_ORT = all(importlib.util.find_spec(name) for name in ("onnx", "onnxruntime"))
+
+
+class TestFileHash(unittest.TestCase):
+    """Test cases for memoized model hashing."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "model.onnx")
+        with open(self.path, 'wb') as f:
+            f.write(b"weights" * 1000)
+
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir)
+
+    def test_memo_follows_file_changes(self):
+        """Test that the memoized digest is reused until the file changes."""
+        memo = os.path.join(self.test_dir, "hashes.json")
+        first = file_sha256(self.path, memo)
+        self.assertEqual(file_sha256(self.path, memo), first)
+        self.assertTrue(os.path.exists(memo))
+
+        with open(self.path, 'ab') as f:
+            f.write(b"more")
+        self.assertNotEqual(file_sha256(self.path, memo), first)
+
+
+class TestSessionConfig(unittest.TestCase):
+    """Test cases for SessionConfig persistence and candidates."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.test_dir = tempfile.mkdtemp()
+        self.settings = SettingsManager(os.path.join(self.test_dir, "settings.json"))
+
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir)
+
+    def test_settings_round_trip(self):
+        """Test that a config saved to settings loads back unchanged."""
+        self.assertEqual(SessionConfig.from_settings(self.settings), SessionConfig())
+        config = SessionConfig(intra_op_threads=2, allow_spinning=False)
+        config.save(self.settings)
+
+        reloaded = SettingsManager(self.settings.settings_path)
+        self.assertEqual(SessionConfig.from_settings(reloaded), config)
+
+    def test_candidates_fit_core_count(self):
+        """Test that candidate thread counts never exceed the cores."""
+        counts = {c.intra_op_threads for c in candidate_configs(cpu_count=6)}
+        self.assertEqual(counts, {1, 2, 3, 4, 6})
+        self.assertEqual(len(candidate_configs(cpu_count=1)), 1)
+
+
+@unittest.skipUnless(HAS_ORT, "onnx and onnxruntime are required")
+class TestCreateSession(unittest.TestCase):
+    """Test cases for the serialized pre-optimized model cache."""
+
+    def setUp(self):
+        """Set up test environment."""
+        from benchmarks.tiny_model import build_tiny_model
+        self.test_dir = tempfile.mkdtemp()
+        self.model_file = build_tiny_model(os.path.join(self.test_dir, "model"))
+        self.cache_dir = os.path.join(self.test_dir, "cache")
+
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir)
+
+    def run_model(self, session):
+        feeds = {
+            "input_ids": np.array([[1, 2, 3]], dtype=np.int64),
+            "attention_mask": np.ones((1, 3), dtype=np.int64),
+            "position_ids": np.arange(3, dtype=np.int64)[None, :],
+        }
+        for inp in session.get_inputs():
+            if inp.name.startswith("past_key_values."):
+                feeds[inp.name] = np.zeros((1, inp.shape[1], 0, inp.shape[3]), dtype=np.float32)
+        return session.run(["logits"], feeds)[0]
+
+    def test_second_load_hits_cache(self):
+        """Test that the optimized model is written once and then reused."""
+        first, info = create_session(self.model_file, self.cache_dir)
+        self.assertFalse(info["cache_hit"])
+        self.assertTrue(os.path.exists(info["optimized_model"]))
+
+        second, info2 = create_session(self.model_file, self.cache_dir)
+        self.assertTrue(info2["cache_hit"])
+        self.assertEqual(info2["optimized_model"], info["optimized_model"])
+        np.testing.assert_allclose(self.run_model(second), self.run_model(first), rtol=1e-5)
+
+    def test_corrupt_cache_is_rebuilt(self):
+        """Test that an unreadable optimized model is replaced."""
+        _, info = create_session(self.model_file, self.cache_dir)
+        with open(info["optimized_model"], 'wb') as f:
+            f.write(b"not a model")
+
+        session, info2 = create_session(self.model_file, self.cache_dir)
+        self.assertFalse(info2["cache_hit"])
+        self.assertEqual(self.run_model(session).shape[-1], 64)
+        self.assertTrue(create_session(self.model_file, self.cache_dir)[1]["cache_hit"])
+
+    def test_large_model_is_not_cached(self):
+        """Test that models over the size limit skip the cache and drop old copies."""
+        _, info = create_session(self.model_file, self.cache_dir)
+        self.assertTrue(os.path.exists(info["optimized_model"]))
+
+        session, info2 = create_session(self.model_file, self.cache_dir, max_cached_bytes=1)
+        self.assertFalse(info2["cache_hit"])
+        self.assertIsNone(info2["optimized_model"])
+        self.assertFalse(os.path.exists(info["optimized_model"]))
+        self.assertEqual(self.run_model(session).shape[-1], 64)
+
+    def test_stale_copies_are_pruned(self):
+        """Test that writing a copy deletes copies of old versions and removed models."""
+        other_file = os.path.join(self.test_dir, "other", "model.onnx")
+        os.makedirs(os.path.dirname(other_file))
+        shutil.copy(self.model_file, other_file)
+        _, other = create_session(other_file, self.cache_dir)
+        _, info = create_session(self.model_file, self.cache_dir)
+
+        # A copy made by another ONNX Runtime version, and a removed model
+        prefix = os.path.basename(info["optimized_model"]).split("-")[0]
+        old_version = os.path.join(self.cache_dir, f"{prefix}-0123456789abcdef.onnx")
+        shutil.copy(info["optimized_model"], old_version)
+        os.remove(other_file)
+        os.remove(info["optimized_model"])
+
+        _, info2 = create_session(self.model_file, self.cache_dir)
+        self.assertTrue(os.path.exists(info2["optimized_model"]))
+        self.assertFalse(os.path.exists(old_version))
+        self.assertFalse(os.path.exists(other["optimized_model"]))
+        with open(os.path.join(self.cache_dir, "model_hashes.json")) as f:
+            self.assertEqual(list(json.load(f)), [os.path.abspath(self.model_file)])
+
+    def test_profile_dir_writes_trace(self):
+        """Test that the ONNX Runtime profiler writes a trace when configured."""
+        profile_dir = os.path.join(self.test_dir, "profiles")
+        session, _ = create_session(self.model_file,
+                                    session_config=SessionConfig(profile_dir=profile_dir))
+        self.run_model(session)
+        trace = session.end_profiling()
+        self.assertEqual(os.path.dirname(os.path.abspath(trace)), os.path.abspath(profile_dir))
+        self.assertTrue(os.path.getsize(trace) > 0)
+
+    def test_auto_tune_stores_best(self):
+        """Test that auto-tuning before the first session saves the winner."""
+        # A fresh interpreter: this test process may already own a global pool
+        settings_path = os.path.join(self.test_dir, "settings.json")
+        script = (
+            "from libs.services.onnx_session import auto_tune, SessionConfig\n"
+            "from libs.services.settings_manager import SettingsManager\n"
+            f"settings = SettingsManager({settings_path!r})\n"
+            "candidates = [SessionConfig(intra_op_threads=n) for n in (1, 2)]\n"
+            f"best, results = auto_tune({self.model_file!r}, settings, candidates=candidates, runs=2)\n"
+            "assert len(results) == 2 and best in candidates\n"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        subprocess.run([sys.executable, "-c", script], cwd=root, check=True)
+
+        with open(settings_path, 'r') as f:
+            stored = json.load(f)[onnx_session.SETTINGS_KEY]
+        self.assertIn(stored["intra_op_threads"], (1, 2))
+
+    def test_auto_tune_needs_first_session(self):
+        """Test that tuning refuses to run once the global pool exists."""
+        with mock.patch.object(onnx_session, "_global_pool_sizes", (1, 1)):
+            self.assertEqual(auto_tune(self.model_file), (None, []))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+Unit tests for PromptBuilder.
+"""
+import shutil
+import tempfile
+import unittest
+from libs.services.chat_manager import ChatManager
+from libs.services.prompt_builder import PromptBuilder
+
+
+class WordTokenizer:
+    """One token per whitespace-separated word."""
+
+    def encode(self, text, add_special_tokens=True):
+        return text.split()
+
+
+def turns(count, words=8):
+    return [{"role": "user" if i % 2 == 0 else "assistant",
+             "content": " ".join(f"w{i}" for _ in range(words))} for i in range(count)]
+
+
+class TestPromptBuilder(unittest.TestCase):
+    """Test cases for PromptBuilder."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.builder = PromptBuilder(WordTokenizer(), context_tokens=120, reserve_tokens=20)
+
+    def test_fits_budget_and_keeps_latest_turn(self):
+        """Test that the oldest turns are dropped to fit the budget."""
+        messages = turns(30)
+        result = self.builder.build(messages, system_prompt="Be brief.")
+        self.assertLessEqual(result["tokens"], self.builder.budget)
+        self.assertLess(result["messages_used"], 30)
+        self.assertTrue(result["prompt"].endswith("<|im_start|>assistant\n"))
+        self.assertIn(messages[-1]["content"], result["prompt"])
+        self.assertNotIn(messages[0]["content"], result["prompt"])
+        self.assertEqual(sum(result["sections"].values()), result["tokens"])
+        self.assertEqual(result["tokens"], len(result["prompt"].split()))
+
+    def test_oversized_latest_message_is_cut_from_the_front(self):
+        """Test that a latest turn larger than the budget keeps its end and the template."""
+        messages = turns(4) + [{"role": "user",
+                                "content": " ".join(f"w{i}" for i in range(300))}]
+        result = self.builder.build(messages, system_prompt="Be brief.",
+                                    context_chunks=["passage " * 5])
+        self.assertTrue(result["truncated"])
+        self.assertLessEqual(result["tokens"], self.builder.budget)
+        self.assertEqual(result["tokens"], len(result["prompt"].split()))
+        self.assertEqual((result["messages_used"], result["chunks_used"]), (1, 0))
+        self.assertTrue(result["prompt"].startswith("<|im_start|>system\nBe brief."))
+        self.assertIn("<|im_start|>user\n", result["prompt"])
+        self.assertIn("w299<|im_end|>", result["prompt"])
+        self.assertNotIn("w0 ", result["prompt"])
+        self.assertTrue(result["prompt"].endswith("<|im_start|>assistant\n"))
+        self.assertFalse(self.builder.build(turns(4))["truncated"])
+
+    def test_context_chunks_share(self):
+        """Test that RAG chunks are capped to their share of the budget."""
+        chunks = [f"passage {i} " + "text " * 10 for i in range(10)]
+        result = self.builder.build(turns(2), context_chunks=chunks)
+        self.assertGreater(result["chunks_used"], 0)
+        self.assertLess(result["chunks_used"], 10)
+        self.assertIn("passage 0", result["prompt"])
+        self.assertGreater(result["sections"]["context"], 0)
+        self.assertLessEqual(result["tokens"], self.builder.budget)
+
+    def test_counts_are_cached(self):
+        """Test that a new turn only tokenizes the new message."""
+        messages = turns(6)
+        self.builder.build(messages)
+        before = self.builder.tokenized
+        self.builder.build(messages + turns(7)[6:])
+        self.assertEqual(self.builder.tokenized, before + 1)
+
+    def test_chat_history_is_incremental(self):
+        """Test that a chat build only renders new messages and follows edits."""
+        messages = turns(20)
+        first = self.builder.build(messages, window_key="chat")
+        rendered = []
+        format_message = self.builder.format_message
+        self.builder.format_message = lambda role, content: \
+            rendered.append(content) or format_message(role, content)
+
+        messages = turns(21)
+        result = self.builder.build(messages, window_key="chat")
+        self.assertEqual(rendered, [messages[-1]["content"]])
+        self.assertEqual(result["tokens"], len(result["prompt"].split()))
+
+        # A regenerated reply replaces the last message
+        edited = messages[:-1] + [{"role": "user", "content": "edited " * 3}]
+        result = self.builder.build(edited, window_key="chat")
+        self.assertTrue(result["prompt"].endswith("edited edited edited <|im_end|>\n"
+                                                  "<|im_start|>assistant\n"))
+        self.assertEqual(result["tokens"], len(result["prompt"].split()))
+        self.assertGreater(first["messages_used"], 1)
+
+    def test_window_slides_in_steps(self):
+        """Test that the kept window's start stays put between slides."""
+        messages = turns(8)
+        starts = []
+        for count in range(8, 30):
+            messages = turns(count)
+            result = self.builder.build(messages, window_key="chat")
+            self.assertLessEqual(result["tokens"], self.builder.budget)
+            starts.append(count - result["messages_used"])
+        # Several turns pass between moves of the window start
+        self.assertLess(len(set(starts)), len(starts) // 2)
+
+    def test_build_chat(self):
+        """Test building from a stored chat."""
+        test_dir = tempfile.mkdtemp()
+        try:
+            chat_manager = ChatManager(history_dir=test_dir)
+            chat_id = chat_manager.create_chat()
+            chat_manager.add_message(chat_id, "user", "Hello there")
+            result = self.builder.build_chat(chat_manager, chat_id)
+            self.assertIn("<|im_start|>user\nHello there<|im_end|>\n", result["prompt"])
+            self.assertIsNone(self.builder.build_chat(chat_manager, "missing"))
+        finally:
+            shutil.rmtree(test_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+Unit tests for Sampler.
+"""
+import unittest
+import numpy as np
+from libs.services.sampler import Sampler
+
+
+class TestSampler(unittest.TestCase):
+    """Test cases for Sampler."""
+
+    def setUp(self):
+        """Set up test environment."""
+        rng = np.random.default_rng(1)
+        self.logits = (rng.standard_normal(1000) * 2).astype(np.float32)
+        self.ranked = np.argsort(self.logits)[::-1]
+
+    def test_greedy(self):
+        """Test that zero temperature picks the argmax."""
+        sampler = Sampler(seed=0)
+        self.assertEqual(sampler.sample(self.logits, temperature=0.0), int(self.ranked[0]))
+
+    def test_top_k_restricts_candidates(self):
+        """Test that only the k most likely tokens are sampled."""
+        sampler = Sampler(seed=0)
+        allowed = set(self.ranked[:5].tolist())
+        for _ in range(200):
+            token = sampler.sample(self.logits, temperature=1.0, top_k=5, top_p=1.0)
+            self.assertIn(token, allowed)
+
+    def test_top_p_without_top_k(self):
+        """Test that nucleus sampling stays inside the nucleus."""
+        probs = np.exp(self.logits - self.logits.max())
+        probs /= probs.sum()
+        cutoff = int(np.searchsorted(np.cumsum(probs[self.ranked]), 0.5)) + 1
+        allowed = set(self.ranked[:cutoff].tolist())
+
+        sampler = Sampler(seed=0)
+        for _ in range(200):
+            token = sampler.sample(self.logits, temperature=1.0, top_k=0, top_p=0.5)
+            self.assertIn(token, allowed)
+
+    def test_seeded_and_pure(self):
+        """Test that seeding is reproducible and logits are left untouched."""
+        original = self.logits.copy()
+        first = [Sampler(seed=7).sample(self.logits) for _ in range(3)]
+        sampler = Sampler(seed=7)
+        second = [sampler.sample(self.logits)]
+        sampler.reseed(7)
+        second.append(sampler.sample(self.logits))
+
+        self.assertEqual(first[0], second[0])
+        self.assertEqual(second[0], second[1])
+        np.testing.assert_array_equal(self.logits, original)
+
+    def test_penalties(self):
+        """Test repetition and frequency penalties on seen tokens."""
+        logits = np.array([2.0, -2.0, 1.5], dtype=np.float32)
+        counts = np.bincount([0, 1, 1], minlength=3)
+        penalized = Sampler.apply_penalties(logits, counts, repetition_penalty=2.0,
+                                            frequency_penalty=0.5)
+        np.testing.assert_allclose(penalized, [0.5, -5.0, 1.5])
+        self.assertEqual(Sampler(seed=0).sample(logits, temperature=0.0, token_counts=counts,
+                                                repetition_penalty=2.0), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
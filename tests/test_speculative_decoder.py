@@ -0,0 +1,84 @@
+"""
+Unit tests for SpeculativeDecoder.
+"""
+import unittest
+import numpy as np
+from libs.services.speculative_decoder import SpeculativeDecoder
+from tests.test_onnx_inference_engine import FakeDecoderSession, make_engine
+
+VOCAB_SIZE = 6
+
+
+class FixedDistributionSession(FakeDecoderSession):
+    """Decoder whose next-token logits are the same at every position."""
+
+    def __init__(self, logits):
+        super().__init__(vocab_size=VOCAB_SIZE)
+        self.fixed_logits = np.asarray(logits, dtype=np.float32)
+
+    def run(self, output_names, feeds):
+        outputs = super().run(output_names, feeds)
+        outputs[0] = np.broadcast_to(self.fixed_logits, outputs[0].shape).copy()
+        return outputs
+
+
+def fixed_engine(probs):
+    engine = make_engine()
+    # Token 0 is EOS; it never gets probability so every sample runs to max_tokens
+    engine.session = FixedDistributionSession(np.log(np.maximum(probs, 1e-12)))
+    engine._setup_decoder_io()
+    return engine
+
+
+class TestSpeculativeDecoder(unittest.TestCase):
+    """Test cases for SpeculativeDecoder."""
+
+    TARGET = np.array([0.0, 0.4, 0.3, 0.15, 0.1, 0.05])
+    DRAFT = np.array([0.0, 0.1, 0.1, 0.2, 0.3, 0.3])
+
+    def test_samples_follow_target_distribution(self):
+        """Test that acceptance sampling reproduces the target's distribution."""
+        decoder = SpeculativeDecoder(fixed_engine(self.TARGET), fixed_engine(self.DRAFT),
+                                     num_draft_tokens=3, seed=1234)
+        counts = np.zeros((4, VOCAB_SIZE))
+        for _ in range(1500):
+            text = decoder._generate("1 2", max_tokens=4, temperature=1.0, top_k=0, top_p=1.0)
+            for position, token in enumerate(int(t) for t in text.split()):
+                counts[position, token] += 1
+
+        # Every position, accepted draft or correction, is distributed like the target
+        self.assertTrue((counts.sum(axis=1) == 1500).all())
+        for position in range(4):
+            observed = counts[position] / counts[position].sum()
+            self.assertLess(0.5 * np.abs(observed - self.TARGET).sum(), 0.04,
+                            f"position {position}: {observed}")
+        # A different draft means some proposals were rejected and corrected
+        self.assertGreater(decoder.acceptance_rate, 0.0)
+        self.assertLess(decoder.acceptance_rate, 1.0)
+
+    def test_holds_draft_lock(self):
+        """Test that the draft engine cannot start another generation mid-decode."""
+        target, draft = fixed_engine(self.TARGET), fixed_engine(self.DRAFT)
+        decoder = SpeculativeDecoder(target, draft, seed=0)
+        held = []
+        forward = draft._forward
+
+        def checking_forward(*args, **kwargs):
+            held.append(draft._generate_lock.locked())
+            return forward(*args, **kwargs)
+
+        draft._forward = checking_forward
+        self.assertNotIn("Error", decoder.generate("1 2", max_tokens=6, temperature=1.0))
+        self.assertTrue(held and all(held))
+        self.assertFalse(draft._generate_lock.locked())
+        self.assertFalse(target._generate_lock.locked())
+
+    def test_draft_must_be_separate_engine(self):
+        """Test that an engine cannot draft for itself."""
+        engine = fixed_engine(self.TARGET)
+        with self.assertRaises(ValueError):
+            SpeculativeDecoder(engine, engine)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Unit tests for VectorStore.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from libs.services.vector_store import VectorStore
+
+
+class TestVectorStore(unittest.TestCase):
+    """Test cases for VectorStore."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.test_dir = tempfile.mkdtemp()
+        self.rag_dir = os.path.join(self.test_dir, "rag")
+        self.store = VectorStore(self.rag_dir)
+        rng = np.random.default_rng(0)
+        self.docs = {doc_id: rng.standard_normal((4, 8)).astype(np.float32) * 3
+                     for doc_id in ("a", "b", "c")}
+        for doc_id, embeddings in self.docs.items():
+            chunks = [f"{doc_id} chunk {i}" for i in range(len(embeddings))]
+            self.store.add_document(doc_id, chunks, embeddings, {"filename": f"{doc_id}.txt"})
+
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir)
+
+    def brute_force(self, store_docs, query, top_k):
+        scored = []
+        for doc_id, embeddings in store_docs.items():
+            sims = embeddings @ query / (np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query))
+            scored += [(float(sim), doc_id, i) for i, sim in enumerate(sims)]
+        scored.sort(reverse=True)
+        return [(doc_id, i) for _, doc_id, i in scored[:top_k]]
+
+    def test_search_matches_brute_force(self):
+        """Test that the matrix search ranks chunks like full cosine similarity."""
+        query = self.docs["b"][2] + 0.1
+        results = self.store.search(query, top_k=5)
+        self.assertEqual([(r["doc_id"], r["chunk_index"]) for r in results],
+                         self.brute_force(self.docs, query, 5))
+        self.assertEqual(results[0]["chunk_text"], "b chunk 2")
+        self.assertEqual(results[0]["metadata"], {"filename": "b.txt"})
+        self.assertTrue(all(a["similarity"] >= b["similarity"]
+                            for a, b in zip(results, results[1:])))
+
+    def test_search_reads_no_files(self):
+        """Test that a reopened store answers repeated queries from memory."""
+        store = VectorStore(self.rag_dir)
+        store.search(self.docs["a"][0], top_k=3)
+        for doc_info in store.index["documents"].values():
+            os.remove(doc_info["metadata_file"])
+            os.remove(doc_info["embeddings_file"])
+        results = store.search(self.docs["a"][0], top_k=3)
+        self.assertEqual(results[0]["chunk_text"], "a chunk 0")
+
+    def test_delete_and_reopen(self):
+        """Test that deleted rows leave the matrix and the rest persists."""
+        self.assertTrue(self.store.delete_document("a"))
+        remaining = {doc_id: self.docs[doc_id] for doc_id in ("b", "c")}
+        query = self.docs["c"][1]
+
+        reopened = VectorStore(self.rag_dir)
+        results = reopened.search(query, top_k=8)
+        self.assertEqual([(r["doc_id"], r["chunk_index"]) for r in results],
+                         self.brute_force(remaining, query, 8))
+        self.assertEqual(os.path.getsize(reopened.matrix_file), 8 * 8 * 4)
+
+    def test_float16_and_legacy_rebuild(self):
+        """Test that a store without a matrix is rebuilt in the requested type."""
+        self.store.index.pop("matrix")
+        self.store._save_index()
+        os.remove(self.store.matrix_file)
+
+        store = VectorStore(self.rag_dir, dtype="float16")
+        self.assertEqual(os.path.getsize(store.matrix_file), 12 * 8 * 2)
+        query = self.docs["c"][3]
+        results = store.search(query, top_k=4)
+        self.assertEqual([(r["doc_id"], r["chunk_index"]) for r in results],
+                         self.brute_force(self.docs, query, 4))
+
+    def test_empty_store(self):
+        """Test that searching an empty store returns nothing."""
+        store = VectorStore(os.path.join(self.test_dir, "empty"))
+        self.assertEqual(store.search(np.ones(8, dtype=np.float32)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()